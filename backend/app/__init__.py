@@ -1,13 +1,12 @@
 """
 应用包初始化文件 - 创建和配置FastAPI应用
+
+FastAPI、路由等只有Web服务需要的模块在 create_app 中才导入,
+导入脚本、基准测试等只使用 app.models 的场景不会加载它们。
 """
-import logging
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 
-from app.core import setup_logging, DEBUG, ENVIRONMENT, DB_TYPE, DB_CONFIG
-from app.models import setup_database, is_db_initialized
-from app.api.routes import router
+from app.utils.startup import boot
 
 # 应用实例缓存
 _app_instance = None
@@ -15,77 +14,149 @@ _app_instance = None
 def create_app():
     """
     创建并配置FastAPI应用
-    
+
+    启动分为 imports、database、app 三个阶段计时,应用启动事件中在后台执行预热,
+    预热完成前 /health/ready 返回503
+
     返回:
         配置好的FastAPI应用实例
     """
     global _app_instance
-    
+
     # 如果应用已经初始化，直接返回缓存的实例
     if _app_instance is not None:
         return _app_instance
-    
-    # 设置日志
-    logger = setup_logging()
+
+    # 日志系统已在 app.core.config 导入时配置
+    from app.core import logger, DEBUG, ENVIRONMENT, DB_TYPE, DB_CONFIG
     logger.info("正在初始化应用...")
-    
-    # 创建FastAPI应用
-    app = FastAPI(
-        title="EasyIDPhoto API",
-        description="证件照处理服务API",
-        version="1.0.0",
-        debug=DEBUG
-    )
-    
-    # 启用CORS
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-    logger.info("CORS已配置")
-    
+
+    with boot.phase("imports"):
+        from fastapi import FastAPI
+        from fastapi.middleware.cors import CORSMiddleware
+        from app.core.config import WARMUP_ENABLED, SUGGEST_REFRESH_INTERVAL
+        from app.models import setup_database, is_db_initialized
+        from app.models.snapshot import refresh_suggest_popularity
+        from app.api.routes import router
+        from app.utils.db_executor import db_executor, run_side
+        from app.utils.fast_json import FastJSONResponse
+        from app.utils.metrics import registry
+        from app.utils.rate_limit import limiters
+        from app.utils.request_middleware import RequestMiddleware
+        from app.utils.response_cache import response_cache
+
     # 初始化数据库
     logger.info("正在初始化数据库...")
-    try:
-        db = setup_database(DB_TYPE, DB_CONFIG)
-        
-        # 验证数据库是否正确初始化
-        if not is_db_initialized():
-            logger.error("数据库初始化后，验证失败")
+    with boot.phase("database"):
+        try:
+            setup_database(DB_TYPE, DB_CONFIG)
+
+            # 验证数据库是否正确初始化
+            if not is_db_initialized():
+                logger.error("数据库初始化后，验证失败")
+                if ENVIRONMENT == 'production':
+                    raise RuntimeError("数据库初始化失败")
+                logger.warning("在非生产环境中继续启动应用，但数据库功能可能不可用")
+            else:
+                # 验证ImageRecord类型
+                from app.models.EconIndex import Task
+                if Task is not None:
+                    logger.info(f"Task类型: {type(Task)}")
+                else:
+                    logger.error("Task仍为None，数据库初始化可能不完整")
+                logger.info("数据库初始化成功")
+        except Exception as e:
+            logger.error(f"数据库初始化失败: {str(e)}", exc_info=True)
+            # 在非生产环境中，我们可能希望应用继续启动，即使数据库初始化失败
             if ENVIRONMENT == 'production':
-                raise RuntimeError("数据库初始化失败")
+                raise
             logger.warning("在非生产环境中继续启动应用，但数据库功能可能不可用")
-        else:
-            # 验证ImageRecord类型
-            from app.models.EconIndex import EconIndex
-            if EconIndex is not None:
-                logger.info(f"EconIndex类型: {type(EconIndex)}")
+
+    with boot.phase("app"):
+        # 创建FastAPI应用
+        app = FastAPI(
+            title="EasyIDPhoto API",
+            description="证件照处理服务API",
+            version="1.0.0",
+            debug=DEBUG,
+            # 路由返回的字典使用orjson编码
+            default_response_class=FastJSONResponse
+        )
+
+        # 启用CORS
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+        logger.info("CORS已配置")
+
+        # 存储数据库初始化状态
+        app.state.db_initialized = is_db_initialized()
+
+        # 数据集版本检测、SQL追踪和请求指标合并为一个纯ASGI中间件
+        app.add_middleware(RequestMiddleware)
+
+        # 注册路由
+        app.include_router(router)
+        logger.info("API路由已注册")
+
+        @registry.register_collector
+        def collect_component_stats():
+            """把数据库线程池、搜索记录缓冲区、响应缓存和限流器的运行统计写入仪表"""
+            from app.models.EconIndex import search_record_buffer
+            for name, value in db_executor.stats().items():
+                registry.gauge("db_pool", "数据库线程池状态", ("stat",)).set(value, stat=name)
+            for name, value in search_record_buffer.stats().items():
+                registry.gauge("search_log_buffer", "搜索记录后写缓冲区状态", ("stat",)).set(value, stat=name)
+            for name, value in response_cache.stats().items():
+                registry.gauge("response_cache", "压缩响应缓存状态", ("stat",)).set(value, stat=name)
+            for limiter in limiters:
+                registry.gauge("rate_limit_keys", "限流器跟踪的客户端数", ("limiter",)).set(limiter.stats()["keys"], limiter=limiter.name)
+
+        # 启动后在后台预热,不阻塞开始监听
+        @app.on_event("startup")
+        async def start_warmup():
+            if WARMUP_ENABLED:
+                app.state.warmup_task = asyncio.create_task(boot.warm_up())
             else:
-                logger.error("EconIndex仍为None，数据库初始化可能不完整")
-            logger.info("数据库初始化成功")
-    except Exception as e:
-        logger.error(f"数据库初始化失败: {str(e)}", exc_info=True)
-        # 在非生产环境中，我们可能希望应用继续启动，即使数据库初始化失败
-        if ENVIRONMENT == 'production':
-            raise
-        logger.warning("在非生产环境中继续启动应用，但数据库功能可能不可用")
-    
-    # 存储数据库初始化状态
-    app.state.db_initialized = is_db_initialized()
-    
-    # 注册路由
-    app.include_router(router)
-    logger.info("API路由已注册")
-    
-    # 存储处理后的图片
-    app.state.processed_images = {}
-    
+                boot.mark_ready()
+
+        async def refresh_suggest_periodically():
+            """按间隔在独立线程池中刷新自动补全的搜索热度,与快照失效无关"""
+            while True:
+                await asyncio.sleep(SUGGEST_REFRESH_INTERVAL)
+                try:
+                    await run_side(refresh_suggest_popularity)
+                except Exception as e:
+                    logger.error(f"刷新自动补全热度失败: {str(e)}", exc_info=True)
+
+        @app.on_event("startup")
+        async def start_suggest_refresh():
+            if SUGGEST_REFRESH_INTERVAL > 0:
+                app.state.suggest_refresh_task = asyncio.create_task(refresh_suggest_periodically())
+
+        @app.on_event("shutdown")
+        def stop_suggest_refresh():
+            task = getattr(app.state, "suggest_refresh_task", None)
+            if task is not None:
+                task.cancel()
+
+        # 关闭时写入缓冲区中剩余的搜索记录
+        @app.on_event("shutdown")
+        def flush_search_records():
+            from app.models.EconIndex import search_record_buffer
+            search_record_buffer.stop()
+
+        # 存储处理后的图片
+        app.state.processed_images = {}
+
+    boot.mark_warming()
     logger.info("应用初始化完成")
-    
+
     # 缓存应用实例
     _app_instance = app
-    
-    return app
\ No newline at end of file
+
+    return app
@@ -1,18 +1,28 @@
 """
 API路由模块 - 定义API端点和处理函数
 """
+import csv
 import io
 import logging
-from datetime import datetime
-from typing import Optional
+import math
+from datetime import date, datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, File, Form, UploadFile, Request, Depends, HTTPException, Response
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, File, Form, UploadFile, Request, Depends, HTTPException, Response, Query
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from pony.orm import db_session
 
 from app.models.database import is_db_initialized
-from app.models.EconIndex import EconIndex, EconIndexStats, get_title_percentage, search_titles_by_keyword, record_occupation_search, get_popular_occupation_searches, add_feedback, get_feedbacks, occupation_stats, get_top_tasks_by_percentage
-from app.utils.request_utils import generate_request_id
+from app.models.EconIndex import EconIndexStats, get_title_percentage, get_titles_tasks, search_titles_by_keyword, suggest_titles, record_occupation_search, get_popular_occupation_searches, add_feedback, get_feedbacks, occupation_stats, get_top_tasks_by_percentage, iter_econ_index_rows, EXPORT_FIELDS, EXPORT_STATS_FIELDS
+from app.utils.request_utils import generate_request_id, get_client_ip
+from app.utils.db_executor import db_executor, run_db, run_side
+from app.utils.http_cache import check_not_modified
+from app.utils.fast_json import dumps
+from app.utils.response_cache import response_cache
+from app.utils.metrics import registry
+from app.utils.rate_limit import feedback_limiter, search_log_limiter
+from app.utils.startup import boot
+from app.core.config import BATCH_TITLES_MAX
 
 # 获取日志记录器
 logger = logging.getLogger(__name__)
@@ -29,34 +39,13 @@ def get_db():
         logger.warning("数据库未完全初始化，某些功能可能不可用")
     yield None  # 使用Pony ORM的db_session装饰器，不需要实际传递会话
 
-def get_client_ip(request: Request) -> str:
-    """获取客户端真实IP地址"""
-    # 首先检查常见的代理头
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        # 取第一个IP（最原始的客户端）
-        return forwarded_for.split(",")[0].strip()
-    
-    # 然后检查其他可能的头
-    real_ip = request.headers.get("X-Real-IP")
-    if real_ip:
-        return real_ip
-    
-    # 最后使用直接客户端IP，如果可用
-    if request.client and request.client.host:
-        return request.client.host
-    
-    # 默认值
-    return "127.0.0.1"
-
-
 @router.get("/health")
 async def health_check():
     """
-    健康检查API
+    健康检查API(存活检查),进程能响应即返回200
     
     返回:
-        应用健康状态
+        应用健康状态,readiness 为启动预热状态及各阶段耗时
     """
     # 检查数据库是否已初始化
     db_status = "ok" if is_db_initialized() else "error"
@@ -68,14 +57,40 @@ async def health_check():
         "components": {
             "database": db_status,
             "api": "ok"
-        }
+        },
+        "db_pool": db_executor.stats(),
+        "ready": boot.ready,
+        "readiness": boot.status()
     } 
 
+@router.get("/health/ready")
+async def readiness_check():
+    """
+    就绪检查API,供负载均衡和滚动重启使用
+    
+    返回:
+        启动预热完成后返回200,之前返回503;内容为启动状态及各阶段耗时
+    """
+    return JSONResponse(status_code=200 if boot.ready else 503, content=boot.status())
+
 
 # 添加经济指数相关API路由
 
+@router.get("/metrics")
+async def metrics():
+    """
+    Prometheus格式的运行指标
+    
+    返回:
+        请求数/耗时直方图、模型函数耗时、SQL执行数、正在处理的请求数、缓存命中等指标,
+        多worker部署时为所有worker汇总后的结果
+    """
+    # 汇总各进程指标文件只涉及文件读取,不占用数据库线程池
+    content = await run_side(registry.render)
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
 @router.get("/occupation/search")
-async def search_occupations(keyword: str = "", language: str = "cn", limit: int = 100, request: Request = None, db: None = Depends(get_db)):
+async def search_occupations(request: Request, response: Response, keyword: str = "", language: str = "cn", limit: int = 100, db: None = Depends(get_db)):
     """
     根据关键词搜索职业
     
@@ -89,19 +104,17 @@ async def search_occupations(keyword: str = "", language: str = "cn", limit: int
     """
     logger.info(f"搜索职业，关键词: {keyword}, 语言: {language}")
     
+    # 数据未变化时直接返回304
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
+    
     if not keyword:
         return {"occupations": []}
     
     try:
-        # 使用已有的search_titles_by_keyword函数进行搜索
-        titles = search_titles_by_keyword(keyword, language)
-
-        print("titles", titles)
-        
-        # 限制结果数量
-        titles = titles[:limit]
-
-        occupations = titles
+        # 使用search_titles_by_keyword函数进行搜索,排序、去重和数量限制在索引内完成
+        occupations = await run_db(search_titles_by_keyword, keyword, language, limit)
         
         logger.info(f"搜索结果: 找到 {len(occupations)} 个匹配的职业")
         
@@ -113,8 +126,80 @@ async def search_occupations(keyword: str = "", language: str = "cn", limit: int
         logger.error(f"搜索职业失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
 
+@router.get("/occupation/suggest")
+async def suggest_occupations(prefix: str = "", language: str = "cn", limit: int = 10, db: None = Depends(get_db)):
+    """
+    职业名称自动补全,供搜索框逐键输入时调用
+    
+    参数:
+        prefix: 用户已输入的前缀
+        language: 语言选择 ('en' 或 'cn')
+        limit: 返回结果数量限制
+        
+    返回:
+        按搜索热度排序的职业名称列表
+    """
+    if not prefix:
+        return {"occupations": []}
+    
+    try:
+        occupations = await run_db(suggest_titles, prefix, language, limit)
+        return {"occupations": occupations}
+    
+    except Exception as e:
+        logger.error(f"获取职业补全建议失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"获取补全建议失败: {str(e)}")
+
+@router.get("/occupation/tasks/batch")
+async def get_occupation_tasks_batch(
+    request: Request,
+    response: Response,
+    titles: List[str] = Query([]),
+    language: str = "cn",
+    db: None = Depends(get_db)
+):
+    """
+    批量获取多个职业的任务分布百分比,用于职业对比
+    
+    参数:
+        titles: 职业名称列表 (?titles=A&titles=B)
+        language: 语言选择 ('en' 或 'cn')
+        
+    返回:
+        按请求顺序排列的职业任务分布列表,每个职业的任务按百分比降序排列
+    """
+    logger.info(f"批量获取职业任务分布，职业数: {len(titles)}, 语言: {language}")
+    
+    titles = [title for title in titles if title]
+    if len(titles) > BATCH_TITLES_MAX:
+        raise HTTPException(status_code=400, detail=f"单次最多查询 {BATCH_TITLES_MAX} 个职业")
+    if not titles:
+        return {"occupations": []}
+    
+    try:
+        # 批量对比不计入搜索热度
+        not_modified = check_not_modified(request, response)
+        if not_modified is not None:
+            return not_modified
+        cached, cache_key = await response_cache.lookup(request, response)
+        if cached is not None:
+            return cached
+        
+        tasks_by_title = await run_db(get_titles_tasks, titles, language, True)
+        occupations = [
+            {"title": title, "tasks": tasks_by_title.get(title, [])}
+            for title in dict.fromkeys(titles)
+        ]
+        
+        logger.info(f"批量获取任务分布成功: {len(occupations)} 个职业")
+        return await response_cache.store(cache_key, request, response, {"occupations": occupations})
+    
+    except Exception as e:
+        logger.error(f"批量获取任务分布失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"批量获取任务分布失败: {str(e)}")
+
 @router.get("/occupation/tasks")
-async def get_occupation_tasks(title: str = "", language: str = "cn", request: Request = None, db: None = Depends(get_db)):
+async def get_occupation_tasks(request: Request, response: Response, title: str = "", language: str = "cn", db: None = Depends(get_db)):
     """
     获取指定职业的任务分布百分比
     
@@ -131,12 +216,22 @@ async def get_occupation_tasks(title: str = "", language: str = "cn", request: R
         return {"tasks": []}
     
     try:
-        # 记录职业查询
+        # 记录职业查询(只进入后写缓冲区,304响应同样计入热度),超出频率的客户端照常返回结果但不记录
         client_ip = get_client_ip(request) if request else None
-        record_occupation_search(title, language, client_ip)
+        if search_log_limiter.acquire(client_ip) == 0:
+            record_occupation_search(title, language, client_ip)
+        
+        # 数据未变化时直接返回304
+        not_modified = check_not_modified(request, response)
+        if not_modified is not None:
+            return not_modified
+        # 同一数据集版本下直接返回缓存的压缩响应
+        cached, cache_key = await response_cache.lookup(request, response)
+        if cached is not None:
+            return cached
         
         # 使用get_title_percentage函数获取任务分布
-        tasks_data = get_title_percentage(title, language)
+        tasks_data = await run_db(get_title_percentage, title, language)
         
         # 转换数据格式
         tasks = [
@@ -151,7 +246,7 @@ async def get_occupation_tasks(title: str = "", language: str = "cn", request: R
         tasks.sort(key=lambda x: x["percentage"], reverse=True)
         
         logger.info(f"获取任务分布成功: {len(tasks)} 个任务")
-        return {"tasks": tasks}
+        return await response_cache.store(cache_key, request, response, {"tasks": tasks})
     
     except Exception as e:
         logger.error(f"获取职业任务分布失败: {str(e)}", exc_info=True)
@@ -172,7 +267,7 @@ async def get_popular_occupations(days: int = 30, limit: int = 10, db: None = De
     logger.info(f"获取热门职业，天数: {days}, 限制: {limit}")
     
     try:
-        popular_occupations = get_popular_occupation_searches(limit, days)
+        popular_occupations = await run_db(get_popular_occupation_searches, limit, days)
         
         logger.info(f"获取热门职业成功: {len(popular_occupations)} 个职业")
         return {"occupations": popular_occupations}
@@ -201,12 +296,17 @@ async def submit_feedback(
     """
     logger.info(f"提交反馈, 类型: {feedback_type}")
     
+    # 获取客户端IP,同一IP提交过于频繁时返回429
+    client_ip = get_client_ip(request) if request else None
+    wait = feedback_limiter.acquire(client_ip)
+    if wait > 0:
+        logger.warning(f"反馈提交过于频繁, IP: {client_ip}")
+        raise HTTPException(status_code=429, detail="提交过于频繁，请稍后再试", headers={"Retry-After": str(math.ceil(wait))})
+    
     try:
-        # 获取客户端IP
-        client_ip = get_client_ip(request) if request else None
-        
         # 添加反馈
-        feedback_id = add_feedback(
+        feedback_id = await run_db(
+            add_feedback,
             feedback_type=feedback_type,
             feedback_content=feedback_content,
             client_ip=client_ip
@@ -227,68 +327,197 @@ async def submit_feedback(
 async def get_feedback_list(
     days: int = 30,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    feedback_type: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     db: None = Depends(get_db)
 ):
     """
-    获取反馈列表
+    获取反馈列表，按反馈时间倒序分页
     
     参数:
-        days: 最近几天的数据，默认30天
-        limit: 返回的结果数量，默认50条
+        days: 最近几天的数据，默认30天，指定start_date时忽略
+        limit: 每页数量，默认50条
+        cursor: 上一页返回的next_cursor，为空表示第一页
+        feedback_type: 反馈类型('建议', '问题', '其他')，为空表示全部类型
+        start_date: 起始日期(含)，格式YYYY-MM-DD
+        end_date: 结束日期(含)，格式YYYY-MM-DD
         
     返回:
-        反馈列表
+        反馈列表及下一页游标
     """
-    logger.info(f"获取反馈列表, 天数: {days}")
+    logger.info(f"获取反馈列表, 天数: {days}, 类型: {feedback_type}, 日期: {start_date} ~ {end_date}")
     
     try:
-        feedbacks = get_feedbacks(
+        feedbacks, next_cursor = await run_db(
+            get_feedbacks,
             days=days,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            feedback_type=feedback_type,
+            start_date=start_date,
+            end_date=end_date
         )
         
         logger.info(f"获取反馈列表成功: {len(feedbacks)} 条")
-        return {"feedbacks": feedbacks}
-    
+        return {"feedbacks": feedbacks, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取反馈列表失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取反馈列表失败: {str(e)}")
-    
+
 @router.get("/occupation/stats")
-async def get_occupation_stats(type: str = "percentage_sum", limit: int = 20, db: None = Depends(get_db)):
+async def get_occupation_stats(
+    request: Request,
+    response: Response,
+    type: str = "percentage_sum",
+    limit: int = 20,
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    db: None = Depends(get_db)
+):
     """
     获取所有职业的统计数据
     
+    参数:
+        type: 排序指标 ('percentage_sum', 'percentage_non_zero' 或 'automated_score_avg')
+        limit: 每页数量，默认20个
+        order: 排序方向 ('desc' 或 'asc')
+        cursor: 上一页返回的next_cursor，为空表示第一页
+    
     返回:
-        职业统计数据列表，包含每个职业的总对话占比、非零任务平均占比和自动化分数
+        职业统计数据列表，包含每个职业的总对话占比、非零任务平均占比和自动化分数，以及下一页游标
     """
-    logger.info("获取职业统计数据")
+    logger.info(f"获取职业统计数据，类型: {type}, 排序: {order}")
+    
+    # 数据未变化时直接返回304
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
     
     try:
-        stats = occupation_stats(type, limit)
+        cached, cache_key = await response_cache.lookup(request, response)
+        if cached is not None:
+            return cached
+        stats, next_cursor = await run_db(occupation_stats, type, limit, order, cursor, True)
         logger.info(f"获取职业统计数据成功: {len(stats)} 个职业")
-        return {"stats": stats}
+        return await response_cache.store(cache_key, request, response, {"stats": stats, "next_cursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取职业统计数据失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取职业统计数据失败: {str(e)}")
 
 @router.get("/tasks/top")
-async def get_top_tasks(limit: int = 10, db: None = Depends(get_db)):
+async def get_top_tasks(request: Request, response: Response, limit: int = 10, order: str = "desc", cursor: Optional[str] = None, db: None = Depends(get_db)):
     """
     获取对话占比最高的任务
     
     参数:
-        limit: 返回的任务数量，默认10个
+        limit: 每页返回的任务数量，默认10个
+        order: 排序方向 ('desc' 或 'asc')
+        cursor: 上一页返回的next_cursor，为空表示第一页
         
     返回:
-        按对话占比排序的任务列表，包含任务描述、所属职业、占比等信息
+        按对话占比排序的任务列表，包含任务描述、所属职业、占比等信息，以及下一页游标
     """
-    logger.info(f"获取对话占比最高的任务，数量: {limit}")
+    logger.info(f"获取对话占比最高的任务，数量: {limit}, 排序: {order}")
+    
+    # 数据未变化时直接返回304
+    not_modified = check_not_modified(request, response)
+    if not_modified is not None:
+        return not_modified
     
     try:
-        tasks = get_top_tasks_by_percentage(limit)
+        cached, cache_key = await response_cache.lookup(request, response)
+        if cached is not None:
+            return cached
+        tasks, next_cursor = await run_db(get_top_tasks_by_percentage, limit, order, cursor, True)
         logger.info(f"获取对话占比最高任务成功: {len(tasks)} 个任务")
-        return {"tasks": tasks}
+        return await response_cache.store(cache_key, request, response, {"tasks": tasks, "next_cursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取对话占比最高任务失败: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"获取对话占比最高任务失败: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"获取对话占比最高任务失败: {str(e)}")
+
+async def _read_chunks(chunks):
+    """
+    逐块在数据库线程池中读取同步生成器,每块之间不占用数据库线程
+    
+    参数:
+        chunks: iter_econ_index_rows 返回的生成器,每块在独立的db_session中读取
+    """
+    while True:
+        rows = await run_db(next, chunks, None)
+        if rows is None:
+            return
+        yield rows
+
+async def _export_ndjson(chunks):
+    """将数据块编码为NDJSON,每块产生一次输出"""
+    async for rows in _read_chunks(chunks):
+        yield b"".join(dumps(row) + b"\n" for row in rows)
+
+async def _export_csv(chunks, fields):
+    """将数据块编码为CSV,首块前输出表头"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    # 带BOM便于Excel识别UTF-8
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    async for rows in _read_chunks(chunks):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+@router.get("/occupation/export")
+async def export_occupation_tasks(
+    format: str = "ndjson",
+    title: str = "",
+    language: str = "en",
+    soc_prefix: str = "",
+    task_type: str = "",
+    non_zero: bool = False,
+    include_stats: bool = False,
+    db: None = Depends(get_db)
+):
+    """
+    流式导出任务数据
+    
+    参数:
+        format: 输出格式 ('ndjson' 或 'csv')
+        title: 只导出该职业
+        language: title的语言 ('en' 或 'cn')
+        soc_prefix: 只导出O*NET-SOC代码以此开头的职业
+        task_type: 只导出该任务类型
+        non_zero: 只导出对话占比大于0的任务
+        include_stats: 是否附加职业统计数据
+        
+    返回:
+        分块输出的NDJSON或CSV,内存占用与数据量无关
+    """
+    logger.info(f"导出数据，格式: {format}, 职业: {title}, SOC前缀: {soc_prefix}, 任务类型: {task_type}")
+    
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    
+    chunks = iter_econ_index_rows(
+        title=title or None,
+        language=language,
+        soc_prefix=soc_prefix or None,
+        task_type=task_type or None,
+        non_zero=non_zero,
+        include_stats=include_stats
+    )
+    if format == "csv":
+        fields = list(EXPORT_FIELDS) + (list(EXPORT_STATS_FIELDS) if include_stats else [])
+        return StreamingResponse(
+            _export_csv(chunks, fields),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="econ_index.csv"'}
+        )
+    return StreamingResponse(_export_ndjson(chunks), media_type="application/x-ndjson")
@@ -19,10 +19,23 @@ if env_path.exists():
 else:
     print(f"警告: 环境变量配置文件不存在: {env_path}，将使用默认值或系统环境变量")
 
+def _env_bool(name: str, default: bool) -> bool:
+    """
+    读取布尔类型的环境变量,true/1/t/yes/y/on(不区分大小写)为真,其他值为假
+
+    参数:
+        name: 环境变量名
+        default: 未设置或为空时的默认值
+    """
+    value = os.environ.get(name, '').strip().lower()
+    if not value:
+        return default
+    return value in ('true', '1', 't', 'yes', 'y', 'on')
+
 # 应用基本配置
 APP_NAME = "Anthropic Economic Index"
 VERSION = "0.0.1"
-DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
+DEBUG = _env_bool('DEBUG', False)
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'production')  # 'development', 'testing', 'production'
 
 # 数据库配置
@@ -42,6 +55,68 @@ DB_CONFIG = {
     }
 }
 
+# 数据库线程池配置
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '4'))  # 同时执行的数据库调用上限
+
+# SQLite性能配置,每个连接建立时执行对应的PRAGMA
+SQLITE_TUNING = _env_bool('SQLITE_TUNING', True)  # 是否启用下列配置
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # WAL模式下写入不阻塞读取
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # WAL下NORMAL只在检查点时fsync
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),  # 内存映射读取的字节数
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', '-65536')),  # 页缓存大小,负数单位为KiB
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),  # 临时表和排序使用内存
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')),  # 数据库被锁时的等待时间(毫秒)
+}
+SQLITE_READONLY_READER = _env_bool('SQLITE_READONLY_READER', True)  # 只读查询使用只读连接
+
+# 搜索配置
+SUGGEST_TOP_K = int(os.environ.get('SUGGEST_TOP_K', '10'))  # 自动补全每个前缀保留的候选数量
+SUGGEST_REFRESH_INTERVAL = float(os.environ.get('SUGGEST_REFRESH_INTERVAL', '600'))  # 自动补全热度权重的刷新间隔(秒),0表示只在快照重新加载时更新
+BATCH_TITLES_MAX = int(os.environ.get('BATCH_TITLES_MAX', '50'))  # 批量查询任务分布时单次最多的职业数
+
+# 快照文件配置: 导入脚本把快照写为二进制文件,各worker以只读mmap方式共享
+SNAPSHOT_FILE_ENABLED = _env_bool('SNAPSHOT_FILE_ENABLED', True)  # 是否写入和使用快照文件
+SNAPSHOT_FILE_PATH = os.environ.get(
+    'SNAPSHOT_FILE_PATH',
+    # SQLite默认放在数据库文件旁边,不同数据库不会共用同一个快照文件
+    os.path.splitext(DB_CONFIG['sqlite']['filename'])[0] + '.snapshot' if DB_TYPE == 'sqlite'
+    else str(BASE_DIR / 'data' / 'econ_index.snapshot')
+)  # 快照文件路径
+
+# 搜索记录后写缓冲配置
+SEARCH_LOG_BATCH_SIZE = int(os.environ.get('SEARCH_LOG_BATCH_SIZE', '200'))  # 每批写入的记录数
+SEARCH_LOG_FLUSH_INTERVAL = float(os.environ.get('SEARCH_LOG_FLUSH_INTERVAL', '2.0'))  # 最长写入间隔(秒)
+SEARCH_LOG_MAX_PENDING = int(os.environ.get('SEARCH_LOG_MAX_PENDING', '10000'))  # 内存中最多积压的记录数
+SEARCH_LOG_OVERFLOW = os.environ.get('SEARCH_LOG_OVERFLOW', 'drop_newest')  # 积压满时的策略: drop_newest / drop_oldest
+SEARCH_LOG_MAX_RETRIES = int(os.environ.get('SEARCH_LOG_MAX_RETRIES', '3'))  # 写入失败的批次最多重试次数
+SEARCH_LOG_RETRY_BACKOFF = float(os.environ.get('SEARCH_LOG_RETRY_BACKOFF', '0.5'))  # 首次重试前等待秒数,之后每次加倍
+
+# 可信反向代理: 逗号分隔的IP或网段(如 10.0.0.0/8),只有直接连接来自这些地址时才读取X-Forwarded-For/X-Real-IP
+TRUSTED_PROXIES = [item.strip() for item in os.environ.get('TRUSTED_PROXIES', '').split(',') if item.strip()]
+
+# 限流配置: 按客户端IP和路由的令牌桶,保护SQLite写入
+RATE_LIMIT_ENABLED = _env_bool('RATE_LIMIT_ENABLED', True)  # 是否启用限流
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))  # 每个限流器最多跟踪的客户端数,超出时淘汰最久未访问的
+RATE_LIMIT_FEEDBACK_PER_MINUTE = float(os.environ.get('RATE_LIMIT_FEEDBACK_PER_MINUTE', '5'))  # 每个IP每分钟可提交的反馈数
+RATE_LIMIT_FEEDBACK_BURST = int(os.environ.get('RATE_LIMIT_FEEDBACK_BURST', '5'))  # 反馈提交允许的突发数
+RATE_LIMIT_SEARCH_LOG_PER_MINUTE = float(os.environ.get('RATE_LIMIT_SEARCH_LOG_PER_MINUTE', '60'))  # 每个IP每分钟记录的职业查询数
+RATE_LIMIT_SEARCH_LOG_BURST = int(os.environ.get('RATE_LIMIT_SEARCH_LOG_BURST', '30'))  # 职业查询记录允许的突发数
+
+# HTTP缓存配置
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', '60'))  # 只读接口的浏览器/CDN缓存时间(秒)
+
+# 压缩响应缓存配置: 按 (路由, 参数, 数据集版本) 缓存编码并压缩后的JSON响应体
+RESPONSE_CACHE_ENABLED = _env_bool('RESPONSE_CACHE_ENABLED', True)  # 是否启用
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '2048'))  # 最多缓存的响应数
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))  # 缓存总字节数上限(含各压缩版本)
+RESPONSE_COMPRESS_MIN_SIZE = int(os.environ.get('RESPONSE_COMPRESS_MIN_SIZE', '1024'))  # 小于该字节数的响应不压缩
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', '9'))  # gzip压缩级别,结果会被缓存,使用最高压缩率
+RESPONSE_BROTLI_QUALITY = int(os.environ.get('RESPONSE_BROTLI_QUALITY', '9'))  # brotli压缩质量(0-11),11压缩率最高但60KB响应需约90ms
+
+# 数据集版本检测间隔(秒),多worker部署时各worker据此发现数据重新导入
+DATASET_VERSION_CHECK_INTERVAL = float(os.environ.get('DATASET_VERSION_CHECK_INTERVAL', '1.0'))
+
 # 日志配置
 LOG_DIR = os.environ.get('LOG_DIR', str(BASE_DIR / 'logs'))
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -57,6 +132,21 @@ PORT = int(os.environ.get('PORT', '5000'))
 WORKERS = int(os.environ.get('WORKERS', '1'))
 RELOAD = DEBUG
 
+# 指标配置: 多worker时每个进程把指标写入 METRICS_DIR 下的独立文件, /metrics 汇总所有进程
+METRICS_MULTIPROCESS = _env_bool('METRICS_MULTIPROCESS', WORKERS > 1)
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'data' / 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1.0'))  # 进程指标文件的最短写入间隔(秒)
+
+# 启动预热配置: 启动后在后台加载快照、构建搜索索引并编码热门统计,完成前 /health/ready 返回503
+WARMUP_ENABLED = _env_bool('WARMUP_ENABLED', True)  # 是否在启动后预热
+WARMUP_TOP_K = int(os.environ.get('WARMUP_TOP_K', '100'))  # 预先编码的统计排名和任务排行条数
+
+# SQL追踪配置
+SQL_TRACE_ENABLED = _env_bool('SQL_TRACE_ENABLED', True)  # 按请求记录SQL
+SQL_TRACE_REPEAT_THRESHOLD = int(os.environ.get('SQL_TRACE_REPEAT_THRESHOLD', '10'))  # 同一形状SQL执行次数达到该值时视为N+1
+SQL_TRACE_SLOWEST = int(os.environ.get('SQL_TRACE_SLOWEST', '3'))  # 每个请求保留的最慢语句数
+SQL_TRACE_HEADERS = _env_bool('SQL_TRACE_HEADERS', ENVIRONMENT != 'production')  # 是否输出Server-Timing响应头(只含语句数和耗时),默认只在非生产环境开启
+
 # 初始化标志，用于防止重复初始化
 _is_app_initialized = False
 
@@ -69,6 +159,10 @@ def setup_logging():
     """
     global _is_app_initialized
     
+    # 模块导入时已经配置过,再次调用直接返回,不重复创建目录和处理器
+    if _is_app_initialized:
+        return logging.getLogger()
+    
     # 确保日志目录存在
     log_dir = Path(LOG_DIR)
     if not log_dir.exists():
@@ -95,23 +189,19 @@ def setup_logging():
     # 获取根日志记录器
     logger = logging.getLogger()
     
-    # 只在首次初始化时记录详细信息
-    if not _is_app_initialized:
-        logger.info(f"日志系统初始化完成，级别: {LOG_LEVEL}, 目录: {LOG_DIR}")
-        
-        # 记录环境变量加载情况
-        if env_path.exists():
-            logger.info(f"已加载环境变量配置文件: {env_path}")
-        else:
-            logger.warning(f"环境变量配置文件不存在: {env_path}，使用默认值或系统环境变量")
-        
-        # 记录应用环境
-        logger.info(f"应用环境: {ENVIRONMENT}, 调试模式: {DEBUG}")
-        
-        # 设置初始化标志
-        _is_app_initialized = True
+    logger.info(f"日志系统初始化完成，级别: {LOG_LEVEL}, 目录: {LOG_DIR}")
+    
+    # 记录环境变量加载情况
+    if env_path.exists():
+        logger.info(f"已加载环境变量配置文件: {env_path}")
     else:
-        logger.debug("日志系统已初始化，跳过详细日志")
+        logger.warning(f"环境变量配置文件不存在: {env_path}，使用默认值或系统环境变量")
+    
+    # 记录应用环境
+    logger.info(f"应用环境: {ENVIRONMENT}, 调试模式: {DEBUG}")
+    
+    # 设置初始化标志
+    _is_app_initialized = True
     
     return logger
 
@@ -1,35 +1,102 @@
 """
-图片记录实体模块 - 定义图片处理记录的数据模型
+经济指数数据模块 - 职业/任务实体及其查询和写入
+
+- 实体: 职业(Occupation)、任务(Task)及其长文本(TaskText)、任务类型/评级日期/数据来源查找表、
+  职业统计(EconIndexStats)、职业搜索记录及按天汇总、用户反馈
+- 查询: 职业任务、标题搜索与补全、统计和任务排行分页,读取内存快照(见 snapshot)
+- 写入: 搜索记录经后写缓冲区批量提交,导入脚本通过 TaskWriter 批量插入或更新任务,
+  update_occupation_stats 重算统计并递增数据集版本
 """
-from datetime import datetime
-from pony.orm import PrimaryKey, Required, db_session, select, Optional, avg, desc
+import time
+from collections import Counter
+from datetime import datetime, date, timedelta
+from pony.orm import PrimaryKey, Required, Set, db_session, select, Optional, avg, count, desc, commit, rollback, composite_key
 
 from app.models.database import db
-from app.models.database import is_db_initialized
-from app.core.config import logger
+from app.models.database import is_db_initialized, WriterLock
+from app.models.snapshot import get_snapshot, invalidate_snapshot, STATS_METRICS
+from app.models.dataset_version import increment_dataset_version, publish_dataset_version
+from app.core.config import (
+    logger, SEARCH_LOG_BATCH_SIZE, SEARCH_LOG_FLUSH_INTERVAL, SEARCH_LOG_MAX_PENDING, SEARCH_LOG_OVERFLOW,
+    SEARCH_LOG_MAX_RETRIES, SEARCH_LOG_RETRY_BACKOFF
+)
 from app.utils.timer import timer, TimerContext
+from app.utils.write_behind import WriteBehindBuffer
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.sql_trace import sql_traced
+from app.utils.metrics import record_db_query
 
-class EconIndex(db.Entity):
+class Occupation(db.Entity):
+    """职业,每个O*NET-SOC代码一条,任务行通过外键引用,职业名不再在每个任务上重复存储"""
     id = PrimaryKey(int, auto=True)
-    onet_soc_code = Required(str)
+    onet_soc_code = Required(str, unique=True)
     title = Required(str) # 职业名称
+    title_cn = Required(str)
+    tasks = Set('Task')
+
+class TaskType(db.Entity):
+    """任务类型查找表(Core/Supplemental等)"""
+    id = PrimaryKey(int, auto=True)
+    name = Required(str, unique=True)
+    tasks = Set('Task')
+
+class RatingDate(db.Entity):
+    """任务评估日期查找表(如 07/2014)"""
+    id = PrimaryKey(int, auto=True)
+    name = Required(str, unique=True)
+    tasks = Set('Task')
+
+class DomainSource(db.Entity):
+    """数据来源查找表(Incumbent/Analyst等)"""
+    id = PrimaryKey(int, auto=True)
+    name = Required(str, unique=True)
+    tasks = Set('Task')
+
+class Task(db.Entity):
+    """
+    职业任务,只保存数值列和外键,扫描和聚合时不读取长文本
+    任务描述和自动化评分理由存放在 TaskText 中
+    """
+    id = PrimaryKey(int, auto=True)
+    occupation = Required(Occupation)
     task_id = Required(int)
-    task = Required(str, max_len=1024)  # 任务描述,可能较长
-    task_type = Required(str)
+    # 查找表外键取值很少,不单独建索引
+    task_type = Required(TaskType, index=False)
     incumbents_responding = Required(int)
-    date = Required(str) 
-    domain_source = Required(str)
+    date = Required(RatingDate, index=False)
+    domain_source = Required(DomainSource, index=False)
     percentage = Required(float)  # 该任务占所有对话的百分比
-    title_cn = Required(str)
-    task_cn = Required(str, max_len=1024)  # 任务描述,可能较长
     automated_score = Required(int)
-    automated_score_reason = Required(str, max_len=4096)
+    text = Optional('TaskText')
+    composite_key(occupation, task_id)
 
     def to_dict(self):
-        """将实体转换为字典，用于API响应"""
-        result = dict(self._vals_)
-        return result
-    
+        """展开为扁平字典,字段同 EXPORT_FIELDS,用于API响应"""
+        occupation, text = self.occupation, self.text
+        return {
+            'id': self.id,
+            'onet_soc_code': occupation.onet_soc_code,
+            'title': occupation.title,
+            'task_id': self.task_id,
+            'task': text.content if text else '',
+            'task_type': self.task_type.name,
+            'incumbents_responding': self.incumbents_responding,
+            'date': self.date.name,
+            'domain_source': self.domain_source.name,
+            'percentage': self.percentage,
+            'title_cn': occupation.title_cn,
+            'task_cn': text.content_cn if text else '',
+            'automated_score': self.automated_score,
+            'automated_score_reason': text.automated_score_reason if text else '',
+        }
+
+class TaskText(db.Entity):
+    """任务的长文本,与Task一对一,主键即任务主键"""
+    task = PrimaryKey(Task)
+    content = Required(str, max_len=1024)  # 任务描述,可能较长
+    content_cn = Required(str, max_len=1024)  # 任务描述,可能较长
+    automated_score_reason = Required(str, max_len=4096)
+
 class EconIndexStats(db.Entity):
     id = PrimaryKey(int, auto=True)
     title = Required(str)
@@ -61,6 +128,15 @@ class OccupationSearchRecord(db.Entity):
             "client_ip": self.client_ip
         }
 
+class OccupationSearchDaily(db.Entity):
+    """职业搜索按天汇总的计数，随搜索记录写入时一并维护，用于热门职业查询"""
+    id = PrimaryKey(int, auto=True)
+    title = Required(str)  # 查询的职业名称
+    language = Required(str)  # 查询使用的语言(en/cn)
+    day = Required(date)  # 查询日期
+    search_count = Required(int, default=0)  # 当天查询次数
+    composite_key(title, language, day)
+
 class FeedbackRecord(db.Entity):
     """用户反馈记录模型，用于记录用户对职业和任务的反馈"""
     id = PrimaryKey(int, auto=True)
@@ -70,122 +146,244 @@ class FeedbackRecord(db.Entity):
     client_ip = Optional(str)  # 客户端IP地址
     
     def to_dict(self):
-        """将实体转换为字典，用于API响应"""
-        result = dict(self._vals_)
-        result['feedback_time'] = self.feedback_time.isoformat()
-        return result
+        """将实体转换为字典，用于API响应(_vals_ 以属性对象为键,这里按属性名输出)"""
+        return {
+            'id': self.id,
+            'feedback_type': self.feedback_type,
+            'feedback_content': self.feedback_content,
+            'feedback_time': self.feedback_time.isoformat(),
+            'client_ip': self.client_ip,
+        }
 
 @timer
-@db_session
 def get_title_percentage(title: str, language: str) -> dict:
     """
     获取职业各任务的百分比
-    """
-    try:
-        # 获取职业信息
-        if language == 'en':
-            task_info = EconIndex.select(lambda s: s.title == title)
-        else:
-            task_info = EconIndex.select(lambda s: s.title_cn == title)
 
-        # 返回任务对应的百分比
-        task_percentage_dict = {}
-        for task in task_info:
-            if language == 'en':
-                task_percentage_dict[task.task] = task.percentage
-            else:
-                task_percentage_dict[task.task_cn] = task.percentage
+    结果会进入压缩响应缓存,读取失败时直接抛出异常,由路由返回500,不缓存空结果
+    """
+    return get_snapshot().title_percentage(title, language)
 
-        return task_percentage_dict
-    except Exception as e:
-        logger.error(f"获取职业: {title} 的统计信息失败: {str(e)}", exc_info=True)
-        return {}
+@timer
+def get_titles_tasks(titles: list, language: str, encoded: bool = False) -> dict:
+    """
+    批量获取多个职业的任务分布
+    
+    参数:
+        titles: 职业名称列表
+        language: 语言选择 ('en' 或 'cn')
+        encoded: 为True时每个职业的任务列表以预编码的JSON片段(fast_json.Fragment)返回,
+                 片段在快照内缓存,只能用 fast_json.dumps 输出
+        
+    返回:
+        职业名到任务列表的映射,每个任务为 {"task", "percentage"},按百分比降序排列;
+        读取失败时抛出异常,不返回会被缓存的空结果
+    """
+    return get_snapshot().titles_tasks(titles, language, encoded)
 
 @timer
-@db_session
-def search_titles_by_keyword(keyword: str, language: str) -> list:
+def search_titles_by_keyword(keyword: str, language: str, limit: int = None) -> list:
     """
     根据关键字搜索职业标题
     
     参数:
         keyword: 搜索关键字
         language: 语言选择 ('en' 或 'cn')
+        limit: 返回结果数量上限,None表示不限制
         
     返回:
-        匹配的职业标题列表
+        按相关度排序、去重后的职业标题列表
     """
     try:
         with TimerContext("搜索职业标题"):
-            if language == 'en':
-                # 英文标题搜索
-                titles = select(e.title for e in EconIndex 
-                            if keyword in e.title)
-            else:
-                # 中文标题搜索
-                titles = select(e.title_cn for e in EconIndex 
-                            if keyword in e.title_cn)
+            titles = get_snapshot().search_titles(keyword, language, limit)
             
-        return list(titles)
+        return titles
     except Exception as e:
         logger.error(f"搜索职业标题失败,关键字:{keyword}, 错误:{str(e)}", exc_info=True)
         return []
     
 @timer
-@db_session
-def occupation_stats(type: str="percentage_sum", limit: int = 20) -> list:
+def suggest_titles(prefix: str, language: str, limit: int = 10) -> list:
     """
-    获取所有职业的统计数据
+    根据输入前缀获取职业标题自动补全建议
+    
+    参数:
+        prefix: 用户输入的前缀
+        language: 语言选择 ('en' 或 'cn')
+        limit: 返回结果数量上限
+        
+    返回:
+        按搜索热度排序的职业标题列表
     """
     try:
-        if type == "percentage_sum":
-            stats = EconIndexStats.select().order_by(lambda s: desc(s.percentage_sum))[:limit]
-        elif type == "percentage_non_zero":
-            stats = EconIndexStats.select().order_by(lambda s: desc(s.percentage_non_zero))[:limit]
-        else:
-            # 不支持
-            logger.error(f"不支持的类型: {type}")
-            return []
-        result = []
-        if type == "percentage_sum":
-            for stat in stats:
-                result.append({
-                    "title": stat.title,
-                    "title_cn": stat.title_cn,
-                    "percentage_sum": stat.percentage_sum
-                    })
-        elif type == "percentage_non_zero":
-            for stat in stats:
-                result.append({
-                    "title": stat.title,
-                    "title_cn": stat.title_cn,
-                    "percentage_non_zero": stat.percentage_non_zero
-                })
-        else:
-            # 不支持
-            logger.error(f"不支持的类型: {type}")
-        return result
+        return get_snapshot().suggest_titles(prefix, language, limit)
     except Exception as e:
-        logger.error(f"获取职业统计数据失败: {str(e)}", exc_info=True)
+        logger.error(f"获取职业补全建议失败,前缀:{prefix}, 错误:{str(e)}", exc_info=True)
         return []
 
+# 分页游标中排序键的字段类型
+STATS_CURSOR_TYPES = (float, str)  # (指标值, 职业名)
+TASKS_CURSOR_TYPES = (float, str, str, int)  # (百分比, 职业名, 任务, 快照行号)
+
+def _parse_page_params(order: str, cursor: str, cursor_types: tuple):
+    """
+    校验排序方向并解码游标,不合法时抛出ValueError
+    
+    返回:
+        (是否降序, 排序键)
+    """
+    if order not in ("desc", "asc"):
+        raise ValueError(f"不支持的排序方向: {order}")
+    after = decode_cursor(cursor, cursor_types) if cursor else None
+    return order == "desc", after
+
+@timer
+def occupation_stats(type: str="percentage_sum", limit: int = 20, order: str = "desc", cursor: str = None,
+                     encoded: bool = False):
+    """
+    获取职业统计数据排名,使用快照中预先排好序的排名列表和键集分页
+    
+    参数:
+        type: 排序指标 ('percentage_sum', 'percentage_non_zero' 或 'automated_score_avg')
+        limit: 每页数量
+        order: 排序方向 ('desc' 或 'asc')
+        cursor: 上一页返回的游标,为空表示第一页
+        encoded: 为True时每条统计以预编码的JSON片段(fast_json.Fragment)返回
+        
+    返回:
+        (职业统计列表, 下一页游标), 没有更多数据时游标为None;
+        type、order或cursor不合法时抛出ValueError,读取失败时抛出异常,不返回会被缓存的空结果
+    """
+    if type not in STATS_METRICS:
+        raise ValueError(f"不支持的统计类型: {type}")
+    descending, after = _parse_page_params(order, cursor, STATS_CURSOR_TYPES)
+    stats, next_key = get_snapshot().occupation_stats(type, limit, descending, after, encoded)
+    return stats, encode_cursor(next_key)
+
+def _search_daily_upsert_sql() -> str:
+    """生成按 (title, language, day) 累加搜索次数的upsert语句"""
+    provider = db.provider
+    placeholder = '?' if provider.paramstyle == 'qmark' else '%s'
+    table = provider.quote_name(OccupationSearchDaily._table_)
+    title, language, day, search_count = (
+        provider.quote_name(OccupationSearchDaily._adict_[name].column)
+        for name in ('title', 'language', 'day', 'search_count')
+    )
+    insert = (f"INSERT INTO {table} ({title}, {language}, {day}, {search_count}) "
+              f"VALUES ({placeholder}, {placeholder}, {placeholder}, {placeholder})")
+    if provider.dialect == 'MySQL':
+        return f"{insert} ON DUPLICATE KEY UPDATE {search_count} = {search_count} + VALUES({search_count})"
+    return (f"{insert} ON CONFLICT ({title}, {language}, {day}) "
+            f"DO UPDATE SET {search_count} = {search_count} + excluded.{search_count}")
+
+def _insert_sql(entity, fields) -> str:
+    """生成按字段顺序插入一行的INSERT语句,用于executemany批量写入"""
+    provider = db.provider
+    placeholder = '?' if provider.paramstyle == 'qmark' else '%s'
+    columns = [provider.quote_name(entity._adict_[field].column) for field in fields]
+    return (f"INSERT INTO {provider.quote_name(entity._table_)} ({', '.join(columns)}) "
+            f"VALUES ({', '.join([placeholder] * len(columns))})")
+
+def _update_sql(entity, fields, key: str = 'id') -> str:
+    """生成按主键更新一行的UPDATE语句,参数顺序为 fields 各字段值加主键值"""
+    provider = db.provider
+    placeholder = '?' if provider.paramstyle == 'qmark' else '%s'
+    assignments = ', '.join(f"{provider.quote_name(entity._adict_[field].column)} = {placeholder}" for field in fields)
+    return (f"UPDATE {provider.quote_name(entity._table_)} SET {assignments} "
+            f"WHERE {provider.quote_name(entity._adict_[key].column)} = {placeholder}")
+
+def _executemany(sql: str, rows: list):
+    """在当前db_session的事务中批量执行写入语句,一次往返写入所有行,并计入SQL指标"""
+    if not rows:
+        return
+    start_time = time.perf_counter()
+    db.get_connection().cursor().executemany(sql, rows)
+    record_db_query(sql, time.perf_counter() - start_time)
+
+def _add_search_daily_counts(counts: Counter):
+    """
+    在当前事务中累加按天汇总的搜索次数
+    
+    参数:
+        counts: (title, language, day) 到次数的计数
+    """
+    if not counts:
+        return
+    rows = [(title, language, day, n) for (title, language, day), n in counts.items()]
+    _executemany(_search_daily_upsert_sql(), rows)
+
+@sql_traced
 @db_session
+def _write_occupation_search_records(records: list):
+    """
+    在一个事务中批量写入职业搜索记录并累加按天汇总计数,由后写缓冲区调用
+    
+    参数:
+        records: (title, language, client_ip, search_time) 元组列表
+    """
+    daily_counts = Counter()
+    rows = []
+    for title, language, client_ip, search_time in records:
+        rows.append((title, language, client_ip or '', search_time))
+        daily_counts[(title, language, search_time.date())] += 1
+    _executemany(_insert_sql(OccupationSearchRecord, ('title', 'language', 'client_ip', 'search_time')), rows)
+    _add_search_daily_counts(daily_counts)
+
+@sql_traced
+@db_session
+def rebuild_occupation_search_daily(chunk_size: int = 10000):
+    """
+    根据原始搜索记录重建按天汇总表,用于首次部署或修复数据
+    
+    参数:
+        chunk_size: 每次读取的原始记录数
+        
+    返回:
+        重建的汇总行数
+    """
+    OccupationSearchDaily.select().delete(bulk=True)
+    daily_counts = Counter()
+    last_id = 0
+    while True:
+        rows = select(
+            (r.id, r.title, r.language, r.search_time) for r in OccupationSearchRecord if r.id > last_id
+        ).order_by(1).limit(chunk_size)[:]
+        if not rows:
+            break
+        for record_id, title, language, search_time in rows:
+            daily_counts[(title, language, search_time.date())] += 1
+        last_id = rows[-1][0]
+    _add_search_daily_counts(daily_counts)
+    logger.info(f"职业搜索按天汇总重建完成: {len(daily_counts)} 行")
+    return len(daily_counts)
+
+# 职业搜索记录后写缓冲区,请求路径只入队,由后台线程批量提交
+search_record_buffer = WriteBehindBuffer(
+    "occupation_search",
+    _write_occupation_search_records,
+    batch_size=SEARCH_LOG_BATCH_SIZE,
+    flush_interval=SEARCH_LOG_FLUSH_INTERVAL,
+    max_pending=SEARCH_LOG_MAX_PENDING,
+    overflow=SEARCH_LOG_OVERFLOW,
+    max_retries=SEARCH_LOG_MAX_RETRIES,
+    retry_backoff=SEARCH_LOG_RETRY_BACKOFF
+)
+
 def record_occupation_search(title: str, language: str, client_ip: str = None):
     """
-    记录职业搜索
+    记录职业搜索,记录先进入后写缓冲区,稍后批量写入数据库
     
     参数:
         title: 搜索的职业名称
         language: 使用的语言
         client_ip: 客户端IP地址
+        
+    返回:
+        记录被接受返回True,缓冲区已满被丢弃返回False
     """
     try:
-        OccupationSearchRecord(
-            title=title, 
-            language=language, 
-            client_ip=client_ip
-        )
-        # 因为使用了@db_session装饰器，提交是自动的
-        return True
+        return search_record_buffer.put((title, language, client_ip, datetime.now()))
     except Exception as e:
         logger.error(f"记录职业搜索失败, 职业: {title}, 错误: {str(e)}", exc_info=True)
         return False
@@ -233,152 +431,434 @@ def add_feedback(feedback_type: str, feedback_content: str, client_ip: str = Non
         logger.error(f"添加反馈失败: {str(e)}", exc_info=True)
         return None
 
+FEEDBACK_CURSOR_TYPES = (str, int)  # (反馈时间ISO格式, 反馈ID)
+
+def _parse_feedback_cursor(cursor: str) -> tuple:
+    """解码反馈列表游标为 (反馈时间, 反馈ID),不合法时抛出ValueError"""
+    feedback_time, feedback_id = decode_cursor(cursor, FEEDBACK_CURSOR_TYPES)
+    try:
+        return datetime.fromisoformat(feedback_time), feedback_id
+    except ValueError:
+        raise ValueError("无效的分页游标")
+
 @db_session
-def get_feedbacks(days: int = 30, limit: int = 50):
+def get_feedbacks(days: int = 30, limit: int = 50, cursor: str = None, feedback_type: str = None,
+                  start_date: date = None, end_date: date = None):
     """
-    获取反馈列表
+    获取反馈列表,按 (反馈时间, ID) 倒序键集分页
+    
+    每页从上一页最后一条的 (feedback_time, id) 处沿索引继续读取 limit+1 行,
+    翻页耗时与页码和表大小无关。指定反馈类型时使用 (feedback_type, feedback_time, id) 索引。
     
     参数:
-        days: 最近几天的数据
-        limit: 返回的结果数量
+        days: 最近几天的数据(从days天前的0点至今),指定 start_date 时忽略
+        limit: 每页数量
+        cursor: 上一页返回的游标,为空表示第一页
+        feedback_type: 只返回该类型的反馈,为空表示全部类型
+        start_date: 起始日期(含)
+        end_date: 结束日期(含)
         
     返回:
-        反馈列表
+        (反馈列表, 下一页游标), 没有更多数据时游标为None; cursor不合法时抛出ValueError
     """
+    after = _parse_feedback_cursor(cursor) if cursor else None
     try:
-        from_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        from_date = from_date.replace(day=from_date.day - days)
-        
-        # 构建查询条件
-        conditions = [FeedbackRecord.feedback_time >= from_date]
+        if start_date is None:
+            start_date = date.today() - timedelta(days=max(days, 0))
+        from_time = datetime.combine(start_date, datetime.min.time())
         
+        query = FeedbackRecord.select(lambda f: f.feedback_time >= from_time)
+        if end_date is not None:
+            to_time = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+            query = query.filter(lambda f: f.feedback_time < to_time)
+        if feedback_type:
+            query = query.filter(lambda f: f.feedback_type == feedback_type)
+        if after is not None:
+            after_time, after_id = after
+            # 写成 时间<=t 的范围条件加同一时间内的ID比较,数据库可以直接在索引上定位
+            query = query.filter(lambda f: f.feedback_time <= after_time and
+                                 (f.feedback_time < after_time or f.id < after_id))
+        query = query.order_by(desc(FeedbackRecord.feedback_time), desc(FeedbackRecord.id))
         
-        # 执行查询
-        query = FeedbackRecord.select(lambda f: all(c(f) for c in conditions))
-        query = query.order_by(lambda f: f.feedback_time, desc=True)
-        query = query.limit(limit)
-        
-        # 转换为字典列表
-        feedbacks = [f.to_dict() for f in query]
+        # 多取一行判断是否还有下一页
+        limit = max(limit, 0)
+        rows = query.limit(limit + 1)[:]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor((rows[-1].feedback_time.isoformat(), rows[-1].id))
         
+        feedbacks = [f.to_dict() for f in rows]
         logger.info(f"获取反馈列表成功: {len(feedbacks)} 条")
-        return feedbacks
+        return feedbacks, next_cursor
     except Exception as e:
         logger.error(f"获取反馈列表失败: {str(e)}", exc_info=True)
-        return []
+        return [], None
 
 @db_session
 def get_popular_occupation_searches(limit: int = 10, days: int = 30):
     """
-    获取最近一段时间内热门搜索的职业
+    获取最近一段时间内热门搜索的职业,基于按天汇总表,最多读取 days+1 天的汇总行
     
     参数:
         limit: 返回的结果数量
-        days: 最近几天的数据
+        days: 最近几天的数据(从days天前的0点至今)
         
     返回:
         包含职业名称和搜索次数的列表
     """
     try:
-        from_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        from_date = from_date.replace(day=from_date.day - days)
+        today = date.today()
+        from_day = today - timedelta(days=max(days, 0))
         
         # 查询最近days天内搜索次数最多的职业
-        query = select((r.title, count(r)) for r in OccupationSearchRecord 
-                      if r.search_time >= from_date)
-        query = query.order_by(lambda t: t[1], desc=True)
+        # 写成闭区间: 只有 day>=? 时SQLite会改为顺序遍历 (title, language, day) 组合键以省去分组排序,
+        # 有上下界时才会在 idx_search_daily_day 上按日期范围读取
+        query = select((d.title, sum(d.search_count)) for d in OccupationSearchDaily 
+                      if d.day >= from_day and d.day <= today)
+        query = query.order_by(-2)
         query = query.limit(limit)
         
         # 构建结果
         results = [{
             "title": title,
-            "count": count
-        } for title, count in query]
+            "count": search_count
+        } for title, search_count in query]
         
         return results
     except Exception as e:
         logger.error(f"获取热门职业搜索失败: {str(e)}", exc_info=True)
         return []
 
+# 导出的任务字段(与规范化之前的EconIndex字段相同)及附加的职业统计字段
+EXPORT_FIELDS = (
+    'id', 'onet_soc_code', 'title', 'task_id', 'task', 'task_type', 'incumbents_responding', 'date',
+    'domain_source', 'percentage', 'title_cn', 'task_cn', 'automated_score', 'automated_score_reason'
+)
+EXPORT_STATS_FIELDS = ('percentage_sum', 'percentage_non_zero', 'automated_score_avg')
+
+def iter_econ_index_rows(title: str = None, language: str = 'en', soc_prefix: str = None, task_type: str = None,
+                         non_zero: bool = False, include_stats: bool = False, chunk_size: int = 1000):
+    """
+    按主键分块流式读取任务数据,内存占用与数据总量无关
+    
+    每块在独立的db_session中按 id > 上一块最大id 读取,块与块之间不持有数据库连接和实体缓存;
+    每块一条关联 Occupation/TaskText/查找表 的查询,直接读取字段元组,不创建实体对象
+    
+    参数:
+        title: 只导出该职业
+        language: title的语言 ('en' 或 'cn')
+        soc_prefix: 只导出O*NET-SOC代码以此开头的职业
+        task_type: 只导出该任务类型
+        non_zero: 只导出百分比大于0的任务
+        include_stats: 是否附加该职业的EconIndexStats统计字段
+        chunk_size: 每块读取的行数
+        
+    返回:
+        逐块产生行字典列表的生成器,字段见 EXPORT_FIELDS
+    """
+    last_id = 0
+    while True:
+        with db_session:
+            # 字段顺序与 EXPORT_FIELDS 一致; 元组查询默认去重,导出需保留所有行
+            query = select(
+                (t.id, t.occupation.onet_soc_code, t.occupation.title, t.task_id, t.text.content, t.task_type.name,
+                 t.incumbents_responding, t.date.name, t.domain_source.name, t.percentage, t.occupation.title_cn,
+                 t.text.content_cn, t.automated_score, t.text.automated_score_reason)
+                for t in Task if t.id > last_id
+            ).without_distinct()
+            # 元组查询的 filter 按结果列传参, where 按循环变量名传参
+            if title:
+                if language == 'en':
+                    query = query.where(lambda t: t.occupation.title == title)
+                else:
+                    query = query.where(lambda t: t.occupation.title_cn == title)
+            if soc_prefix:
+                query = query.where(lambda t: t.occupation.onet_soc_code.startswith(soc_prefix))
+            if task_type:
+                query = query.where(lambda t: t.task_type.name == task_type)
+            if non_zero:
+                query = query.where(lambda t: t.percentage > 0)
+            rows = [dict(zip(EXPORT_FIELDS, row)) for row in query.order_by(1).limit(chunk_size)]
+            if not rows:
+                return
+            
+            if include_stats:
+                titles = list({row['title'] for row in rows})
+                stats = {s.title: s for s in EconIndexStats.select(lambda s: s.title in titles)}
+                for row in rows:
+                    stat = stats.get(row['title'])
+                    for field in EXPORT_STATS_FIELDS:
+                        row[field] = getattr(stat, field) if stat else None
+            last_id = rows[-1]['id']
+        yield rows
+        if len(rows) < chunk_size:
+            return
+
+# 增量统计时每条IN查询包含的职业数,避免超出SQLite参数个数限制
+STATS_TITLE_CHUNK_SIZE = 500
+
+def _aggregate_occupation_stats(titles: list = None) -> list:
+    """
+    一次分组聚合计算职业统计数据
+    
+    参数:
+        titles: 只统计这些职业,None表示全部职业
+        
+    返回:
+        (title, title_cn, percentage_sum, non_zero_count, task_count, automated_score_avg) 元组列表
+    """
+    # 条件表达式无法从生成器反编译,使用字符串形式的查询;只读取Task数值列并关联Occupation
+    if titles is None:
+        query = select(
+            "(t.occupation.title, min(t.occupation.title_cn), sum(t.percentage), sum(1 if t.percentage > 0 else 0), "
+            "count(t), avg(t.automated_score)) for t in Task"
+        )
+    else:
+        query = select(
+            "(t.occupation.title, min(t.occupation.title_cn), sum(t.percentage), sum(1 if t.percentage > 0 else 0), "
+            "count(t), avg(t.automated_score)) for t in Task if t.occupation.title in titles"
+        )
+    return query[:]
+
+@sql_traced
 @db_session
-def update_occupation_stats():
+def update_occupation_stats(titles: list = None):
     """
     更新职业统计数据到 EconIndexStats 表
     统计每个职业的：
     1. 所有任务百分比之和
-    2. 非零任务的平均百分比
+    2. 非零任务占比
     3. 自动化分数的平均值
+    
+    参数:
+        titles: 增量模式下需要重新统计的职业(英文名)列表,None表示全量重建
+        
+    返回:
+        成功返回True,失败返回False
     """
     try:
-        # 清空现有统计数据
-        EconIndexStats.select().delete()
+        if titles is None:
+            # 全量重建: 清空后一次分组聚合
+            EconIndexStats.select().delete(bulk=True)
+            rows = _aggregate_occupation_stats()
+        else:
+            # 增量模式: 只删除并重算受影响的职业,已不存在的职业统计会被直接删除
+            titles = list(set(titles))
+            rows = []
+            for i in range(0, len(titles), STATS_TITLE_CHUNK_SIZE):
+                chunk = titles[i:i + STATS_TITLE_CHUNK_SIZE]
+                EconIndexStats.select(lambda s: s.title in chunk).delete(bulk=True)
+                rows.extend(_aggregate_occupation_stats(chunk))
         
-        # 获取所有不同的职业
-        unique_titles = select((e.title, e.title_cn) for e in EconIndex).distinct()
+        # 一条INSERT语句批量写入,避免逐个创建实体时每个职业一次INSERT
+        _executemany(
+            _insert_sql(EconIndexStats, ('title', 'title_cn', 'percentage_sum', 'percentage_non_zero', 'automated_score_avg')),
+            [
+                (
+                    title,
+                    title_cn,
+                    percentage_sum or 0.0,
+                    non_zero_count / task_count if task_count else 0.0,
+                    automated_score_avg or 0.0
+                )
+                for title, title_cn, percentage_sum, non_zero_count, task_count, automated_score_avg in rows
+            ]
+        )
         
-        # 对每个职业进行统计
-        for title, title_cn in unique_titles:
-            # 获取该职业的所有任务
-            tasks = select(e for e in EconIndex if e.title == title)
-            
-            # 计算统计数据
-            percentage_sum = sum(t.percentage for t in tasks)
-            automated_score_avg = avg(t.automated_score for t in tasks)
-            
-            # 计算非零任务的平均百分比
-            # 计算非零任务占比
-            all_tasks = select(e for e in EconIndex if e.title == title)
-            non_zero_tasks = select(e for e in EconIndex if e.title == title and e.percentage > 0)
-            percentage_non_zero = len(non_zero_tasks) / len(all_tasks) if len(all_tasks) > 0 else 0
-            
-            # 创建统计记录
-            EconIndexStats(
-                title=title,
-                title_cn=title_cn,
-                percentage_sum=percentage_sum,
-                percentage_non_zero=percentage_non_zero if percentage_non_zero else 0.0,
-                automated_score_avg=automated_score_avg if automated_score_avg else 0.0
-            )
+        # 统计数据已变化: 版本号与统计数据在同一事务中提交,
+        # 提交成功后才更新进程内的版本号并丢弃内存快照,提交失败时两者都保持不变
+        version = increment_dataset_version()
+        commit()
+        publish_dataset_version(version)
+        invalidate_snapshot()
         
-        logger.info("职业统计数据更新完成")
+        mode = "全量" if titles is None else "增量"
+        logger.info(f"职业统计数据更新完成({mode}): {len(rows)} 个职业")
         return True
     except Exception as e:
+        # 回滚,避免提交只删除了一半的统计数据
+        rollback()
         logger.error(f"更新职业统计数据失败: {str(e)}", exc_info=True)
         return False
 
 @timer
-@db_session
-def get_top_tasks_by_percentage(limit: int = 10) -> list:
+def get_top_tasks_by_percentage(limit: int = 10, order: str = "desc", cursor: str = None, encoded: bool = False):
     """
     获取所有职业中对话占比最高的任务,去除重复的任务
     
     参数:
-        limit: 返回的任务数量
+        limit: 每页返回的任务数量
+        order: 排序方向 ('desc' 或 'asc')
+        cursor: 上一页返回的游标,为空表示第一页
+        encoded: 为True时每个任务以预编码的JSON片段(fast_json.Fragment)返回
         
     返回:
-        按对话占比排序的任务列表,相同任务只保留占比最高的一条
+        (按对话占比排序的任务列表, 下一页游标), 没有更多数据时游标为None;
+        order或cursor不合法时抛出ValueError,读取失败时抛出异常,不返回会被缓存的空结果
     """
-    try:
-        # 获取前limit个独特任务并按百分比排序
-        all_tasks = select((e.task, e.task_cn, e.title, e.title_cn, e.percentage, e.automated_score, e.automated_score_reason) 
-                          for e in EconIndex).distinct().order_by(lambda t, tc, ti, tic, p, a, ar: desc(p)).limit(limit)
-        
-        result = []
-
-        # 遍历并去重
-        for task in all_tasks:
-            task_dict = {
-                "task": task[0],  # task
-                "task_cn": task[1],  # task_cn
-                "occupation": task[2],  # title
-                "occupation_cn": task[3],  # title_cn
-                "percentage": task[4],  # percentage
-                "automated_score": task[5],  # automated_score
-                "automated_score_reason": task[6]  # automated_score_reason
-            }
-            result.append(task_dict)
-            
+    descending, after = _parse_page_params(order, cursor, TASKS_CURSOR_TYPES)
+    tasks, next_key = get_snapshot().top_tasks(limit, descending, after, encoded)
+    return tasks, encode_cursor(next_key)
+
+# 任务记录字段: 导入数据和合成数据使用的扁平格式,写入时拆分到 Occupation/Task/TaskText 及查找表
+TASK_RECORD_FIELDS = EXPORT_FIELDS[1:]
+# 记录字段 -> 查找表实体
+LOOKUP_FIELDS = {'task_type': TaskType, 'date': RatingDate, 'domain_source': DomainSource}
+TASK_FIELDS = ('occupation', 'task_id', 'task_type', 'incumbents_responding', 'date', 'domain_source',
+               'percentage', 'automated_score')
+TASK_TEXT_FIELDS = ('content', 'content_cn', 'automated_score_reason')
+
+class TaskWriter:
+    """
+    按 (onet_soc_code, task_id) 批量插入或更新任务记录
+    
+    - load_existing 一次性读取已有职业、查找表和任务的键,之后判断插入或更新不再查询数据库
+    - 职业名、任务类型、日期、数据来源写入前转换为职业/查找表的主键,每个不同的值只存一份
+    - 新行的主键由写入器按已有最大值递增分配,任务和长文本可在同一批 executemany 中写入;
+      因此同一时间只能有一个写入器(导入脚本或基准数据生成)写入任务数据,
+      load_existing 时获取独占写入锁,另一个写入器持有锁时抛出RuntimeError,close 时释放
+    """
+    LOCK_NAME = "task_writer"
+
+    def __init__(self):
+        self.occupations = {}  # onet_soc_code -> [id, title, title_cn]
+        self.lookups = {field: {} for field in LOOKUP_FIELDS}  # 字段 -> {名称: id}
+        self.tasks = {}  # (onet_soc_code, task_id) -> 任务主键
+        self.next_ids = {}
+        self.touched_titles = set()
+        self.was_empty = True
+        self.lock = WriterLock(self.LOCK_NAME)
+
+        self.task_insert_sql = _insert_sql(Task, ('id',) + TASK_FIELDS)
+        self.task_update_sql = _update_sql(Task, TASK_FIELDS)
+        self.text_insert_sql = _insert_sql(TaskText, ('task',) + TASK_TEXT_FIELDS)
+        self.text_update_sql = _update_sql(TaskText, TASK_TEXT_FIELDS, key='task')
+        self.occupation_insert_sql = _insert_sql(Occupation, ('id', 'onet_soc_code', 'title', 'title_cn'))
+        self.occupation_update_sql = _update_sql(Occupation, ('title', 'title_cn'))
+
+    def load_existing(self):
+        """获取写入锁并读取已有记录的键,锁已被其他写入器持有时抛出RuntimeError"""
+        self.lock.acquire()
+        try:
+            self._load_keys()
+        except Exception:
+            self.lock.release()
+            raise
+
+    def close(self):
+        """释放写入锁"""
+        self.lock.release()
+
+    @db_session
+    def _load_keys(self):
+        for pk, code, title, title_cn in select((o.id, o.onet_soc_code, o.title, o.title_cn) for o in Occupation):
+            self.occupations[code] = [pk, title, title_cn]
+        for field, entity in LOOKUP_FIELDS.items():
+            self.lookups[field] = dict(select((x.name, x.id) for x in entity)[:])
+            self.next_ids[entity] = max(self.lookups[field].values(), default=0) + 1
+        codes = {pk: code for code, (pk, _, _) in self.occupations.items()}
+        rows = select((t.occupation.id, t.task_id, t.id) for t in Task).without_distinct()
+        self.tasks = {(codes[occupation_id], task_id): pk for occupation_id, task_id, pk in rows}
+        self.next_ids[Occupation] = max((pk for pk, _, _ in self.occupations.values()), default=0) + 1
+        self.next_ids[Task] = max(self.tasks.values(), default=0) + 1
+        self.was_empty = not self.tasks
+
+    def write(self, records: list):
+        """
+        在一个事务中写入一批记录,提交成功后才把本批新增的键和主键合并到写入器状态,
+        写入失败时写入器状态不变,可以继续写入后续批次
+
+        参数:
+            records: 字段见 TASK_RECORD_FIELDS 的字典列表,(onet_soc_code, task_id) 在批内不能重复
+
+        返回:
+            (新增数, 更新数)
+        """
+        batch = {
+            'occupations': {},  # 本批新增或改名的职业
+            'lookups': {field: {} for field in LOOKUP_FIELDS},
+            'tasks': {},
+            'next_ids': dict(self.next_ids),
+            'touched_titles': set(),
+        }
+        result = self._write_batch(records, batch)
+        self.occupations.update(batch['occupations'])
+        for field, names in batch['lookups'].items():
+            self.lookups[field].update(names)
+        self.tasks.update(batch['tasks'])
+        self.next_ids = batch['next_ids']
+        self.touched_titles |= batch['touched_titles']
         return result
-    except Exception as e:
-        logger.error(f"获取对话占比最高任务失败: {str(e)}", exc_info=True)
-        return []
+
+    @sql_traced
+    @db_session
+    def _write_batch(self, records: list, batch: dict):
+        """
+        生成并执行一批记录的INSERT/UPDATE,新分配的键和主键只记录在batch中
+
+        参数:
+            records: 记录字典列表
+            batch: write 创建的本批状态
+        """
+        next_ids = batch['next_ids']
+
+        def next_id(entity) -> int:
+            pk = next_ids[entity]
+            next_ids[entity] = pk + 1
+            return pk
+
+        occupations, lookups, tasks, touched_titles = (
+            batch['occupations'], batch['lookups'], batch['tasks'], batch['touched_titles']
+        )
+        lookup_inserts = {entity: [] for entity in LOOKUP_FIELDS.values()}
+        occupation_inserts, occupation_updates = [], {}
+        task_inserts, text_inserts, task_updates, text_updates = [], [], [], []
+        for record in records:
+            code = record['onet_soc_code']
+            occupation = occupations.get(code) or self.occupations.get(code)
+            if occupation is None:
+                occupation = occupations[code] = [next_id(Occupation), record['title'], record['title_cn']]
+                occupation_inserts.append((occupation[0], code, record['title'], record['title_cn']))
+            elif occupation[1:] != [record['title'], record['title_cn']]:
+                # 职业改名,原职业名的统计也需要重算
+                touched_titles.add(occupation[1])
+                occupation = occupations[code] = [occupation[0], record['title'], record['title_cn']]
+                occupation_updates[occupation[0]] = (record['title'], record['title_cn'], occupation[0])
+            touched_titles.add(record['title'])
+
+            lookup_ids = {}
+            for field, entity in LOOKUP_FIELDS.items():
+                name = record[field]
+                pk = lookups[field].get(name) or self.lookups[field].get(name)
+                if pk is None:
+                    pk = lookups[field][name] = next_id(entity)
+                    lookup_inserts[entity].append((pk, name))
+                lookup_ids[field] = pk
+
+            values = (
+                occupation[0], record['task_id'], lookup_ids['task_type'], record['incumbents_responding'],
+                lookup_ids['date'], lookup_ids['domain_source'], record['percentage'], record['automated_score']
+            )
+            text = (record['task'], record['task_cn'], record['automated_score_reason'])
+            key = (code, record['task_id'])
+            pk = tasks.get(key) or self.tasks.get(key)
+            if pk is None:
+                pk = tasks[key] = next_id(Task)
+                task_inserts.append((pk,) + values)
+                text_inserts.append((pk,) + text)
+            else:
+                task_updates.append(values + (pk,))
+                text_updates.append(text + (pk,))
+
+        # 先写被引用的查找表和职业,再写任务和长文本
+        for entity, rows in lookup_inserts.items():
+            _executemany(_insert_sql(entity, ('id', 'name')), rows)
+        _executemany(self.occupation_insert_sql, occupation_inserts)
+        _executemany(self.occupation_update_sql, list(occupation_updates.values()))
+        _executemany(self.task_insert_sql, task_inserts)
+        _executemany(self.text_insert_sql, text_inserts)
+        _executemany(self.task_update_sql, task_updates)
+        _executemany(self.text_update_sql, text_updates)
+        return len(task_inserts), len(task_updates)
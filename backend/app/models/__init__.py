@@ -8,7 +8,10 @@ from app.models.database import (
     is_db_initialized
 )
 
-from app.models.EconIndex import EconIndex, EconIndexStats, get_title_percentage
+from app.models.EconIndex import Occupation, Task, TaskText, EconIndexStats, get_title_percentage
+from app.models.dataset_version import DatasetVersion, get_dataset_version, bump_dataset_version
+from app.models.migrations import SchemaMigration, SchemaState, run_migrations, check_query_plans
+from app.models.snapshot import write_snapshot_file
 
 # 导出公共API
 __all__ = [
@@ -16,6 +19,16 @@ __all__ = [
     'setup_database', 
     'get_title_percentage', 
     'is_db_initialized', 
-    'EconIndex',
+    'Occupation',
+    'Task',
+    'TaskText',
     'EconIndexStats',
+    'DatasetVersion',
+    'get_dataset_version',
+    'bump_dataset_version',
+    'SchemaMigration',
+    'SchemaState',
+    'run_migrations',
+    'check_query_plans',
+    'write_snapshot_file',
 ] 
\ No newline at end of file
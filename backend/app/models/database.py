@@ -3,10 +3,16 @@
 """
 import os
 import logging
+import sqlite3
+import threading
+import time
 from pony.orm import *
 from pathlib import Path
 from datetime import datetime
 
+from app.core.config import SQLITE_TUNING, SQLITE_PRAGMAS, SQLITE_READONLY_READER
+from app.utils.metrics import instrument_database, record_db_query
+
 # 获取日志记录器
 logger = logging.getLogger(__name__)
 
@@ -16,6 +22,32 @@ db = Database()
 # 数据库初始化状态
 _is_initialized = False
 
+# SQLite数据库文件路径及每个线程的只读连接
+_sqlite_filename = None
+_readonly_local = threading.local()
+
+def apply_sqlite_pragmas(connection, readonly: bool = False):
+    """
+    在SQLite连接上执行性能配置 SQLITE_PRAGMAS
+    
+    参数:
+        connection: sqlite3连接
+        readonly: 是否只读连接,只读连接不修改journal_mode(它是数据库文件级别的设置)
+    """
+    for name, value in SQLITE_PRAGMAS.items():
+        if readonly and name == 'journal_mode':
+            continue
+        connection.execute(f"PRAGMA {name} = {value}")
+    if readonly:
+        connection.execute("PRAGMA query_only = 1")
+
+class TunedSQLiteConnection(sqlite3.Connection):
+    """建立时自动执行性能配置的SQLite连接,作为factory传给Pony,对Pony创建的每个连接生效"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        apply_sqlite_pragmas(self)
+
 def setup_database(db_type, db_config):
     """
     设置数据库连接并初始化表结构
@@ -43,10 +75,23 @@ def setup_database(db_type, db_config):
         else:
             _connect_sqlite(db_config)
         
-        # 创建表
-        logger.info("开始创建数据库表")
-        db.generate_mapping(create_tables=True)
-        logger.info("数据库表创建成功")
+        # 统计所有经过Pony执行的SQL
+        instrument_database(db)
+        
+        # 只生成映射,表结构与上次启动时一致则跳过建表检查和迁移
+        db.generate_mapping(create_tables=False, check_tables=False)
+        from app.models.migrations import run_migrations, schema_up_to_date, record_schema_state
+        if schema_up_to_date():
+            logger.info("数据库表结构版本一致,跳过建表和迁移")
+        else:
+            # 创建表
+            logger.info("开始创建数据库表")
+            db.create_tables(check_tables=True)
+            logger.info("数据库表创建成功")
+            
+            # 执行尚未执行的结构迁移(索引等)
+            run_migrations()
+            record_schema_state()
         
         # 标记为已初始化
         _is_initialized = True
@@ -80,10 +125,120 @@ def _connect_sqlite(db_config):
     
     logger.info(f"连接到SQLite数据库: {db_path}")
     
-    # 连接SQLite
+    global _sqlite_filename
+    _sqlite_filename = db_path
+    
+    # 连接SQLite,启用性能配置时每个连接建立后执行PRAGMA
+    if SQLITE_TUNING:
+        config = {**config, 'factory': TunedSQLiteConnection}
+        logger.info(f"SQLite性能配置: {SQLITE_PRAGMAS}")
     db.bind(provider='sqlite', **config)
     logger.info("SQLite数据库连接成功")
 
 def is_db_initialized():
     """检查数据库是否已初始化"""
-    return _is_initialized
\ No newline at end of file
+    return _is_initialized
+
+def get_readonly_connection():
+    """
+    获取当前线程的SQLite只读连接(URI mode=ro)
+    
+    只读连接不参与Pony的事务和写锁,只用于读取任务数据等只读数据;
+    每个线程一个连接,首次调用时创建
+    
+    返回:
+        sqlite3连接,非SQLite数据库、内存数据库或未启用 SQLITE_READONLY_READER 时返回None
+    """
+    if not SQLITE_READONLY_READER or not _sqlite_filename or _sqlite_filename.startswith(':'):
+        return None
+    connection = getattr(_readonly_local, 'connection', None)
+    if connection is None:
+        uri = f"{Path(_sqlite_filename).resolve().as_uri()}?mode=ro"
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        if SQLITE_TUNING:
+            apply_sqlite_pragmas(connection, readonly=True)
+        _readonly_local.connection = connection
+    return connection
+
+def select_readonly(sql: str) -> list:
+    """
+    执行只读查询,优先使用只读连接,否则通过Pony在当前db_session中执行
+    
+    参数:
+        sql: 不带参数的SELECT语句
+        
+    返回:
+        结果行(元组)列表
+    """
+    connection = get_readonly_connection()
+    if connection is not None:
+        start = time.perf_counter()
+        rows = connection.execute(sql).fetchall()
+        record_db_query(sql, time.perf_counter() - start)
+        return rows
+    return [tuple(row) for row in db.select(sql)]
+
+
+class WriterLock:
+    """
+    进程间的独占写入锁,用于保证同一时间只有一个写入器
+    
+    - SQLite: 对数据库文件旁的 <数据库文件名>.<name>.lock 加非阻塞文件锁,进程退出时系统自动释放
+    - MySQL: GET_LOCK(name, 0),锁属于当前线程的数据库连接,连接断开时自动释放
+    - SQLite内存数据库只在本进程内可见,使用进程内的锁
+    
+    参数:
+        name: 锁名
+    """
+    _local_locks = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self._fp = None
+        self._held = False
+
+    def acquire(self):
+        """获取锁,已被其他写入器持有时抛出RuntimeError"""
+        if self._held:
+            return
+        if db.provider.dialect == 'MySQL':
+            with db_session:
+                acquired = db.select("SELECT GET_LOCK($self.name, 0)")[0]
+        elif not _sqlite_filename or _sqlite_filename.startswith(':'):
+            lock = WriterLock._local_locks.setdefault(self.name, threading.Lock())
+            acquired = lock.acquire(blocking=False)
+        else:
+            acquired = self._lock_file(f"{os.path.splitext(_sqlite_filename)[0]}.{self.name}.lock")
+        if not acquired:
+            raise RuntimeError(f"写入锁 {self.name} 已被其他写入器持有,同一时间只能有一个写入器")
+        self._held = True
+
+    def _lock_file(self, path: str) -> bool:
+        """对锁文件加非阻塞独占锁,成功时保持文件打开直到release"""
+        fp = open(path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                msvcrt.locking(fp.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fp.close()
+            return False
+        self._fp = fp
+        return True
+
+    def release(self):
+        """释放锁"""
+        if not self._held:
+            return
+        self._held = False
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        elif db.provider.dialect == 'MySQL':
+            with db_session:
+                db.select("SELECT RELEASE_LOCK($self.name)")
+        else:
+            WriterLock._local_locks[self.name].release()
@@ -0,0 +1,179 @@
+"""
+数据集版本模块 - 记录EconIndex数据的版本号,导入数据或更新统计时递增,供缓存校验使用
+
+多个uvicorn worker或导入脚本各自运行在独立进程中,每个进程通过 check_dataset_version()
+按 DATASET_VERSION_CHECK_INTERVAL 间隔检测版本变化,检测到变化时恰好执行一次已注册的失效回调
+"""
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pony.orm import PrimaryKey, Required, db_session
+
+from app.models.database import db
+from app.core.config import logger, DB_TYPE, DB_CONFIG, DATASET_VERSION_CHECK_INTERVAL
+
+# 版本记录固定使用的主键
+_VERSION_ROW_ID = 1
+
+class DatasetVersion(db.Entity):
+    """数据集版本记录,表中只有一行"""
+    id = PrimaryKey(int)
+    version = Required(int)
+    updated_at = Required(datetime, default=datetime.now)
+
+# 进程内缓存的版本号
+_current_version = None
+_version_lock = threading.Lock()
+
+# 版本变化时需要执行的失效回调
+_change_callbacks = []
+
+# 上次检测时间(time.monotonic)
+_last_check = 0.0
+
+# SQLite专用的检测连接及上次读到的 PRAGMA data_version
+_probe_connection = None
+_probe_data_version = None
+
+@db_session
+def load_dataset_version() -> int:
+    """
+    从数据库读取数据集版本号
+    
+    返回:
+        版本号,尚未导入过数据时为0
+    """
+    row = DatasetVersion.get(id=_VERSION_ROW_ID)
+    return row.version if row else 0
+
+def get_dataset_version() -> int:
+    """
+    获取数据集版本号,首次调用时从数据库读取,之后使用进程内缓存
+    
+    返回:
+        版本号
+    """
+    global _current_version
+    version = _current_version
+    if version is None:
+        with _version_lock:
+            if _current_version is None:
+                _current_version = load_dataset_version()
+            version = _current_version
+    return version
+
+def increment_dataset_version() -> int:
+    """
+    在调用方的事务中递增数据库中的版本号,与数据修改一起提交
+
+    不更新进程内缓存: 调用方提交事务之后再调用 publish_dataset_version,
+    避免缓存的版本号领先于已提交的数据(提交失败时版本号也不会前进)
+    
+    返回:
+        新的版本号
+    """
+    row = DatasetVersion.get_for_update(id=_VERSION_ROW_ID)
+    if row is None:
+        row = DatasetVersion(id=_VERSION_ROW_ID, version=1)
+    else:
+        row.version += 1
+        row.updated_at = datetime.now()
+    return row.version
+
+def publish_dataset_version(version: int):
+    """
+    事务提交后更新进程内缓存的版本号
+    
+    参数:
+        version: increment_dataset_version 返回并已提交的版本号
+    """
+    global _current_version
+    with _version_lock:
+        if _current_version is None or version > _current_version:
+            _current_version = version
+    logger.info(f"数据集版本已更新为: {version}")
+
+def bump_dataset_version() -> int:
+    """
+    在独立事务中递增版本号并提交,提交后更新进程内缓存
+    
+    用于数据修改已经单独提交的场景(如导入脚本);需要与数据修改在同一事务中递增时
+    使用 increment_dataset_version + publish_dataset_version
+    
+    返回:
+        新的版本号
+    """
+    with db_session:
+        version = increment_dataset_version()
+    publish_dataset_version(version)
+    return version
+
+def on_dataset_version_change(callback):
+    """
+    注册数据集版本变化时的回调,用于丢弃或重建进程内缓存
+    
+    参数:
+        callback: 无参数的函数
+        
+    返回:
+        callback本身,可用作装饰器
+    """
+    _change_callbacks.append(callback)
+    return callback
+
+def version_check_due() -> bool:
+    """判断距上次检测是否已超过检测间隔,供请求中间件以极低开销调用"""
+    return time.monotonic() - _last_check >= DATASET_VERSION_CHECK_INTERVAL
+
+def _sqlite_data_changed() -> bool:
+    """
+    SQLite下通过 PRAGMA data_version 判断其他连接是否提交过写入
+    
+    data_version 只在其他连接提交后变化,读取它不访问任何表;
+    未变化时无需读取版本表
+    """
+    global _probe_connection, _probe_data_version
+    if _probe_connection is None:
+        _probe_connection = sqlite3.connect(DB_CONFIG['sqlite']['filename'], check_same_thread=False)
+    data_version = _probe_connection.execute("PRAGMA data_version").fetchone()[0]
+    changed = data_version != _probe_data_version
+    _probe_data_version = data_version
+    return changed
+
+def check_dataset_version() -> int:
+    """
+    检测数据集版本是否被其他进程修改,变化时执行失效回调
+    
+    SQLite先检查 PRAGMA data_version,只有数据库有过提交才读取版本表;
+    MySQL直接按主键读取版本记录。同一版本变化在本进程内只触发一次回调
+    
+    返回:
+        当前版本号
+    """
+    global _current_version, _last_check
+    with _version_lock:
+        if not version_check_due():
+            return _current_version
+        _last_check = time.monotonic()
+        try:
+            if DB_TYPE != 'mysql' and not _sqlite_data_changed() and _current_version is not None:
+                return _current_version
+            version = load_dataset_version()
+        except Exception as e:
+            logger.error(f"检测数据集版本失败: {str(e)}", exc_info=True)
+            return _current_version
+        if version == _current_version:
+            return version
+        previous = _current_version
+        _current_version = version
+    
+    # 首次加载版本号时没有需要失效的缓存
+    if previous is not None:
+        logger.info(f"检测到数据集版本变化: {previous} -> {version}, 执行缓存失效")
+        for callback in _change_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"数据集版本变化回调执行失败: {str(e)}", exc_info=True)
+    return version
@@ -0,0 +1,409 @@
+"""
+数据库迁移模块 - 按版本号顺序执行结构变更(索引及表结构调整),并提供热点查询的执行计划检查
+
+generate_mapping(create_tables=True) 只负责建表,不会创建索引,也不会修改已有表。
+结构变更以迁移的形式登记在 MIGRATIONS 中,每个迁移有递增的版本号,
+已执行的版本记录在 SchemaMigration 表里,setup_database 时自动执行尚未执行的迁移。
+建表和迁移完成后,表结构指纹(Pony生成的建表语句的哈希)和最新迁移版本记录在 SchemaState 表里,
+下次启动时两者都一致即可跳过建表检查和迁移。
+"""
+import hashlib
+from datetime import datetime
+from pony.orm import PrimaryKey, Required, db_session, select, commit
+
+from app.models.database import db
+from app.core.config import logger
+
+
+class SchemaMigration(db.Entity):
+    """已执行的迁移记录"""
+    version = PrimaryKey(int)
+    name = Required(str)
+    applied_at = Required(datetime, default=datetime.now)
+
+
+class SchemaState(db.Entity):
+    """最近一次建表和迁移完成时的表结构版本,表中只有一行"""
+    id = PrimaryKey(int)
+    fingerprint = Required(str)
+    migration_version = Required(int)
+    updated_at = Required(datetime, default=datetime.now)
+
+
+# 表结构版本记录固定使用的主键
+_STATE_ROW_ID = 1
+
+
+class Index:
+    """
+    索引定义
+
+    参数:
+        name: 索引名
+        entity: 实体名称,表名和列名在执行时从实体映射中读取
+        attrs: 按顺序排列的实体属性名
+        unique: 是否唯一索引
+    """
+
+    def __init__(self, name: str, entity: str, attrs: tuple, unique: bool = False):
+        self.name = name
+        self.entity = entity
+        self.attrs = attrs
+        self.unique = unique
+
+    def _table_and_columns(self):
+        """返回已加引号的表名和列名列表"""
+        provider = db.provider
+        entity = db.entities.get(self.entity)
+        if entity is None:
+            return None
+        table = provider.quote_name(entity._table_)
+        columns = [provider.quote_name(entity._adict_[attr].column) for attr in self.attrs]
+        return entity._table_, table, columns
+
+    def apply(self, cursor):
+        """在当前连接上创建索引,已存在或实体已被后续迁移移除时跳过"""
+        names = self._table_and_columns()
+        if names is None:
+            logger.info(f"实体 {self.entity} 已移除,跳过索引 {self.name}")
+            return
+        table_name, table, columns = names
+        unique = "UNIQUE " if self.unique else ""
+        if db.provider.dialect == 'MySQL':
+            # MySQL不支持 CREATE INDEX IF NOT EXISTS,先查询information_schema
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+                (table_name, self.name)
+            )
+            if cursor.fetchone()[0]:
+                return
+            cursor.execute(f"CREATE {unique}INDEX {db.provider.quote_name(self.name)} ON {table} ({', '.join(columns)})")
+        else:
+            cursor.execute(
+                f"CREATE {unique}INDEX IF NOT EXISTS {db.provider.quote_name(self.name)} ON {table} ({', '.join(columns)})"
+            )
+
+
+def _table_exists(cursor, table_name: str) -> bool:
+    """判断当前数据库中是否存在该表"""
+    if db.provider.dialect == 'MySQL':
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            (table_name,)
+        )
+    else:
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    return cursor.fetchone()[0] > 0
+
+
+class NormalizeEconIndex:
+    """
+    把旧的宽表 EconIndex 拆分到 Occupation/Task/TaskText 及查找表,然后把旧表改名为 EconIndex_legacy 保留
+
+    任务保留原EconIndex主键,导出的id不变;每一步只插入目标表中尚不存在的行,中断后可重复执行。
+    (SOC代码, 任务ID) 重复时只迁移id最大的一行,被丢弃的行数和示例记录到警告日志,原数据仍在备份表中;
+    备份表确认无误后由后续迁移删除。新建数据库没有旧表,直接跳过。
+    """
+    LEGACY_TABLE = "EconIndex"
+    BACKUP_TABLE = "EconIndex_legacy"
+    # 警告日志中列出的被丢弃行数上限
+    SAMPLE_SIZE = 20
+    LOOKUPS = (("TaskType", "task_type"), ("RatingDate", "date"), ("DomainSource", "domain_source"))
+
+    def apply(self, cursor):
+        if not _table_exists(cursor, self.LEGACY_TABLE):
+            return
+        quote = db.provider.quote_name
+        table = lambda name: quote(db.entities[name]._table_)
+        col = lambda alias, name, attr: f"{alias}.{quote(db.entities[name]._adict_[attr].column)}"
+        legacy = quote(self.LEGACY_TABLE)
+
+        # 查找表: 每个不同的字符串一行
+        for entity, field in self.LOOKUPS:
+            cursor.execute(
+                f"INSERT INTO {table(entity)} ({quote(db.entities[entity]._adict_['name'].column)}) "
+                f"SELECT DISTINCT e.{quote(field)} FROM {legacy} e "
+                f"WHERE e.{quote(field)} NOT IN (SELECT {col('x', entity, 'name')} FROM {table(entity)} x)"
+            )
+        # 职业: 每个SOC代码一行
+        cursor.execute(
+            f"INSERT INTO {table('Occupation')} "
+            f"({', '.join(quote(db.entities['Occupation']._adict_[c].column) for c in ('onet_soc_code', 'title', 'title_cn'))}) "
+            f"SELECT e.{quote('onet_soc_code')}, MIN(e.{quote('title')}), MIN(e.{quote('title_cn')}) FROM {legacy} e "
+            f"WHERE e.{quote('onet_soc_code')} NOT IN (SELECT {col('o', 'Occupation', 'onet_soc_code')} "
+            f"FROM {table('Occupation')} o) "
+            f"GROUP BY e.{quote('onet_soc_code')}"
+        )
+        # 旧表没有 (SOC代码, 任务ID) 唯一约束,可能有重复,只保留最后导入的一行,其余行先记录下来
+        latest = (f"SELECT MAX(d.{quote('id')}) FROM {legacy} d "
+                  f"GROUP BY d.{quote('onet_soc_code')}, d.{quote('task_id')}")
+        cursor.execute(
+            f"SELECT e.{quote('onet_soc_code')}, e.{quote('task_id')}, e.{quote('id')} FROM {legacy} e "
+            f"WHERE e.{quote('id')} NOT IN ({latest}) ORDER BY e.{quote('id')}"
+        )
+        duplicates = cursor.fetchall()
+        if duplicates:
+            sample = ", ".join(f"({code}, {task_id}, id={pk})" for code, task_id, pk in duplicates[:self.SAMPLE_SIZE])
+            logger.warning(
+                f"EconIndex中有 {len(duplicates)} 行 (SOC代码, 任务ID) 重复,只迁移id最大的一行,"
+                f"其余行保留在 {self.BACKUP_TABLE} 中: {sample}"
+            )
+        # 任务: 字符串列替换为职业和查找表的主键
+        task_columns = ['id', 'occupation', 'task_id', 'task_type', 'incumbents_responding', 'date',
+                        'domain_source', 'percentage', 'automated_score']
+        cursor.execute(
+            f"INSERT INTO {table('Task')} ({', '.join(quote(db.entities['Task']._adict_[c].column) for c in task_columns)}) "
+            f"SELECT e.{quote('id')}, {col('o', 'Occupation', 'id')}, e.{quote('task_id')}, {col('tt', 'TaskType', 'id')}, "
+            f"e.{quote('incumbents_responding')}, {col('rd', 'RatingDate', 'id')}, {col('ds', 'DomainSource', 'id')}, "
+            f"e.{quote('percentage')}, e.{quote('automated_score')} "
+            f"FROM {legacy} e "
+            f"JOIN {table('Occupation')} o ON {col('o', 'Occupation', 'onet_soc_code')} = e.{quote('onet_soc_code')} "
+            f"JOIN {table('TaskType')} tt ON {col('tt', 'TaskType', 'name')} = e.{quote('task_type')} "
+            f"JOIN {table('RatingDate')} rd ON {col('rd', 'RatingDate', 'name')} = e.{quote('date')} "
+            f"JOIN {table('DomainSource')} ds ON {col('ds', 'DomainSource', 'name')} = e.{quote('domain_source')} "
+            f"WHERE e.{quote('id')} NOT IN (SELECT {col('t', 'Task', 'id')} FROM {table('Task')} t) "
+            f"AND e.{quote('id')} IN ({latest})"
+        )
+        # 长文本
+        text_columns = ['task', 'content', 'content_cn', 'automated_score_reason']
+        cursor.execute(
+            f"INSERT INTO {table('TaskText')} ({', '.join(quote(db.entities['TaskText']._adict_[c].column) for c in text_columns)}) "
+            f"SELECT e.{quote('id')}, e.{quote('task')}, e.{quote('task_cn')}, e.{quote('automated_score_reason')} "
+            f"FROM {legacy} e JOIN {table('Task')} t ON {col('t', 'Task', 'id')} = e.{quote('id')} "
+            f"WHERE e.{quote('id')} NOT IN (SELECT {col('x', 'TaskText', 'task')} FROM {table('TaskText')} x)"
+        )
+        cursor.execute(f"SELECT COUNT(*) FROM {table('Task')}")
+        tasks = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM {legacy}")
+        legacy_rows = cursor.fetchone()[0]
+        # 除重复行外,查找表JOIN不上的行也不会迁移,一并报告
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {legacy} e "
+            f"WHERE e.{quote('id')} NOT IN (SELECT {col('t', 'Task', 'id')} FROM {table('Task')} t)"
+        )
+        missing = cursor.fetchone()[0]
+        if missing > len(duplicates):
+            logger.warning(f"EconIndex有 {missing - len(duplicates)} 行未能迁移(非重复行),请检查 {self.BACKUP_TABLE}")
+        # 保留旧表作为备份,不可逆的删除留给后续迁移
+        cursor.execute(f"ALTER TABLE {legacy} RENAME TO {quote(self.BACKUP_TABLE)}")
+        logger.info(
+            f"EconIndex已拆分为规范化表: {tasks} 个任务(旧表 {legacy_rows} 行,丢弃重复 {len(duplicates)} 行),"
+            f"旧表已改名为 {self.BACKUP_TABLE}"
+        )
+
+
+# 迁移列表: (版本号, 名称, 操作列表),版本号必须递增,已发布的迁移不要修改,新的变更追加新版本
+MIGRATIONS = [
+    (1, "热点查询索引", [
+        # 旧宽表 EconIndex 的索引已移除: 迁移2把它拆分为规范化表,其上的索引由迁移2创建
+        Index("idx_econindexstats_title", "EconIndexStats", ("title",)),
+        # 按时间范围读取搜索记录及反馈
+        Index("idx_search_record_time", "OccupationSearchRecord", ("search_time",)),
+        Index("idx_feedback_time_id", "FeedbackRecord", ("feedback_time", "id")),
+        # OccupationSearchDaily 的 (title, language, day) 组合键只用于写入时的upsert,
+        # 热门职业按 day 范围过滤无法使用它,见迁移4的 idx_search_daily_day
+    ]),
+    (2, "职业/任务规范化", [
+        NormalizeEconIndex(),
+        # 快照和导出按职业名过滤; (occupation, task_id) 已有组合唯一键
+        Index("idx_occupation_title", "Occupation", ("title",)),
+        Index("idx_occupation_title_cn", "Occupation", ("title_cn",)),
+        Index("idx_task_percentage", "Task", ("percentage",)),
+    ]),
+    (3, "反馈按类型分页", [
+        # 反馈列表按类型过滤后按 (feedback_time, id) 倒序键集分页
+        Index("idx_feedback_type_time_id", "FeedbackRecord", ("feedback_type", "feedback_time", "id")),
+    ]),
+    (4, "热门职业按日期汇总", [
+        # 热门职业只读取最近days天的汇总行: day在前定位范围,附带title和search_count使查询只读索引
+        Index("idx_search_daily_day", "OccupationSearchDaily", ("day", "title", "search_count")),
+    ]),
+]
+
+
+@db_session
+def get_applied_versions() -> set:
+    """返回已执行的迁移版本号集合"""
+    return set(select(m.version for m in SchemaMigration)[:])
+
+
+def run_migrations() -> list:
+    """
+    按版本号顺序执行尚未执行的迁移,每个迁移一个事务
+
+    多个进程同时启动时,所有操作都是幂等的,重复登记版本号的失败会被忽略
+
+    返回:
+        本次执行的迁移版本号列表
+    """
+    applied = get_applied_versions()
+    executed = []
+    for version, name, operations in MIGRATIONS:
+        if version in applied:
+            continue
+        logger.info(f"执行数据库迁移 {version}: {name}")
+        try:
+            with db_session:
+                cursor = db.get_connection().cursor()
+                for operation in operations:
+                    operation.apply(cursor)
+                SchemaMigration(version=version, name=name)
+                commit()
+        except Exception as e:
+            if version in get_applied_versions():
+                logger.info(f"数据库迁移 {version} 已由其他进程执行")
+                continue
+            logger.error(f"数据库迁移 {version} 执行失败: {str(e)}", exc_info=True)
+            raise
+        executed.append(version)
+
+    if executed:
+        logger.info(f"数据库迁移完成: {executed}")
+    return executed
+
+
+def latest_migration_version() -> int:
+    """MIGRATIONS 中最新的迁移版本号"""
+    return max(version for version, _, _ in MIGRATIONS)
+
+
+def schema_fingerprint() -> str:
+    """当前实体定义对应的表结构指纹,需在 generate_mapping 之后调用"""
+    return hashlib.sha256(db.schema.generate_create_script().encode('utf-8')).hexdigest()
+
+
+def schema_up_to_date() -> bool:
+    """
+    判断数据库表结构是否已与当前代码一致
+
+    返回:
+        记录的表结构指纹和迁移版本都与当前代码一致时返回True;
+        SchemaState 表不存在(首次启动或旧版本数据库)时返回False
+    """
+    try:
+        with db_session:
+            state = SchemaState.get(id=_STATE_ROW_ID)
+            return (state is not None and state.fingerprint == schema_fingerprint()
+                    and state.migration_version == latest_migration_version())
+    except Exception as e:
+        logger.info(f"读取表结构版本失败,执行建表检查: {str(e)}")
+        return False
+
+
+def record_schema_state():
+    """建表和迁移完成后记录表结构指纹及迁移版本,多个进程同时写入时忽略失败"""
+    try:
+        with db_session:
+            state = SchemaState.get_for_update(id=_STATE_ROW_ID)
+            if state is None:
+                state = SchemaState(id=_STATE_ROW_ID, fingerprint=schema_fingerprint(),
+                                    migration_version=latest_migration_version())
+            else:
+                state.fingerprint = schema_fingerprint()
+                state.migration_version = latest_migration_version()
+                state.updated_at = datetime.now()
+    except Exception as e:
+        logger.warning(f"记录表结构版本失败: {str(e)}")
+
+
+# 热点查询: (名称, 实体名称, SQL模板, 参数)
+# SQL模板中的 {table} 和 {属性名} 在执行时替换为加引号的表名和列名, ? 替换为驱动的占位符
+HOT_QUERIES = [
+    ("按英文职业查询职业", "Occupation",
+     "SELECT {id} FROM {table} WHERE {title} = ?", ("Data Scientists",)),
+    ("按中文职业查询职业", "Occupation",
+     "SELECT {id} FROM {table} WHERE {title_cn} = ?", ("数据科学家",)),
+    ("按职业查询任务", "Task",
+     "SELECT {id}, {percentage} FROM {table} WHERE {occupation} = ?", (1,)),
+    ("任务按占比排行", "Task",
+     "SELECT {id}, {occupation}, {percentage} FROM {table} ORDER BY {percentage} DESC LIMIT ?", (20,)),
+    ("按任务读取长文本", "TaskText",
+     "SELECT {content} FROM {table} WHERE {task} = ?", (1,)),
+    ("按职业查询统计", "EconIndexStats",
+     "SELECT {percentage_sum} FROM {table} WHERE {title} = ?", ("Data Scientists",)),
+    ("按时间读取搜索记录", "OccupationSearchRecord",
+     "SELECT {title} FROM {table} WHERE {search_time} >= ?", (datetime(2025, 1, 1),)),
+    ("按时间倒序分页读取反馈", "FeedbackRecord",
+     "SELECT {id} FROM {table} WHERE {feedback_time} >= ? ORDER BY {feedback_time} DESC, {id} DESC LIMIT ?",
+     (datetime(2025, 1, 1), 50)),
+    ("按类型和时间倒序分页读取反馈", "FeedbackRecord",
+     "SELECT {id} FROM {table} WHERE {feedback_type} = ? AND {feedback_time} <= ? "
+     "AND ({feedback_time} < ? OR {id} < ?) ORDER BY {feedback_time} DESC, {id} DESC LIMIT ?",
+     ("问题", datetime(2025, 1, 1), datetime(2025, 1, 1), 100, 50)),
+    ("按日期汇总热门职业", "OccupationSearchDaily",
+     "SELECT {title}, SUM({search_count}) FROM {table} WHERE {day} >= ? AND {day} <= ? GROUP BY {title}",
+     (datetime(2025, 1, 1).date(), datetime(2025, 1, 31).date())),
+]
+
+
+def _render_query(entity_name: str, template: str) -> str:
+    """将SQL模板中的表名、列名和占位符替换为当前数据库的写法"""
+    provider = db.provider
+    entity = db.entities[entity_name]
+    names = {attr.name: provider.quote_name(attr.column) for attr in entity._attrs_ if attr.column}
+    names['table'] = provider.quote_name(entity._table_)
+    placeholder = '?' if provider.paramstyle == 'qmark' else '%s'
+    return template.replace('?', placeholder).format(**names)
+
+
+# ORDER BY ... LIMIT 查询: 按索引顺序读取前N行即停止,允许对这些索引执行SCAN
+ORDERED_INDEX_SCANS = {
+    "任务按占比排行": "idx_task_percentage",
+}
+
+
+def _is_full_scan(plan: list, ordered_index: str = None) -> bool:
+    """
+    根据执行计划判断是否存在全表扫描或整个索引的遍历
+
+    参数:
+        plan: explain_query 返回的执行计划
+        ordered_index: 查询带 ORDER BY ... LIMIT 时允许顺序遍历的索引名
+    """
+    if db.provider.dialect == 'MySQL':
+        # EXPLAIN 结果中 type=ALL 为全表扫描, type=index 为遍历整个索引
+        for row in plan:
+            if row.get('type') == 'ALL':
+                return True
+            if row.get('type') == 'index' and row.get('key') != ordered_index:
+                return True
+        return False
+    # SQLite: SEARCH 表示按索引条件定位; SCAN 无论是否 USING INDEX 都会读取整个表或索引,
+    # 只有 ORDER BY ... LIMIT 按 ordered_index 顺序读取时例外
+    allowed = (f"USING INDEX {ordered_index}", f"USING COVERING INDEX {ordered_index}") if ordered_index else ()
+    for row in plan:
+        detail = row['detail']
+        if detail.startswith('SCAN') and not detail.endswith(allowed):
+            return True
+    return False
+
+
+@db_session
+def explain_query(entity_name: str, template: str, params: tuple) -> list:
+    """
+    获取查询的执行计划
+
+    返回:
+        执行计划行列表,每行为列名到值的映射
+    """
+    sql = _render_query(entity_name, template)
+    prefix = "EXPLAIN" if db.provider.dialect == 'MySQL' else "EXPLAIN QUERY PLAN"
+    cursor = db.get_connection().cursor()
+    cursor.execute(f"{prefix} {sql}", params)
+    columns = [c[0] for c in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def check_query_plans() -> list:
+    """
+    检查所有热点查询的执行计划
+
+    返回:
+        (查询名称, 执行计划, 是否全表扫描) 列表
+    """
+    results = []
+    for name, entity_name, template, params in HOT_QUERIES:
+        plan = explain_query(entity_name, template, params)
+        results.append((name, plan, _is_full_scan(plan, ORDERED_INDEX_SCANS.get(name))))
+    return results
@@ -0,0 +1,219 @@
+"""
+职业标题搜索索引模块 - 基于N-gram倒排索引的子串搜索
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+
+def normalize(text: str) -> str:
+    """统一大小写并去除首尾空白,用于索引和查询"""
+    return text.strip().casefold()
+
+
+class SortedPostings:
+    """
+    按gram升序存放的只读倒排表,get 接口与字典相同
+
+    grams 为升序的gram序列, ids[starts[i]:starts[i + 1]] 为第i个gram的倒排表;
+    三列都可以直接使用快照文件mmap上的列,不必在进程内重建
+    """
+    __slots__ = ('grams', 'starts', 'ids')
+
+    def __init__(self, grams, starts, ids):
+        self.grams = grams
+        self.starts = starts
+        self.ids = ids
+
+    def get(self, gram: str, default=None):
+        i = bisect_left(self.grams, gram)
+        if i < len(self.grams) and self.grams[i] == gram:
+            return self.ids[self.starts[i]:self.starts[i + 1]]
+        return default
+
+
+class NgramIndex:
+    """
+    N-gram倒排索引
+
+    对每个不重复标题的所有长度为 1..n 的子串建立倒排表(标题编号的有序数组):
+    - 关键字长度 >= n 时,取关键字中各个n-gram倒排表的交集作为候选,再校验子串
+    - 关键字长度 < n 时,关键字本身就是被索引的gram,倒排表即为结果
+    英文标题使用 n=3 (trigram), 中文标题使用 n=2 (字符bigram)
+    """
+
+    def __init__(self, titles, n: int, postings=None):
+        """
+        构建索引
+
+        参数:
+            titles: 不重复的标题序列
+            n: gram长度
+            postings: 已构建好的倒排表(如快照文件中的 SortedPostings),为None时由titles构建
+        """
+        self.n = n
+        self.titles = list(titles)
+        self.normalized = [normalize(t) for t in self.titles]
+        if postings is not None:
+            self.postings = postings
+            return
+
+        postings = {}
+        for title_id, text in enumerate(self.normalized):
+            grams = set()
+            for size in range(1, n + 1):
+                for i in range(len(text) - size + 1):
+                    grams.add(text[i:i + size])
+            for gram in grams:
+                postings.setdefault(gram, []).append(title_id)
+        self.postings = {gram: array('I', ids) for gram, ids in postings.items()}
+
+    def posting_columns(self) -> tuple:
+        """
+        导出倒排表,用于写入快照文件
+
+        返回:
+            (升序的gram列表, 偏移数组, 标题编号数组),可由 SortedPostings 还原
+        """
+        grams = sorted(self.postings)
+        starts = array('I', [0])
+        ids = array('I')
+        for gram in grams:
+            ids.extend(self.postings[gram])
+            starts.append(len(ids))
+        return grams, starts, ids
+
+    def _candidates(self, keyword: str):
+        """返回包含关键字的标题编号集合"""
+        if len(keyword) <= self.n:
+            return self.postings.get(keyword, ())
+
+        grams = {keyword[i:i + self.n] for i in range(len(keyword) - self.n + 1)}
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if not ids:
+                return ()
+            lists.append(ids)
+        lists.sort(key=len)
+
+        candidates = set(lists[0])
+        for ids in lists[1:]:
+            candidates.intersection_update(ids)
+            if not candidates:
+                return ()
+        # gram交集不保证连续出现,需要校验子串
+        return [i for i in candidates if keyword in self.normalized[i]]
+
+    def _rank(self, title_id: int, keyword: str):
+        """排序键: 完全匹配 < 前缀匹配 < 单词开头匹配 < 其他, 再按匹配位置、长度、字母序"""
+        text = self.normalized[title_id]
+        pos = text.find(keyword)
+        if text == keyword:
+            kind = 0
+        elif pos == 0:
+            kind = 1
+        elif not text[pos - 1].isalnum():
+            kind = 2
+        else:
+            kind = 3
+        return (kind, pos, len(text), self.titles[title_id])
+
+    def search(self, keyword: str, limit: int = None) -> list:
+        """
+        搜索包含关键字的标题
+
+        参数:
+            keyword: 搜索关键字(不区分大小写)
+            limit: 返回结果数量上限, None表示不限制
+
+        返回:
+            按相关度排序、去重后的标题列表
+        """
+        keyword = normalize(keyword)
+        if not keyword:
+            return []
+
+        candidates = self._candidates(keyword)
+        rank = lambda i: self._rank(i, keyword)
+        if limit is None:
+            ranked = sorted(candidates, key=rank)
+        else:
+            ranked = heapq.nsmallest(max(limit, 0), candidates, key=rank)
+        return [self.titles[i] for i in ranked]
+
+
+class _TrieNode:
+    """前缀树节点,保存子节点及该前缀下权重最高的前k个标题编号"""
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []
+
+
+class PrefixTrie:
+    """
+    带权前缀树,用于搜索框自动补全
+
+    每个节点维护该前缀下按 (热度降序, 标题长度, 字母序) 排列的前k个标题,
+    查询只需沿前缀走到对应节点直接返回,耗时与前缀长度成正比,与标题总数无关。
+    英文标题除整体外还会以每个单词开头的后缀插入,使 "analyst" 也能补全出 "Data Analyst"
+    """
+
+    def __init__(self, titles, weights=None, top_k: int = 10, word_prefixes: bool = False):
+        """
+        构建前缀树
+
+        参数:
+            titles: 不重复的标题序列
+            weights: 标题到热度权重的映射,缺省为0
+            top_k: 每个节点保留的候选数量
+            word_prefixes: 是否同时以每个单词开头的后缀建立索引
+        """
+        self.titles = list(titles)
+        self.top_k = top_k
+        self.root = _TrieNode()
+        weights = weights or {}
+
+        # 先按最终排序插入,节点候选列表满后即可直接截断
+        order = sorted(
+            range(len(self.titles)),
+            key=lambda i: (-weights.get(self.titles[i], 0), len(self.titles[i]), self.titles[i])
+        )
+        for title_id in order:
+            text = normalize(self.titles[title_id])
+            starts = [0]
+            if word_prefixes:
+                starts += [i for i in range(1, len(text)) if not text[i - 1].isalnum() and text[i].isalnum()]
+            for start in starts:
+                self._insert(text[start:], title_id)
+
+    def _insert(self, key: str, title_id: int):
+        """沿key路径插入标题编号"""
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            if len(node.top) < self.top_k and title_id not in node.top:
+                node.top.append(title_id)
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        """
+        获取前缀补全建议
+
+        参数:
+            prefix: 用户输入的前缀(不区分大小写)
+            limit: 返回数量上限,不超过top_k
+
+        返回:
+            按热度排序的标题列表
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return [self.titles[i] for i in node.top[:max(limit, 0)]]
@@ -0,0 +1,609 @@
+"""
+数据快照模块 - 将任务数据和EconIndexStats一次性加载为内存列式结构,为只读查询提供服务
+
+导入脚本把快照各列写入快照文件(见 snapshot_file),worker加载快照时若快照文件与当前数据集版本一致,
+直接以mmap映射文件中的列,只在进程内构建体积与职业数成正比的标题搜索索引;否则从数据库加载
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from pony.orm import db_session, select
+
+from app.core.config import logger, SUGGEST_TOP_K, SNAPSHOT_FILE_ENABLED, SNAPSHOT_FILE_PATH
+from app.models.database import db, select_readonly
+from app.models.search_index import NgramIndex, PrefixTrie, SortedPostings
+from app.models.dataset_version import get_dataset_version, load_dataset_version, on_dataset_version_change
+from app.models.snapshot_file import SnapshotFileError, read_columns, write_columns
+from app.utils.timer import TimerContext
+from app.utils.metrics import record_cache
+from app.utils.fast_json import encode_fragment
+
+# 快照行字段顺序
+ROW_FIELDS = ('title', 'title_cn', 'task', 'task_cn', 'percentage', 'automated_score', 'automated_score_reason')
+# 统计行字段顺序
+STATS_FIELDS = ('title', 'title_cn', 'percentage_sum', 'percentage_non_zero', 'automated_score_avg')
+# 可排序的职业统计指标
+STATS_METRICS = STATS_FIELDS[2:]
+# 标题搜索索引的语言及gram长度: 英文trigram, 中文字符bigram
+SEARCH_NGRAMS = {'en': 3, 'cn': 2}
+
+
+class KeyView:
+    """按行号计算排序键的只读序列,排名列表不必为每行保存键元组"""
+    __slots__ = ('ids', 'key')
+
+    def __init__(self, ids, key):
+        self.ids = ids
+        self.key = key
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        return self.key(self.ids[position])
+
+
+class RankedList:
+    """
+    预先排好序的排名列表,支持键集(keyset)分页
+
+    keys 为升序排列的唯一排序键(列表或 KeyView),ids 为对应的行号。降序时从尾部向前遍历。
+    游标即上一页最后一条记录的排序键,翻页时二分定位,每页耗时 O(log n + k) 与页码无关。
+    """
+
+    def __init__(self, keys: list, ids):
+        self.keys = keys
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.keys)
+
+    def page(self, limit: int, descending: bool = True, after=None):
+        """
+        获取一页行号
+
+        参数:
+            limit: 每页数量
+            descending: 是否降序
+            after: 上一页最后一条记录的排序键,None表示第一页
+
+        返回:
+            (行号列表, 下一页游标), 没有更多数据时游标为None
+        """
+        limit = max(limit, 0)
+        n = len(self.keys)
+        if descending:
+            end = n if after is None else bisect_left(self.keys, after)
+            start = max(end - limit, 0)
+            positions = range(end - 1, start - 1, -1)
+            has_more = start > 0
+        else:
+            start = 0 if after is None else bisect_right(self.keys, after)
+            end = min(start + limit, n)
+            positions = range(start, end)
+            has_more = end < n
+        ids = [self.ids[p] for p in positions]
+        next_key = self.keys[positions[-1]] if ids and has_more else None
+        return ids, next_key
+
+
+class EconIndexSnapshot:
+    """
+    EconIndex数据的内存列式快照
+
+    任务行按 (title, percentage降序) 排序,同一职业的任务在各列中连续存放:
+    - titles 为排序后的不重复英文职业名, title_row_start/title_row_end 为其在行列中的 [start, end) 偏移
+    - titles_cn 为排序后的不重复中文职业名, cn_start/cn_end 为其在 cn_title_ids 中的偏移,
+      cn_title_ids 存放对应的职业编号(同一中文名可能对应多个英文职业)
+    各列可以是进程内的array/list,也可以是快照文件mmap上的memoryview/StringColumn(见 from_columns)。
+    快照构建后不再修改,可在多线程间无锁共享;
+    唯一的例外是按需生成的预编码JSON片段缓存,片段由不可变的行数据确定,并发时重复生成也得到相同结果
+    """
+
+    def __init__(self, rows, stats_rows, popularity=None):
+        """
+        构建快照
+
+        参数:
+            rows: 任务行序列,字段顺序见 ROW_FIELDS
+            stats_rows: 职业统计行序列,字段顺序见 STATS_FIELDS
+            popularity: 职业名(中英文均可)到搜索次数的映射,用于自动补全排序
+        """
+        rows = sorted(rows, key=lambda r: (r[0], -r[4]))
+
+        # 任务列
+        self.row_title = array('I')
+        self.task = []
+        self.task_cn = []
+        self.percentage = array('d')
+        self.automated_score = array('i')
+        self.automated_score_reason = []
+
+        # 英文职业偏移索引
+        self.titles = []
+        self.title_row_start = array('I')
+        self.title_row_end = array('I')
+        cn_to_title_ids = {}
+
+        for i, (title, title_cn, task, task_cn, percentage, automated_score, reason) in enumerate(rows):
+            if not self.titles or self.titles[-1] != title:
+                if self.titles:
+                    self.title_row_end.append(i)
+                self.titles.append(title)
+                self.title_row_start.append(i)
+            title_id = len(self.titles) - 1
+            title_ids = cn_to_title_ids.setdefault(title_cn, [])
+            if not title_ids or title_ids[-1] != title_id:
+                title_ids.append(title_id)
+
+            self.row_title.append(title_id)
+            self.task.append(task)
+            self.task_cn.append(task_cn)
+            self.percentage.append(percentage)
+            self.automated_score.append(automated_score)
+            self.automated_score_reason.append(reason)
+        if self.titles:
+            self.title_row_end.append(len(rows))
+
+        # 中文职业偏移索引
+        self.titles_cn = sorted(cn_to_title_ids)
+        self.cn_start = array('I')
+        self.cn_end = array('I')
+        self.cn_title_ids = array('I')
+        for title_cn in self.titles_cn:
+            self.cn_start.append(len(self.cn_title_ids))
+            self.cn_title_ids.extend(cn_to_title_ids[title_cn])
+            self.cn_end.append(len(self.cn_title_ids))
+
+        # 每个英文职业对应的中文名(取第一条任务行)
+        self.title_cn_of = [rows[start][1] for start in self.title_row_start]
+
+        # 任务排名: 按 (percentage, 职业名, 任务, 行号) 排序,相同任务只保留一条;
+        # 职业名、任务和占比相同但其他字段不同的行都会保留,行号使排序键唯一,翻页时不会跳过其中一条
+        top_keys = {}
+        for i in range(len(rows)):
+            title_id = self.row_title[i]
+            item = (
+                self.task[i], self.task_cn[i], self.titles[title_id], self.title_cn_of[title_id],
+                self.percentage[i], self.automated_score[i], self.automated_score_reason[i]
+            )
+            top_keys.setdefault(item, ((self.percentage[i], self.titles[title_id], self.task[i], i), i))
+        self.task_rank_ids = array('I', [i for _, i in sorted(top_keys.values())])
+
+        # 职业统计列
+        self.stat_title = []
+        self.stat_title_cn = []
+        self.stat_columns = {
+            'percentage_sum': array('d'),
+            'percentage_non_zero': array('d'),
+            'automated_score_avg': array('d'),
+        }
+        for title, title_cn, percentage_sum, percentage_non_zero, automated_score_avg in stats_rows:
+            self.stat_title.append(title)
+            self.stat_title_cn.append(title_cn)
+            self.stat_columns['percentage_sum'].append(percentage_sum)
+            self.stat_columns['percentage_non_zero'].append(percentage_non_zero)
+            self.stat_columns['automated_score_avg'].append(automated_score_avg)
+
+        # 各统计指标排名: 按 (指标值, 职业名) 排序
+        self.stat_rank_ids = {
+            name: array('I', sorted(range(len(column)), key=lambda i, c=column: (c[i], self.stat_title[i])))
+            for name, column in self.stat_columns.items()
+        }
+
+        self._build_indexes(popularity)
+
+    def _build_indexes(self, popularity, search_postings: dict = None):
+        """
+        在列数据之上构建搜索索引、排名列表和片段缓存
+
+        参数:
+            popularity: 职业名到搜索次数的映射
+            search_postings: 语言 -> 快照文件中的标题倒排表,为None时由标题构建
+        """
+        search_postings = search_postings or {}
+        self.search_index = {
+            language: NgramIndex(self.titles if language == 'en' else self.titles_cn, n, search_postings.get(language))
+            for language, n in SEARCH_NGRAMS.items()
+        }
+        # 自动补全前缀树依赖搜索热度,无法写入快照文件,在首次补全时构建
+        self._popularity = popularity
+        self._suggest_index = None
+        self._suggest_lock = threading.Lock()
+
+        # 排序键由行号即时计算
+        task_key = lambda i: (self.percentage[i], self.titles[self.row_title[i]], self.task[i], i)
+        self.task_rank = RankedList(KeyView(self.task_rank_ids, task_key), self.task_rank_ids)
+        self.stat_rank = {}
+        for name, ids in self.stat_rank_ids.items():
+            stat_key = lambda i, c=self.stat_columns[name]: (c[i], self.stat_title[i])
+            self.stat_rank[name] = RankedList(KeyView(ids, stat_key), ids)
+
+        # 预编码的JSON片段,首次输出时按行生成
+        self._task_fragments = [None] * len(self.task)
+        self._stat_fragments = [None] * len(self.stat_title)
+        self._title_tasks_fragments = {}
+
+    # 快照文件中的列: 列名 -> 类型码; 统计指标列和排名另按 stat_<指标>、stat_rank_<指标> 保存,
+    # 标题倒排表按 search_<语言>_grams/starts/ids 保存
+    FILE_COLUMNS = {
+        'row_title': 'I', 'task': 's', 'task_cn': 's', 'percentage': 'd', 'automated_score': 'i',
+        'automated_score_reason': 's',
+        'titles': 's', 'title_row_start': 'I', 'title_row_end': 'I', 'title_cn_of': 's',
+        'titles_cn': 's', 'cn_start': 'I', 'cn_end': 'I', 'cn_title_ids': 'I',
+        'task_rank_ids': 'I', 'stat_title': 's', 'stat_title_cn': 's',
+    }
+    # 职业级别的字符串列,行数与职业数成正比且每次查找都会访问,映射后解码为进程内列表;
+    # 任务级别的长文本列留在mmap上按需解码
+    DECODED_COLUMNS = ('titles', 'title_cn_of', 'titles_cn', 'stat_title', 'stat_title_cn')
+
+    def to_columns(self) -> dict:
+        """导出写入快照文件的各列: 列名 -> (类型码, 数据)"""
+        columns = {name: (typecode, getattr(self, name)) for name, typecode in self.FILE_COLUMNS.items()}
+        for name in STATS_METRICS:
+            columns[f'stat_{name}'] = ('d', self.stat_columns[name])
+            columns[f'stat_rank_{name}'] = ('I', self.stat_rank_ids[name])
+        for language, index in self.search_index.items():
+            grams, starts, ids = index.posting_columns()
+            columns[f'search_{language}_grams'] = ('s', grams)
+            columns[f'search_{language}_starts'] = ('I', starts)
+            columns[f'search_{language}_ids'] = ('I', ids)
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns: dict, popularity=None) -> 'EconIndexSnapshot':
+        """
+        由快照文件中的列构建快照,除 DECODED_COLUMNS 外列数据不复制
+
+        参数:
+            columns: read_columns 返回的 列名 -> memoryview或StringColumn
+            popularity: 职业名到搜索次数的映射
+        """
+        snapshot = cls.__new__(cls)
+        for name in cls.FILE_COLUMNS:
+            setattr(snapshot, name, list(columns[name]) if name in cls.DECODED_COLUMNS else columns[name])
+        snapshot.stat_columns = {name: columns[f'stat_{name}'] for name in STATS_METRICS}
+        snapshot.stat_rank_ids = {name: columns[f'stat_rank_{name}'] for name in STATS_METRICS}
+        search_postings = {
+            language: SortedPostings(columns[f'search_{language}_grams'], columns[f'search_{language}_starts'],
+                                     columns[f'search_{language}_ids'])
+            for language in SEARCH_NGRAMS
+        }
+        snapshot._build_indexes(popularity, search_postings)
+        return snapshot
+
+    @property
+    def suggest_index(self) -> dict:
+        """自动补全前缀树,按搜索热度排序,首次使用时构建"""
+        index = self._suggest_index
+        if index is None:
+            with self._suggest_lock:
+                if self._suggest_index is None:
+                    self._suggest_index = {
+                        'en': PrefixTrie(self.titles, self._popularity, SUGGEST_TOP_K, word_prefixes=True),
+                        'cn': PrefixTrie(self.titles_cn, self._popularity, SUGGEST_TOP_K),
+                    }
+                index = self._suggest_index
+        return index
+
+    def refresh_popularity(self, popularity: dict):
+        """
+        用新的搜索热度重建自动补全前缀树,构建完成后整体替换,查询不会读到一半的索引
+
+        参数:
+            popularity: 职业名到搜索次数的映射
+        """
+        with self._suggest_lock:
+            self._popularity = popularity
+            if self._suggest_index is None:
+                # 尚未使用过补全,首次使用时按新热度构建
+                return
+        index = {
+            'en': PrefixTrie(self.titles, popularity, SUGGEST_TOP_K, word_prefixes=True),
+            'cn': PrefixTrie(self.titles_cn, popularity, SUGGEST_TOP_K),
+        }
+        with self._suggest_lock:
+            if self._popularity is popularity:
+                self._suggest_index = index
+
+    @staticmethod
+    def _find(sorted_keys, key):
+        """在排序列表中查找key,返回下标,不存在返回-1"""
+        i = bisect_left(sorted_keys, key)
+        if i < len(sorted_keys) and sorted_keys[i] == key:
+            return i
+        return -1
+
+    def title_ids(self, title: str, language: str) -> list:
+        """
+        获取职业名对应的职业编号列表
+
+        参数:
+            title: 职业名称
+            language: 语言选择 ('en' 或 'cn')
+        """
+        if language == 'en':
+            i = self._find(self.titles, title)
+            return [i] if i >= 0 else []
+        i = self._find(self.titles_cn, title)
+        if i < 0:
+            return []
+        return list(self.cn_title_ids[self.cn_start[i]:self.cn_end[i]])
+
+    def title_percentage(self, title: str, language: str) -> dict:
+        """获取职业各任务的百分比,语义同 get_title_percentage"""
+        tasks = self.task if language == 'en' else self.task_cn
+        result = {}
+        for title_id in self.title_ids(title, language):
+            for i in range(self.title_row_start[title_id], self.title_row_end[title_id]):
+                result[tasks[i]] = self.percentage[i]
+        return result
+
+    def _title_tasks(self, title_ids, language: str) -> list:
+        """职业的任务列表,按百分比降序排列"""
+        tasks = self.task if language == 'en' else self.task_cn
+        # 同一中文名对应多个英文职业时,与 title_percentage 一样按任务名合并
+        merged = {}
+        for title_id in title_ids:
+            for i in range(self.title_row_start[title_id], self.title_row_end[title_id]):
+                merged[tasks[i]] = self.percentage[i]
+        items = [{"task": task, "percentage": percentage} for task, percentage in merged.items()]
+        items.sort(key=lambda x: x["percentage"], reverse=True)
+        return items
+
+    def titles_tasks(self, titles, language: str, encoded: bool = False) -> dict:
+        """
+        一次遍历获取多个职业的任务分布
+        
+        参数:
+            titles: 职业名称序列
+            language: 语言选择 ('en' 或 'cn')
+            encoded: 为True时每个职业的任务列表以预编码的JSON片段返回
+            
+        返回:
+            职业名到任务列表的映射,任务按百分比降序排列;不存在的职业对应空列表
+        """
+        result = {}
+        for title in titles:
+            if title in result:
+                continue
+            title_ids = self.title_ids(title, language)
+            if not encoded:
+                result[title] = self._title_tasks(title_ids, language)
+                continue
+            # 只缓存存在的职业,任意请求参数不会撑大缓存
+            key = (language == 'en', title)
+            fragment = self._title_tasks_fragments.get(key)
+            if fragment is None:
+                fragment = encode_fragment(self._title_tasks(title_ids, language))
+                if title_ids:
+                    self._title_tasks_fragments[key] = fragment
+            result[title] = fragment
+        return result
+
+    def search_titles(self, keyword: str, language: str, limit: int = None) -> list:
+        """根据关键字搜索不重复的职业标题,按相关度排序"""
+        index = self.search_index['en' if language == 'en' else 'cn']
+        return index.search(keyword, limit)
+
+    def suggest_titles(self, prefix: str, language: str, limit: int) -> list:
+        """根据前缀返回按热度排序的职业标题补全建议"""
+        index = self.suggest_index['en' if language == 'en' else 'cn']
+        return index.suggest(prefix, limit)
+
+    def _stat_dict(self, i: int) -> dict:
+        return {
+            "title": self.stat_title[i],
+            "title_cn": self.stat_title_cn[i],
+            **{name: column[i] for name, column in self.stat_columns.items()}
+        }
+
+    def _task_dict(self, i: int) -> dict:
+        title_id = self.row_title[i]
+        return {
+            "task": self.task[i],
+            "task_cn": self.task_cn[i],
+            "occupation": self.titles[title_id],
+            "occupation_cn": self.title_cn_of[title_id],
+            "percentage": self.percentage[i],
+            "automated_score": self.automated_score[i],
+            "automated_score_reason": self.automated_score_reason[i]
+        }
+
+    @staticmethod
+    def _fragments(ids, cache: list, build) -> list:
+        """按行号取预编码片段,尚未生成的行编码后写入缓存"""
+        result = []
+        for i in ids:
+            fragment = cache[i]
+            if fragment is None:
+                fragment = cache[i] = encode_fragment(build(i))
+            result.append(fragment)
+        return result
+
+    def occupation_stats(self, type: str, limit: int, descending: bool = True, after=None, encoded: bool = False):
+        """
+        按统计指标排名分页返回职业统计
+
+        参数:
+            encoded: 为True时每条统计以预编码的JSON片段返回
+
+        返回:
+            (统计字典或片段列表, 下一页游标)
+        """
+        ids, next_key = self.stat_rank[type].page(limit, descending, after)
+        if encoded:
+            return self._fragments(ids, self._stat_fragments, self._stat_dict), next_key
+        return [self._stat_dict(i) for i in ids], next_key
+
+    def top_tasks(self, limit: int, descending: bool = True, after=None, encoded: bool = False):
+        """
+        按百分比排名分页返回不重复任务
+
+        参数:
+            encoded: 为True时每个任务以预编码的JSON片段返回
+
+        返回:
+            (任务字典或片段列表, 下一页游标)
+        """
+        ids, next_key = self.task_rank.page(limit, descending, after)
+        if encoded:
+            return self._fragments(ids, self._task_fragments, self._task_dict), next_key
+        return [self._task_dict(i) for i in ids], next_key
+
+
+# 当前快照及构建锁
+_snapshot = None
+_snapshot_lock = threading.Lock()
+# 失效代数,加载期间发生失效时丢弃加载结果
+_generation = 0
+
+def _select_sql(entity, fields) -> str:
+    """生成按字段顺序读取整张表的SELECT语句"""
+    provider = db.provider
+    columns = ', '.join(provider.quote_name(entity._adict_[field].column) for field in fields)
+    return f"SELECT {columns} FROM {provider.quote_name(entity._table_)}"
+
+def _task_rows_sql() -> str:
+    """生成读取快照任务行的SELECT语句: Task关联Occupation和TaskText,字段顺序见 ROW_FIELDS"""
+    from app.models.EconIndex import Occupation, Task, TaskText
+
+    quote = db.provider.quote_name
+    column = lambda alias, entity, attr: f"{alias}.{quote(entity._adict_[attr].column)}"
+    fields = ', '.join([
+        column('o', Occupation, 'title'), column('o', Occupation, 'title_cn'),
+        column('x', TaskText, 'content'), column('x', TaskText, 'content_cn'),
+        column('t', Task, 'percentage'), column('t', Task, 'automated_score'),
+        column('x', TaskText, 'automated_score_reason'),
+    ])
+    return (f"SELECT {fields} FROM {quote(Task._table_)} t "
+            f"JOIN {quote(Occupation._table_)} o ON {column('o', Occupation, 'id')} = {column('t', Task, 'occupation')} "
+            f"JOIN {quote(TaskText._table_)} x ON {column('x', TaskText, 'task')} = {column('t', Task, 'id')}")
+
+def _map_snapshot_file(current: int, popularity) -> EconIndexSnapshot:
+    """
+    映射与当前数据集版本一致的快照文件
+
+    参数:
+        current: 当前数据集版本号
+        popularity: 职业名到搜索次数的映射
+
+    返回:
+        快照,文件不可用或版本不一致时返回None
+    """
+    try:
+        version, columns = read_columns(SNAPSHOT_FILE_PATH)
+    except SnapshotFileError as e:
+        logger.info(f"快照文件不可用,从数据库加载: {SNAPSHOT_FILE_PATH}: {str(e)}")
+        return None
+    if version != current:
+        logger.info(f"快照文件版本 {version} 与数据集版本 {current} 不一致,从数据库加载")
+        return None
+    try:
+        return EconIndexSnapshot.from_columns(columns, popularity)
+    except Exception as e:
+        logger.error(f"快照文件映射失败,从数据库加载: {str(e)}", exc_info=True)
+        return None
+
+def _load_popularity() -> dict:
+    """读取各职业名的累计搜索次数,需在db_session中调用"""
+    from app.models.EconIndex import OccupationSearchDaily
+    return dict(select((d.title, sum(d.search_count)) for d in OccupationSearchDaily)[:])
+
+@db_session
+def load_snapshot() -> EconIndexSnapshot:
+    """
+    加载快照,优先映射快照文件,不可用时从数据库加载
+    
+    返回:
+        新构建的EconIndexSnapshot
+    """
+    from app.models.EconIndex import EconIndexStats
+
+    with TimerContext("加载EconIndex快照"):
+        # 先确定快照对应的版本号,之后的版本变化都会触发失效回调
+        version = get_dataset_version()
+        popularity = _load_popularity()
+        snapshot = _map_snapshot_file(version, popularity) if SNAPSHOT_FILE_ENABLED else None
+        source = "快照文件"
+        if snapshot is None:
+            # 任务数据和EconIndexStats只读,SQLite下通过只读连接读取,不占用Pony连接的事务
+            rows = select_readonly(_task_rows_sql())
+            stats_rows = select_readonly(_select_sql(EconIndexStats, STATS_FIELDS))
+            snapshot = EconIndexSnapshot(rows, stats_rows, popularity)
+            source = "数据库"
+
+    logger.info(f"EconIndex快照从{source}加载完成: {len(snapshot.task)} 个任务, {len(snapshot.titles)} 个职业")
+    return snapshot
+
+@db_session
+def write_snapshot_file(path: str = SNAPSHOT_FILE_PATH) -> int:
+    """
+    从数据库构建快照并写入快照文件,由导入脚本在导入和统计更新完成后调用
+    
+    参数:
+        path: 快照文件路径
+        
+    返回:
+        写入的数据集版本号
+    """
+    from app.models.EconIndex import EconIndexStats
+
+    with TimerContext("写入快照文件"):
+        # 先读版本号再读数据: 读取期间若有新导入,文件记在旧版本下,不会被新版本使用
+        version = load_dataset_version()
+        rows = select_readonly(_task_rows_sql())
+        stats_rows = select_readonly(_select_sql(EconIndexStats, STATS_FIELDS))
+        write_columns(path, version, EconIndexSnapshot(rows, stats_rows).to_columns())
+    return version
+
+def get_snapshot() -> EconIndexSnapshot:
+    """
+    获取当前快照,首次调用或失效后从数据库加载
+
+    返回:
+        EconIndexSnapshot实例
+    """
+    global _snapshot
+    snapshot = _snapshot
+    record_cache("snapshot", snapshot is not None)
+    if snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                generation = _generation
+                snapshot = load_snapshot()
+                # 加载期间快照被判定失效时只本次使用,不缓存
+                if generation == _generation:
+                    _snapshot = snapshot
+            else:
+                snapshot = _snapshot
+    return snapshot
+
+@on_dataset_version_change
+def invalidate_snapshot():
+    """丢弃当前快照,下次读取时重新加载"""
+    global _snapshot, _generation
+    _generation += 1
+    _snapshot = None
+    logger.info("EconIndex快照已失效")
+
+@db_session
+def refresh_suggest_popularity() -> bool:
+    """
+    按最新的搜索次数重建当前快照的自动补全前缀树
+
+    快照只在数据集版本变化(重新导入)时重新加载,搜索热度与之无关,由后台按
+    SUGGEST_REFRESH_INTERVAL 定时刷新;补全排序最多落后一个刷新间隔加上搜索记录的后写间隔
+
+    返回:
+        已刷新返回True,快照尚未加载时返回False
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        return False
+    start_time = time.perf_counter()
+    snapshot.refresh_popularity(_load_popularity())
+    logger.info(f"自动补全热度已刷新, 用时 {time.perf_counter() - start_time:.3f} 秒")
+    return True
@@ -0,0 +1,184 @@
+"""
+快照文件模块 - 把快照的各列写入带版本号的二进制文件,读取时以只读mmap映射,不复制数据
+
+文件布局(本机字节序,各数据段按8字节对齐):
+    文件头: 魔数, 格式版本, 字节序标记, 列数, 数据集版本号
+    列目录: 每列的 名称, 类型码, 数据偏移, 元素个数
+    数据段: 数值列为定长数组 ('I' uint32 / 'i' int32 / 'd' float64);
+           字符串列('s')存放字符串池中的编号(uint32)
+    字符串池: 偏移数组(uint64, 字符串数+1) 与 UTF-8 字节串,相同字符串只存一份
+读取时数值列为mmap上的memoryview,字符串列为按需解码的 StringColumn,
+多个worker映射同一文件时共享操作系统的页缓存,进程内存不随worker数增加。
+写入先写临时文件再原子替换,已映射旧文件的进程不受影响。
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from app.core.config import logger
+
+MAGIC = b'ECONSNAP'
+FORMAT_VERSION = 1
+# 字节序标记,读取方字节序不同时读出的值不同
+BYTE_ORDER_MARK = 0x01020304
+# 文件头和列目录按本机字节序、标准大小、无填充打包
+HEADER = struct.Struct('=8sIIIq')
+ENTRY = struct.Struct('=32s1s7xQQ')
+ALIGN = 8
+
+# 数值列类型码
+NUMERIC_TYPES = ('I', 'i', 'd')
+STRING_TYPE = 's'
+# 类型码 -> 元素字节数,'Q'和'B'只用于字符串池
+ITEMSIZES = {'I': 4, 'i': 4, 'd': 8, 's': 4, 'Q': 8, 'B': 1}
+_POOL_OFFSETS = '__pool_offsets'
+_POOL_DATA = '__pool_data'
+
+
+class SnapshotFileError(Exception):
+    """快照文件不存在、已损坏或格式不兼容"""
+
+
+class StringColumn:
+    """字符串池上的只读字符串列,按下标访问时解码"""
+    __slots__ = ('ids', 'offsets', 'data')
+
+    def __init__(self, ids, offsets, data):
+        self.ids = ids
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.ids)))]
+        string_id = self.ids[index]
+        return str(self.data[self.offsets[string_id]:self.offsets[string_id + 1]], 'utf-8')
+
+    def __iter__(self):
+        for i in range(len(self.ids)):
+            yield self[i]
+
+
+def _padding(size: int) -> int:
+    return -size % ALIGN
+
+
+def write_columns(path: str, dataset_version: int, columns: dict):
+    """
+    写入快照文件
+
+    参数:
+        path: 文件路径
+        dataset_version: 列数据对应的数据集版本号
+        columns: 列名 -> (类型码, 数据),数值列的数据为array或数值序列,字符串列为字符串序列
+    """
+    pool = {}
+    sections = []
+    for name, (typecode, values) in columns.items():
+        if typecode == STRING_TYPE:
+            ids = array('I', (pool.setdefault(value, len(pool)) for value in values))
+            sections.append((name, STRING_TYPE, ids.tobytes(), len(ids)))
+        elif typecode in NUMERIC_TYPES:
+            data = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+            sections.append((name, typecode, data.tobytes(), len(data)))
+        else:
+            raise ValueError(f"不支持的列类型: {name} {typecode}")
+
+    strings = [value.encode('utf-8') for value in pool]
+    offsets = array('Q', [0])
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+    sections.append((_POOL_OFFSETS, 'Q', offsets.tobytes(), len(offsets)))
+    sections.append((_POOL_DATA, 'B', b''.join(strings), offsets[-1]))
+
+    offset = HEADER.size + ENTRY.size * len(sections)
+    offset += _padding(offset)
+    directory = []
+    for name, typecode, data, count in sections:
+        directory.append(ENTRY.pack(name.encode('ascii'), typecode.encode('ascii'), offset, count))
+        offset += len(data) + _padding(len(data))
+
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, len(sections), dataset_version))
+        f.write(b''.join(directory))
+        f.write(b'\0' * _padding(f.tell()))
+        for _, _, data, _ in sections:
+            f.write(data)
+            f.write(b'\0' * _padding(len(data)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    logger.info(f"快照文件已写入: {path}, 数据集版本 {dataset_version}, {offset} 字节, {len(pool)} 个不重复字符串")
+
+
+def read_header(path: str) -> int:
+    """
+    只读取文件头,返回快照文件的数据集版本号
+
+    文件不存在或格式不兼容时抛出SnapshotFileError
+    """
+    try:
+        with open(path, 'rb') as f:
+            return _parse_header(f.read(HEADER.size))[1]
+    except OSError as e:
+        raise SnapshotFileError(str(e)) from e
+
+
+def _parse_header(data: bytes):
+    if len(data) < HEADER.size:
+        raise SnapshotFileError("文件头不完整")
+    magic, format_version, byte_order_mark, count, dataset_version = HEADER.unpack(data[:HEADER.size])
+    if magic != MAGIC:
+        raise SnapshotFileError("不是快照文件")
+    if byte_order_mark != BYTE_ORDER_MARK:
+        raise SnapshotFileError(f"字节序与本机({sys.byteorder})不一致")
+    if format_version != FORMAT_VERSION:
+        raise SnapshotFileError(f"不支持的格式版本: {format_version}")
+    return count, dataset_version
+
+
+def read_columns(path: str):
+    """
+    以只读mmap映射快照文件
+
+    返回:
+        (数据集版本号, 列名 -> memoryview或StringColumn);
+        文件不存在、已损坏或格式不兼容时抛出SnapshotFileError
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotFileError(str(e)) from e
+
+    view = memoryview(mapped)
+    count, dataset_version = _parse_header(view[:HEADER.size])
+    sections = {}
+    for i in range(count):
+        start = HEADER.size + ENTRY.size * i
+        if start + ENTRY.size > len(view):
+            raise SnapshotFileError("列目录不完整")
+        name, typecode, offset, length = ENTRY.unpack(view[start:start + ENTRY.size])
+        name, typecode = name.rstrip(b'\0').decode('ascii'), typecode.decode('ascii')
+        itemsize = ITEMSIZES.get(typecode)
+        if itemsize is None or offset + length * itemsize > len(view):
+            raise SnapshotFileError(f"列数据超出文件范围: {name}")
+        data = view[offset:offset + length * itemsize]
+        sections[name] = (typecode, data if typecode == 'B' else data.cast('I' if typecode == STRING_TYPE else typecode))
+
+    try:
+        offsets, data = sections.pop(_POOL_OFFSETS)[1], sections.pop(_POOL_DATA)[1]
+    except KeyError:
+        raise SnapshotFileError("缺少字符串池")
+    columns = {
+        name: StringColumn(values, offsets, data) if typecode == STRING_TYPE else values
+        for name, (typecode, values) in sections.items()
+    }
+    return dataset_version, columns
@@ -3,5 +3,6 @@
 """
 from app.utils.request_utils import generate_request_id
 from app.utils.timer import timer, TimerContext
+from app.utils.write_behind import WriteBehindBuffer
 
-__all__ = ['generate_request_id', 'timer', 'TimerContext'] 
\ No newline at end of file
+__all__ = ['generate_request_id', 'timer', 'TimerContext', 'WriteBehindBuffer'] 
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+数据库执行模块 - 在有界线程池中运行阻塞的Pony ORM调用,避免阻塞事件循环
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import DB_POOL_SIZE
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+
+class DBExecutor:
+    """
+    数据库调用执行器
+
+    所有数据库相关的模型函数通过 run() 提交到固定大小的线程池执行,
+    同时并发执行的数据库调用数不超过 max_workers,超出的调用在队列中等待。
+    记录排队深度、执行中数量等指标,供健康检查和监控使用。
+    """
+
+    def __init__(self, max_workers: int):
+        """
+        初始化执行器
+
+        参数:
+            max_workers: 最大并发数据库调用数
+        """
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+
+    def _call(self, state, func, args, kwargs):
+        """在工作线程中执行函数并维护计数"""
+        with self._lock:
+            # 等待方在任务开始前已被取消并已扣减排队数,不再执行
+            if state["abandoned"]:
+                return None
+            state["started"] = True
+            self.queued -= 1
+            self.active += 1
+        try:
+            return func(*args, **kwargs)
+        except ValueError:
+            # 路由用ValueError表示参数不合法(400),不计为数据库调用失败
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, func, *args, **kwargs):
+        """
+        在线程池中执行阻塞函数并等待结果
+
+        参数:
+            func: 阻塞的模型函数
+            args, kwargs: 传给函数的参数
+
+        返回:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        state = {"started": False, "abandoned": False}
+        # 复制上下文,使请求级的contextvars在工作线程中可见
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, self._call, state, func, args, kwargs)
+        try:
+            return await loop.run_in_executor(self._pool, call)
+        finally:
+            # 等待被取消(如客户端断开)且任务尚未开始时,任务不会再执行,在这里扣减排队数
+            with self._lock:
+                if not state["started"] and not state["abandoned"]:
+                    state["abandoned"] = True
+                    self.queued -= 1
+
+    def stats(self) -> dict:
+        """返回执行器运行统计"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queued": self.max_queued
+            }
+
+
+# 全局执行器实例
+db_executor = DBExecutor(DB_POOL_SIZE)
+
+async def run_db(func, *args, **kwargs):
+    """
+    在数据库线程池中执行阻塞函数
+
+    用法:
+        feedbacks, next_cursor = await run_db(get_feedbacks, days=days, limit=limit)
+    """
+    return await db_executor.run(func, *args, **kwargs)
+
+
+# 轻量阻塞调用(数据集版本检测、指标汇总)使用的独立线程池,
+# 数据库线程池排满时这些调用不必排在慢查询之后
+_side_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="side")
+
+async def run_side(func, *args, **kwargs):
+    """
+    在独立的小线程池中执行轻量阻塞函数,不占用也不等待数据库线程池
+
+    用法:
+        content = await run_side(registry.render)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_side_pool, functools.partial(func, *args, **kwargs))
@@ -0,0 +1,73 @@
+"""
+快速JSON模块 - 基于orjson的JSON编码、响应类,以及可直接嵌入输出的预编码JSON片段
+
+数据集版本不变时快照中的任务、统计行不会变化,模型函数可以把每行编码一次得到的
+Fragment 返回给路由,路由把片段列表放进响应内容后由 dumps 原样拼接,不再逐字段编码。
+包含 Fragment 的内容只能用本模块的 dumps(或 FastJSONResponse)编码,
+不能交给FastAPI的 jsonable_encoder 和标准库json。
+未安装orjson或orjson低于3.10(没有Fragment)时退回标准库json,输出内容相同,只是没有加速。
+"""
+import json
+
+# 直接使用starlette的JSONResponse(即fastapi.responses.JSONResponse),模型层导入本模块时不加载FastAPI
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时使用标准库json
+    orjson = None
+
+# orjson 3.10 起才提供 Fragment,更早的版本同样退回标准库json
+if orjson is not None and getattr(orjson, 'Fragment', None) is None:
+    orjson = None
+
+
+def _stdlib_dumps(obj) -> bytes:
+    """按FastAPI JSONResponse相同的格式编码"""
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+if orjson is not None:
+    Fragment = orjson.Fragment
+
+    def dumps(obj) -> bytes:
+        """
+        编码为UTF-8 JSON字节
+
+        参数:
+            obj: 响应内容,可包含 Fragment、datetime 以及非字符串的字典键
+        """
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+else:
+    class Fragment:
+        """已编码的JSON片段,编码时原样输出"""
+        __slots__ = ('contents',)
+
+        def __init__(self, contents):
+            self.contents = contents.encode("utf-8") if isinstance(contents, str) else bytes(contents)
+
+    def _dumps_fallback(obj) -> bytes:
+        if isinstance(obj, Fragment):
+            return obj.contents
+        if isinstance(obj, dict):
+            items = (_stdlib_dumps(str(key)) + b":" + _dumps_fallback(value) for key, value in obj.items())
+            return b"{" + b",".join(items) + b"}"
+        if isinstance(obj, (list, tuple)):
+            return b"[" + b",".join(_dumps_fallback(value) for value in obj) + b"]"
+        return _stdlib_dumps(obj)
+
+    def dumps(obj) -> bytes:
+        """编码为UTF-8 JSON字节,逐层展开以便嵌入 Fragment"""
+        return _dumps_fallback(obj)
+
+
+def encode_fragment(obj) -> Fragment:
+    """把不可变的内容编码为可重复嵌入的JSON片段"""
+    return Fragment(dumps(obj))
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 编码的JSON响应,内容可以包含 Fragment"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,92 @@
+"""
+HTTP缓存工具模块 - 基于数据集版本生成ETag并处理条件请求
+"""
+import hashlib
+
+from fastapi import Request, Response
+
+from app.core.config import HTTP_CACHE_MAX_AGE
+from app.models.dataset_version import get_dataset_version
+from app.utils.metrics import record_cache
+
+
+def make_etag(request: Request, version: int) -> str:
+    """
+    生成强ETag,由数据集版本和请求路径、查询参数决定
+
+    参数:
+        request: 请求对象
+        version: 数据集版本号
+
+    返回:
+        带引号的ETag字符串
+    """
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}".encode('utf-8')).hexdigest()[:16]
+    return f'"v{version}-{digest}"'
+
+
+def etag_for_encoding(etag: str, encoding: str) -> str:
+    """
+    在ETag中加入内容编码,如 "v1-8c1f…" -> "v1-8c1f…-br"
+
+    同一内容的压缩版本和未压缩版本字节不同,不能共用一个强ETag
+    """
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def matching_etag(request: Request, etag: str) -> str:
+    """
+    返回If-None-Match中与ETag匹配的值,不匹配时返回None
+
+    客户端缓存的可能是未压缩版本,也可能是按当前Accept-Encoding压缩的版本,两者都视为匹配
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = [c.strip() for c in header.split(",")]
+    if "*" in candidates:
+        return etag
+    # If-None-Match使用弱比较,忽略W/前缀
+    from app.utils.response_cache import preferred_encoding
+    accepted = (etag, etag_for_encoding(etag, preferred_encoding(request)))
+    for candidate in candidates:
+        candidate = candidate[2:] if candidate.startswith("W/") else candidate
+        if candidate in accepted:
+            return candidate
+    return None
+
+
+def cache_headers(etag: str) -> dict:
+    """返回只读接口的缓存响应头,304响应同样需要Vary,共享缓存才不会混用不同编码的响应"""
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={HTTP_CACHE_MAX_AGE}",
+        "Vary": "Accept-Encoding"
+    }
+
+
+def check_not_modified(request: Request, response: Response):
+    """
+    处理条件GET请求
+
+    数据未变化(If-None-Match匹配)时返回304响应,调用方应直接返回它;
+    否则在response上设置ETag和Cache-Control并返回None
+
+    用法:
+        not_modified = check_not_modified(request, response)
+        if not_modified is not None:
+            return not_modified
+    """
+    etag = make_etag(request, get_dataset_version())
+    headers = cache_headers(etag)
+    matched = matching_etag(request, etag)
+    record_cache("http_etag", matched is not None)
+    if matched is not None:
+        # 304携带客户端所缓存版本(可能是压缩版本)的ETag
+        headers["ETag"] = matched
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,347 @@
+"""
+指标模块 - 进程内的计数器/仪表/直方图注册表,以Prometheus文本格式输出
+
+单worker时 /metrics 直接输出本进程的指标;多worker(METRICS_MULTIPROCESS)时每个进程按
+METRICS_FLUSH_INTERVAL 把自己的指标写入 METRICS_DIR/metrics-<pid>.json,
+/metrics 读取所有进程的文件合并: 计数器和直方图对所有进程(包括已退出的进程)求和,
+仪表只对仍在运行的进程求和。
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from app.core.config import METRICS_MULTIPROCESS, METRICS_DIR, METRICS_FLUSH_INTERVAL
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+# 默认延迟直方图分桶(秒)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """指标基类,按标签值元组保存样本"""
+    type = None
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def state(self) -> dict:
+        """返回 标签值元组 -> 样本值 的副本"""
+        with self._lock:
+            return {key: (list(value) if isinstance(value, list) else value) for key, value in self._values.items()}
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+    type = 'gauge'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    直方图
+
+    每组标签的样本为 [各分桶计数(非累计)..., 超出最大分桶的计数, 总和]
+    """
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                sample = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            sample[index] += 1
+            sample[-1] += value
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def _register(self, cls, name, help, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def register_collector(self, func):
+        """注册在输出前执行的回调,用于把其他组件的运行统计写入仪表"""
+        self._collectors.append(func)
+        return func
+
+    def dump(self) -> dict:
+        """导出本进程全部指标为可JSON序列化的字典"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"指标收集回调执行失败: {str(e)}", exc_info=True)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            result[metric.name] = {
+                "type": metric.type,
+                "help": metric.help,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, 'buckets', ())),
+                "samples": [[list(key), value] for key, value in metric.state().items()],
+            }
+        return result
+
+    # ---- 多进程 ----
+
+    def _process_file(self, pid: int = None) -> str:
+        return os.path.join(METRICS_DIR, f"metrics-{pid or os.getpid()}.json")
+
+    def write_process_file(self):
+        """把本进程指标写入进程文件(先写临时文件再替换,读取方不会读到半个文件)"""
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = self._process_file()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"pid": os.getpid(), "time": time.time(), "metrics": self.dump()}, f)
+        os.replace(tmp_path, path)
+        self._last_write = time.monotonic()
+
+    def maybe_write_process_file(self):
+        """多进程模式下距上次写入超过 METRICS_FLUSH_INTERVAL 时写入进程文件"""
+        if not METRICS_MULTIPROCESS or time.monotonic() - self._last_write < METRICS_FLUSH_INTERVAL:
+            return
+        try:
+            self.write_process_file()
+        except Exception as e:
+            logger.error(f"写入指标文件失败: {str(e)}", exc_info=True)
+
+    def collect(self) -> dict:
+        """
+        获取用于输出的指标,多进程模式下合并所有进程的文件
+
+        返回:
+            指标名 -> 指标描述及合并后的样本
+        """
+        if not METRICS_MULTIPROCESS:
+            return self.dump()
+
+        self.write_process_file()
+        merged = {}
+        for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(data.get("pid"))
+            for name, metric in data.get("metrics", {}).items():
+                if metric["type"] == 'gauge' and not alive:
+                    continue
+                target = merged.setdefault(name, {**metric, "samples": {}})
+                samples = target["samples"]
+                for labels, value in metric["samples"]:
+                    key = tuple(labels)
+                    if key not in samples:
+                        samples[key] = value
+                    elif isinstance(value, list):
+                        samples[key] = [a + b for a, b in zip(samples[key], value)]
+                    else:
+                        samples[key] = samples[key] + value
+        for metric in merged.values():
+            metric["samples"] = [[list(key), value] for key, value in metric["samples"].items()]
+        return merged
+
+    def render(self) -> str:
+        """以Prometheus文本格式输出全部指标"""
+        lines = []
+        for name, metric in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            labelnames = metric["labelnames"]
+            for labels, value in sorted(metric["samples"], key=lambda s: s[0]):
+                pairs = list(zip(labelnames, labels))
+                if metric["type"] != 'histogram':
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric["buckets"], value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {cumulative}")
+                cumulative += value[len(metric["buckets"])]
+                lines.append(f"{name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid) -> bool:
+    """判断进程是否仍在运行"""
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(pairs: list) -> str:
+    if not pairs:
+        return ""
+    escaped = [
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def reset_metrics_dir():
+    """清空多进程指标目录,由主进程在启动worker之前调用,避免计入上次运行的已退出进程"""
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# 全局注册表及应用使用的指标
+registry = MetricsRegistry()
+
+REQUEST_COUNT = registry.counter("http_requests_total", "HTTP请求数", ("method", "route", "status"))
+REQUEST_LATENCY = registry.histogram("http_request_duration_seconds", "HTTP请求处理耗时", ("method", "route"))
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "正在处理的HTTP请求数")
+FUNCTION_LATENCY = registry.histogram("function_duration_seconds", "模型函数及代码块执行耗时", ("function",))
+DB_QUERIES = registry.counter("db_queries_total", "执行的SQL语句数", ("kind",))
+DB_QUERY_LATENCY = registry.histogram("db_query_duration_seconds", "SQL语句执行耗时", ("kind",))
+CACHE_REQUESTS = registry.counter("cache_requests_total", "缓存查询次数", ("cache", "result"))
+
+
+def record_cache(cache: str, hit: bool):
+    """记录一次缓存命中或未命中"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _query_kind(sql: str) -> str:
+    """SQL语句类型(首个关键字),用作标签值"""
+    word = sql.lstrip().split(None, 1)[0].lower() if sql and sql.strip() else ''
+    return word if word in ('select', 'insert', 'update', 'delete', 'replace') else 'other'
+
+
+# SQL执行观察者,参数为 (sql, 耗时秒)
+_query_observers = []
+
+
+def add_query_observer(func):
+    """注册SQL执行观察者,每条SQL执行后调用"""
+    _query_observers.append(func)
+    return func
+
+
+def record_db_query(sql: str, duration: float):
+    """记录一次SQL执行"""
+    kind = _query_kind(sql)
+    DB_QUERIES.inc(kind=kind)
+    DB_QUERY_LATENCY.observe(duration, kind=kind)
+    for observer in _query_observers:
+        observer(sql, duration)
+
+
+def instrument_database(database):
+    """
+    统计Pony数据库实例执行的所有SQL
+
+    Pony的查询、flush和 db.execute/db.select 都经过 Database._exec_sql,
+    在实例上包装该方法即可统计,不影响其他Database实例
+    """
+    if getattr(database, '_metrics_instrumented', False):
+        return
+    exec_sql = database._exec_sql
+
+    def _exec_sql(sql, arguments=None, returning_id=False, start_transaction=False):
+        start = time.perf_counter()
+        try:
+            return exec_sql(sql, arguments, returning_id, start_transaction)
+        finally:
+            record_db_query(sql, time.perf_counter() - start)
+
+    database._exec_sql = _exec_sql
+    database._metrics_instrumented = True
+
+
+def _write_at_exit():
+    """进程退出时写入最终的指标,已退出进程的计数仍计入汇总"""
+    try:
+        registry.write_process_file()
+    except Exception as e:
+        logger.error(f"写入指标文件失败: {str(e)}", exc_info=True)
+
+
+if METRICS_MULTIPROCESS:
+    atexit.register(_write_at_exit)
@@ -0,0 +1,49 @@
+"""
+分页工具模块 - 键集分页游标的编码与解码
+"""
+import base64
+import json
+
+
+def encode_cursor(key) -> str:
+    """
+    将排序键编码为不透明的游标字符串
+
+    参数:
+        key: 排序键元组
+
+    返回:
+        URL安全的游标字符串, key为None时返回None
+    """
+    if key is None:
+        return None
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, types: tuple) -> tuple:
+    """
+    解码游标并校验字段类型
+
+    参数:
+        cursor: encode_cursor 生成的游标
+        types: 排序键各字段的类型, float字段同时接受int
+
+    返回:
+        排序键元组, 游标不合法时抛出ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("无效的分页游标")
+    if not isinstance(key, list) or len(key) != len(types):
+        raise ValueError("无效的分页游标")
+    result = []
+    for value, expected in zip(key, types):
+        if expected is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise ValueError("无效的分页游标")
+        result.append(value)
+    return tuple(result)
@@ -0,0 +1,123 @@
+"""
+限流模块 - 按客户端IP的令牌桶限流,每个路由使用独立的限流器
+
+每个IP一个令牌桶,容量为 burst,按 rate_per_minute 匀速补充,每次请求消耗一个令牌。
+桶只保存 (令牌数, 上次更新时间),检查时按流逝时间补充,不需要后台线程。
+桶按最近访问顺序保存在 OrderedDict 中,跟踪的IP数超过 max_keys 时淘汰最久未访问的;
+已经补满的桶与不存在的桶等价,检查时顺带清理一个这样的空闲桶,每次检查都是O(1)。
+限流状态只在本进程内,多worker部署时每个worker各自计数。
+
+用法:
+    wait = feedback_limiter.acquire(client_ip)
+    if wait > 0:
+        raise HTTPException(status_code=429, headers={"Retry-After": str(math.ceil(wait))})
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_FEEDBACK_PER_MINUTE, RATE_LIMIT_FEEDBACK_BURST,
+    RATE_LIMIT_SEARCH_LOG_PER_MINUTE, RATE_LIMIT_SEARCH_LOG_BURST
+)
+from app.utils.metrics import registry
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_CHECKS = registry.counter("rate_limit_checks_total", "限流检查次数", ("limiter", "result"))
+
+
+class TokenBucketLimiter:
+    """按键(客户端IP)的令牌桶限流器,线程安全"""
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int, max_keys: int = RATE_LIMIT_MAX_KEYS,
+                 enabled: bool = RATE_LIMIT_ENABLED):
+        """
+        参数:
+            name: 限流器名称,用作指标标签
+            rate_per_minute: 每分钟补充的令牌数
+            burst: 桶容量,即允许的突发请求数
+            max_keys: 最多跟踪的键数
+            enabled: 为False时所有请求都放行
+        """
+        if rate_per_minute <= 0 or burst < 1:
+            raise ValueError(f"限流器 {name} 的速率和容量必须为正数")
+        self.name = name
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.enabled = enabled
+        # 空桶补满所需的秒数,超过该时间未访问的桶可以直接丢弃
+        self._idle_seconds = burst / self.rate
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+        self.evictions = 0
+
+    def acquire(self, key) -> float:
+        """
+        为键消耗一个令牌
+
+        参数:
+            key: 限流键,通常是客户端IP
+
+        返回:
+            放行时返回0,被限流时返回距下一个令牌可用的秒数
+        """
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(self.burst)
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.limited += 1
+            if bucket is None:
+                self._buckets[key] = [tokens, now]
+                self._evict(now)
+            else:
+                bucket[0], bucket[1] = tokens, now
+        RATE_LIMIT_CHECKS.inc(limiter=self.name, result="limited" if wait else "allowed")
+        return wait
+
+    def _evict(self, now: float):
+        """淘汰超出上限的键,并清理一个已经补满的最久未访问的桶(调用方持有锁)"""
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        oldest = next(iter(self._buckets.values()))
+        if now - oldest[1] >= self._idle_seconds:
+            self._buckets.popitem(last=False)
+
+    def reset(self):
+        """清空所有桶"""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        """返回限流器的运行统计"""
+        with self._lock:
+            return {"keys": len(self._buckets), "allowed": self.allowed, "limited": self.limited,
+                    "evictions": self.evictions}
+
+
+# 反馈提交限流,超出时返回429
+feedback_limiter = TokenBucketLimiter("feedback", RATE_LIMIT_FEEDBACK_PER_MINUTE, RATE_LIMIT_FEEDBACK_BURST)
+# 职业查询记录限流,超出时照常返回查询结果,只是不记录这次查询
+search_log_limiter = TokenBucketLimiter("search_log", RATE_LIMIT_SEARCH_LOG_PER_MINUTE, RATE_LIMIT_SEARCH_LOG_BURST)
+
+# 所有限流器,用于输出运行统计
+limiters = (feedback_limiter, search_log_limiter)
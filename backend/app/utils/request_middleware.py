@@ -0,0 +1,65 @@
+"""
+请求中间件模块 - 一个纯ASGI中间件完成每个请求前后的公共处理
+
+- 按 DATASET_VERSION_CHECK_INTERVAL 检测数据集版本,其他进程重新导入数据后丢弃本进程缓存
+- 按请求追踪SQL,启用 SQL_TRACE_HEADERS 时通过 Server-Timing 响应头输出
+- 按路由模板统计请求数、耗时和正在处理的请求数
+
+路由模板取自路由匹配后FastAPI写入ASGI scope的 "route",不再逐个路由调用 matches();
+也不使用 BaseHTTPMiddleware,不会为每个请求额外创建任务和响应流。
+"""
+import time
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import SQL_TRACE_HEADERS
+from app.models.dataset_version import version_check_due, check_dataset_version
+from app.utils.db_executor import run_side
+from app.utils.metrics import registry, REQUEST_COUNT, REQUEST_LATENCY, REQUESTS_IN_FLIGHT
+from app.utils.sql_trace import sql_trace
+
+
+def route_template(scope) -> str:
+    """返回请求匹配的路由模板,未匹配时返回unmatched,避免标签值随路径参数无限增长"""
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class RequestMiddleware:
+    """数据集版本检测、SQL追踪和请求指标"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # 版本检测在独立线程池中执行,数据库线程池排满时触发检测的请求不必排在查询之后
+        if version_check_due():
+            await run_side(check_dataset_version)
+
+        method = scope["method"]
+        status = 500
+        REQUESTS_IN_FLIGHT.inc()
+        start_time = time.perf_counter()
+        # 进入时尚未完成路由匹配,追踪名称在使用时(N+1告警)才读取路由模板
+        with sql_trace(lambda: f"{method} {route_template(scope)}") as trace:
+
+            async def send_wrapper(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if SQL_TRACE_HEADERS and trace is not None:
+                        MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                REQUEST_LATENCY.observe(time.perf_counter() - start_time, method=method, route=route)
+                REQUEST_COUNT.inc(method=method, route=route, status=status)
+                REQUESTS_IN_FLIGHT.dec()
+                registry.maybe_write_process_file()
@@ -1,12 +1,74 @@
 """
 请求工具模块 - 提供请求处理相关功能
 """
+import ipaddress
 import time
 import logging
 
+from app.core.config import TRUSTED_PROXIES
+
 # 获取日志记录器
 logger = logging.getLogger(__name__)
 
+
+def _parse_networks(items: list) -> list:
+    """解析可信代理配置,忽略无法解析的项"""
+    networks = []
+    for item in items:
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"无法解析的可信代理地址: {item}")
+    return networks
+
+
+_trusted_networks = _parse_networks(TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(host: str) -> bool:
+    """判断地址是否属于配置的可信反向代理"""
+    if not _trusted_networks or not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks)
+
+
+def get_client_ip(request) -> str:
+    """
+    获取客户端IP地址,用于限流和搜索记录
+
+    X-Forwarded-For / X-Real-IP 可以由客户端任意填写,只有直接连接来自可信代理(TRUSTED_PROXIES)时才读取:
+    从X-Forwarded-For最右侧开始跳过可信代理,第一个不可信的地址即为客户端。
+    未配置可信代理时始终使用直接连接的地址。
+
+    参数:
+        request: 请求对象
+
+    返回:
+        客户端IP地址
+    """
+    peer = request.client.host if request.client and request.client.host else "127.0.0.1"
+    if not is_trusted_proxy(peer):
+        return peer
+
+    forwarded_for = request.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not is_trusted_proxy(hop):
+                return hop
+        # 整条链都是可信代理时取最早的一跳
+        if hops:
+            return hops[0]
+
+    real_ip = request.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip.strip()
+    return peer
+
 def generate_request_id():
     """
     生成唯一的请求ID
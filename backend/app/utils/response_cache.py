@@ -0,0 +1,233 @@
+"""
+压缩响应缓存模块 - 按 (路由, 查询参数, 数据集版本) 缓存编码后的JSON响应体及其gzip/brotli压缩版本
+
+数据集版本不变时,统计、任务排行、职业任务分布等接口对所有访问者返回相同的内容。
+首次请求时编码JSON并按客户端支持的编码压缩,之后的请求直接返回缓存的字节,
+既不编码JSON也不压缩。每种压缩编码在第一次被请求时生成并缓存。
+缓存键包含数据集版本号,版本递增后旧条目不会再被命中;检测到其他进程导入数据时立即清空缓存。
+缓存按最近使用顺序淘汰,总字节数和条目数均有上限。
+
+用法(在 check_not_modified 之后):
+    cached, cache_key = await response_cache.lookup(request, response)
+    if cached is not None:
+        return cached
+    ...
+    return await response_cache.store(cache_key, request, response, payload)
+"""
+import gzip
+import logging
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import (
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_COMPRESS_MIN_SIZE, RESPONSE_GZIP_LEVEL, RESPONSE_BROTLI_QUALITY
+)
+from app.models.dataset_version import get_dataset_version, on_dataset_version_change
+from app.utils.fast_json import dumps
+from app.utils.http_cache import etag_for_encoding
+from app.utils.metrics import record_cache
+
+try:
+    import brotli
+except ImportError:  # 未安装brotli时只提供gzip
+    brotli = None
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+# 服务端优先选择的压缩编码
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def encode_json(payload) -> bytes:
+    """编码JSON响应体,payload 中可以包含预编码的 Fragment"""
+    return dumps(payload)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """按指定编码压缩"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+
+
+def preferred_encoding(request: Request) -> str:
+    """
+    根据Accept-Encoding选择服务端优先的压缩编码,不考虑响应体大小
+
+    返回:
+        'br'、'gzip',客户端不接受压缩时返回None
+    """
+    header = request.headers.get("accept-encoding")
+    if not header:
+        return None
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        # q=0 表示明确拒绝该编码
+        if params.startswith("q=") and params[2:].strip("0.") == "":
+            continue
+        accepted.add(name.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def negotiate_encoding(request: Request, size: int) -> str:
+    """
+    根据Accept-Encoding和响应体大小选择压缩编码
+
+    返回:
+        'br'、'gzip',不压缩时返回None
+    """
+    if size < RESPONSE_COMPRESS_MIN_SIZE:
+        return None
+    return preferred_encoding(request)
+
+
+class CachedBody:
+    """一个缓存的响应体: 未压缩的JSON字节及已生成的各压缩版本"""
+    __slots__ = ('identity', 'encoded')
+
+    def __init__(self, identity: bytes):
+        self.identity = identity
+        self.encoded = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.identity) + sum(len(body) for body in self.encoded.values())
+
+
+class ResponseCache:
+    """LRU压缩响应缓存,线程安全"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        """
+        参数:
+            max_entries: 最多缓存的响应数
+            max_bytes: 缓存总字节数上限(含各压缩版本)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(request: Request, version: int) -> tuple:
+        """缓存键: (路径, 排序后的查询参数, 数据集版本)"""
+        return request.url.path, tuple(sorted(request.query_params.multi_items())), version
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry: CachedBody):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+
+    def _add_encoding(self, key, entry: CachedBody, encoding: str, body: bytes):
+        with self._lock:
+            if encoding in entry.encoded:
+                return
+            entry.encoded[encoding] = body
+            if self._entries.get(key) is entry:
+                self._bytes += len(body)
+                self._evict()
+
+    def _evict(self):
+        """按最近最少使用淘汰,直到不超过上限(调用方持有锁)"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """返回缓存的运行统计"""
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "evictions": self.evictions}
+
+    async def _respond(self, key, entry: CachedBody, request: Request, response: Response) -> Response:
+        """按客户端支持的编码生成响应,该编码尚未生成时在线程池中压缩并缓存"""
+        encoding = negotiate_encoding(request, len(entry.identity))
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in ("content-length", "vary")}
+        headers["Vary"] = "Accept-Encoding"
+        if encoding is None:
+            return Response(content=entry.identity, media_type="application/json", headers=headers)
+        body = entry.encoded.get(encoding)
+        if body is None:
+            body = await run_in_threadpool(compress, entry.identity, encoding)
+            self._add_encoding(key, entry, encoding, body)
+        headers["Content-Encoding"] = encoding
+        # 各压缩版本的字节不同,强ETag需要区分内容编码
+        if "etag" in headers:
+            headers["etag"] = etag_for_encoding(headers["etag"], encoding)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def lookup(self, request: Request, response: Response):
+        """
+        查找缓存的响应
+
+        参数:
+            request: 请求对象
+            response: 路由注入的响应对象,其响应头(ETag等)会复制到返回的响应上
+
+        返回:
+            (命中时的响应或None, 缓存键),未命中时用缓存键调用 store
+        """
+        if not RESPONSE_CACHE_ENABLED:
+            return None, None
+        # 在计算响应之前读取版本,计算期间数据更新时结果记在旧版本下,不会被新版本的请求命中
+        key = self.make_key(request, get_dataset_version())
+        entry = self._get(key)
+        record_cache("response", entry is not None)
+        if entry is None:
+            return None, key
+        return await self._respond(key, entry, request, response), key
+
+    async def store(self, key, request: Request, response: Response, payload) -> Response:
+        """
+        编码响应内容并缓存,返回按客户端支持的编码压缩后的响应
+
+        参数:
+            key: lookup 返回的缓存键,为None(缓存未启用)时只编码和压缩不缓存
+            request: 请求对象
+            response: 路由注入的响应对象
+            payload: 响应内容,可包含模型函数返回的预编码 Fragment
+        """
+        entry = CachedBody(await run_in_threadpool(encode_json, payload))
+        if key is not None:
+            self._put(key, entry)
+        return await self._respond(key, entry, request, response)
+
+
+# 全局响应缓存
+response_cache = ResponseCache()
+
+
+@on_dataset_version_change
+def clear_response_cache():
+    """数据集版本变化后旧版本的缓存不会再被命中,立即释放内存"""
+    response_cache.clear()
+    logger.info("压缩响应缓存已清空")
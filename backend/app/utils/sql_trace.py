@@ -0,0 +1,161 @@
+"""
+SQL追踪模块 - 按请求(或后台任务)记录执行的SQL,发现同一形状语句被重复执行的N+1问题
+
+追踪对象保存在contextvar中,run_db会复制上下文到数据库线程,因此请求处理函数
+在线程池中执行的Pony查询同样计入该请求。所有经过 instrument_database 的SQL
+通过 metrics 的查询观察者回调到 record_query。
+"""
+import contextvars
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+
+from app.core.config import SQL_TRACE_ENABLED, SQL_TRACE_REPEAT_THRESHOLD, SQL_TRACE_SLOWEST
+from app.utils.metrics import add_query_observer, registry
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+REPEATED_STATEMENTS = registry.counter(
+    "sql_repeated_statements_total", "单个请求或任务内同一形状SQL执行次数超过阈值的次数", ("scope",)
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(sql: str) -> str:
+    """
+    语句形状: 字面量和占位符统一为?, IN列表折叠为(?...), 合并空白
+
+    参数值不同但结构相同的语句得到相同的形状
+    """
+    shape = sql.replace('%s', '?')
+    shape = _STRING_LITERAL.sub('?', shape)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class SQLTrace:
+    """一个请求或任务内的SQL执行记录"""
+
+    def __init__(self, scope):
+        """
+        参数:
+            scope: 追踪范围名称(路由模板或函数名),用于日志和指标标签;
+                   也可以是返回名称的无参函数,请求进入时尚未完成路由匹配,使用时再取路由模板
+        """
+        self._scope = scope
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest = []  # (耗时, 序号, SQL) 小顶堆,保留最慢的 SQL_TRACE_SLOWEST 条
+        self.shapes = Counter()
+        self.repeated = set()
+        self._lock = threading.Lock()
+
+    @property
+    def scope(self) -> str:
+        return self._scope() if callable(self._scope) else self._scope
+
+    def record(self, sql: str, duration: float):
+        """记录一条SQL,同一形状首次达到阈值时告警"""
+        shape = statement_shape(sql)
+        with self._lock:
+            self.count += 1
+            self.total_time += duration
+            item = (duration, self.count, sql)
+            if len(self.slowest) < SQL_TRACE_SLOWEST:
+                heapq.heappush(self.slowest, item)
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+            self.shapes[shape] += 1
+            flagged = self.shapes[shape] == SQL_TRACE_REPEAT_THRESHOLD
+            if flagged:
+                self.repeated.add(shape)
+        if flagged:
+            REPEATED_STATEMENTS.inc(scope=self.scope)
+            logger.warning(f"疑似N+1查询: {self.scope} 中同一语句已执行 {SQL_TRACE_REPEAT_THRESHOLD} 次: {shape[:300]}")
+
+    def slowest_statements(self) -> list:
+        """按耗时降序返回最慢的语句 [(耗时, SQL)]"""
+        with self._lock:
+            return [(duration, sql) for duration, _, sql in sorted(self.slowest, reverse=True)]
+
+    def server_timing(self) -> str:
+        """
+        生成 Server-Timing 响应头的值
+
+        只包含语句数和耗时,不输出SQL文本,避免把表名、列名和字面量暴露给客户端;
+        具体语句见日志中的N+1告警
+        """
+        entries = [f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries"']
+        for i, (duration, _) in enumerate(self.slowest_statements(), 1):
+            entries.append(f'db-slow-{i};dur={duration * 1000:.2f}')
+        if self.repeated:
+            entries.append(f'db-repeated;desc="{len(self.repeated)} statement shapes over {SQL_TRACE_REPEAT_THRESHOLD}"')
+        return ", ".join(entries)
+
+
+_current_trace = contextvars.ContextVar("sql_trace", default=None)
+
+
+def current_trace():
+    """返回当前上下文的SQL追踪对象,未在追踪时返回None"""
+    return _current_trace.get()
+
+
+def record_query(sql: str, duration: float):
+    """查询观察者: 把SQL记入当前追踪"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(sql, duration)
+
+
+@contextmanager
+def sql_trace(scope):
+    """
+    在代码块内追踪SQL,已在追踪中时沿用外层的追踪对象
+
+    参数:
+        scope: 追踪范围名称,或返回名称的无参函数
+
+    用法:
+        with sql_trace("/occupation/tasks") as trace:
+            ...
+        trace.count, trace.total_time
+    """
+    trace = _current_trace.get()
+    if trace is not None or not SQL_TRACE_ENABLED:
+        yield trace
+        return
+    trace = SQLTrace(scope)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        logger.debug(f"{trace.scope} 执行SQL {trace.count} 条, 数据库耗时 {trace.total_time * 1000:.1f}ms, "
+                     f"总耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def sql_traced(func):
+    """装饰器: 在函数执行期间追踪SQL,用于请求之外的db_session任务(统计重算、后写缓冲等)"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with sql_trace(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+if SQL_TRACE_ENABLED:
+    add_query_observer(record_query)
@@ -0,0 +1,137 @@
+"""
+启动模块 - 记录启动各阶段耗时,在后台预热热点数据,并维护就绪状态
+
+状态依次为 starting(create_app执行中) -> warming(等待或正在预热) -> ready。
+预热在启动事件中作为后台任务执行,期间已经可以响应请求,但 /health/ready 返回503,
+滚动重启时负载均衡等到预热完成才把流量切到新实例。某个预热步骤失败只记录错误,不阻止就绪。
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+from app.core.config import WARMUP_TOP_K
+from app.utils.metrics import registry
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+BOOT_PHASE_SECONDS = registry.gauge("boot_phase_duration_seconds", "启动各阶段耗时", ("phase",))
+APP_READY = registry.gauge("app_ready", "应用是否已完成启动预热")
+
+
+def _warm_snapshot():
+    """加载快照(优先映射快照文件)及标题搜索索引"""
+    from app.models.snapshot import get_snapshot
+    get_snapshot()
+
+
+def _warm_suggest_index():
+    """构建依赖搜索热度的自动补全前缀树"""
+    from app.models.snapshot import get_snapshot
+    get_snapshot().suggest_index
+
+
+def _warm_stats():
+    """编码各统计指标排名和任务排行的前 WARMUP_TOP_K 条"""
+    from app.models.EconIndex import occupation_stats, get_top_tasks_by_percentage
+    from app.models.snapshot import STATS_METRICS
+    for metric in STATS_METRICS:
+        occupation_stats(metric, WARMUP_TOP_K, encoded=True)
+    get_top_tasks_by_percentage(WARMUP_TOP_K, encoded=True)
+
+
+def _warm_popular():
+    """执行一次热门职业查询,预热SQLite页缓存"""
+    from app.models.EconIndex import get_popular_occupation_searches
+    get_popular_occupation_searches()
+
+
+# 预热步骤: (名称, 在数据库线程池中执行的函数)
+WARMUP_STEPS = [
+    ("snapshot", _warm_snapshot),
+    ("suggest_index", _warm_suggest_index),
+    ("stats", _warm_stats),
+    ("popular", _warm_popular),
+]
+
+
+class BootTracker:
+    """启动阶段计时及就绪状态"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.state = "starting"
+        self.phases = {}
+        self.errors = {}
+        self.boot_seconds = None
+
+    def _record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        BOOT_PHASE_SECONDS.set(seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        记录代码块耗时为一个启动阶段
+
+        用法:
+            with boot.phase("database"):
+                setup_database(...)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def mark_warming(self):
+        """create_app 完成,等待预热"""
+        if self.state == "starting":
+            self.state = "warming"
+
+    def mark_ready(self):
+        """预热完成(或未启用预热),记录总启动耗时并输出各阶段耗时"""
+        self.state = "ready"
+        self.boot_seconds = time.perf_counter() - self.started
+        APP_READY.set(1)
+        phases = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.phases.items())
+        logger.info(f"应用已就绪, 启动总耗时 {self.boot_seconds * 1000:.1f}ms: {phases}")
+
+    async def warm_up(self, steps: list = None):
+        """
+        依次执行预热步骤,完成后标记就绪
+
+        参数:
+            steps: 预热步骤列表,默认为 WARMUP_STEPS
+        """
+        from app.utils.db_executor import run_db
+
+        self.mark_warming()
+        if steps is None:
+            steps = WARMUP_STEPS
+        for name, func in steps:
+            try:
+                with self.phase(f"warmup.{name}"):
+                    await run_db(func)
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.error(f"预热步骤 {name} 执行失败: {str(e)}", exc_info=True)
+        self.mark_ready()
+
+    def status(self) -> dict:
+        """就绪状态、总启动耗时及各阶段耗时(毫秒)"""
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "boot_ms": round(self.boot_seconds * 1000, 1) if self.boot_seconds is not None else None,
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "errors": self.errors,
+        }
+
+
+# 全局启动状态,在 app 包导入时创建,计时从进程开始导入应用代码时算起
+boot = BootTracker()
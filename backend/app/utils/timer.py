@@ -4,10 +4,11 @@
 import time
 from functools import wraps
 from app.core.config import logger
+from app.utils.metrics import FUNCTION_LATENCY
 
 def timer(func):
     """
-    计时装饰器,用于测量函数执行时间
+    计时装饰器,测量函数执行时间并记入 function_duration_seconds 直方图
     
     参数:
         func: 需要计时的函数
@@ -17,17 +18,18 @@ def timer(func):
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
-        duration = end_time - start_time
-        logger.info(f"函数 {func.__name__} 执行时间: {duration:.3f} 秒")
-        return result
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start_time
+            FUNCTION_LATENCY.observe(duration, function=func.__name__)
+            logger.debug(f"函数 {func.__name__} 执行时间: {duration:.3f} 秒")
     return wrapper
 
 class TimerContext:
     """
-    计时上下文管理器,用于测量代码块执行时间
+    计时上下文管理器,测量代码块执行时间并记入 function_duration_seconds 直方图
     
     用法:
         with TimerContext("操作名称"):
@@ -45,11 +47,12 @@ class TimerContext:
         
     def __enter__(self):
         """进入上下文时开始计时"""
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         return self
         
     def __exit__(self, exc_type, exc_val, exc_tb):
         """退出上下文时结束计时并记录"""
-        duration = time.time() - self.start_time
-        logger.info(f"{self.name} 执行时间: {duration:.3f} 秒")
+        duration = time.perf_counter() - self.start_time
+        FUNCTION_LATENCY.observe(duration, function=self.name)
+        logger.debug(f"{self.name} 执行时间: {duration:.3f} 秒")
 
@@ -0,0 +1,255 @@
+"""
+后写缓冲模块 - 在进程内收集待写入记录,由后台线程按批量或时间间隔合并提交
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+# 获取日志记录器
+logger = logging.getLogger(__name__)
+
+# 缓冲区满时的处理策略
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # 丢弃新记录
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # 丢弃最早的记录
+
+
+class WriteBehindBuffer:
+    """
+    后写缓冲区
+
+    put() 只把记录放入内存队列,不访问数据库;后台线程在以下任一条件满足时调用 flush_func 批量写入:
+    - 待写记录数达到 batch_size
+    - 距上次写入超过 flush_interval 秒
+    队列长度上限为 max_pending,超出时按 overflow 策略丢弃记录并计数。
+    写入失败的批次(如SQLite短暂的 database is locked)按指数退避重试 max_retries 次,
+    重试前暂停写入后续记录以保持顺序,等待重试的记录同样计入 max_pending;重试用尽后才丢弃并计为失败。
+    stop() 或进程退出时会写完剩余记录。
+    """
+
+    def __init__(self, name, flush_func, batch_size=100, flush_interval=2.0, max_pending=10000,
+                 overflow=OVERFLOW_DROP_NEWEST, max_retries=3, retry_backoff=0.5):
+        """
+        初始化缓冲区
+
+        参数:
+            name: 缓冲区名称,用于日志和线程名
+            flush_func: 批量写入函数,参数为记录列表
+            batch_size: 每批写入的最大记录数
+            flush_interval: 最长写入间隔(秒)
+            max_pending: 内存中允许积压的最大记录数
+            overflow: 队列满时的策略 (drop_newest 或 drop_oldest)
+            max_retries: 一批记录写入失败后的最大重试次数
+            retry_backoff: 首次重试前的等待时间(秒),之后每次加倍
+        """
+        if overflow not in (OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST):
+            raise ValueError(f"不支持的溢出策略: {overflow}")
+        self.name = name
+        self.flush_func = flush_func
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue = deque()
+        # 写入失败等待重试的批次、已失败次数和最早的重试时间
+        self._retry_batch = None
+        self._retry_attempts = 0
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+
+        # 统计计数
+        self.accepted = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+
+    def put(self, item) -> bool:
+        """
+        放入一条待写记录
+
+        返回:
+            记录被接受返回True,因队列已满被丢弃返回False
+        """
+        with self._cond:
+            if self._stopping:
+                self.dropped += 1
+                return False
+            if self._thread is None:
+                self._start_locked()
+            if self._pending_locked() >= self.max_pending:
+                self.dropped += 1
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    return False
+                self._drop_oldest_locked()
+            self._queue.append(item)
+            self.accepted += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+            return True
+
+    def _pending_locked(self) -> int:
+        """队列和等待重试的记录总数,调用方需持有 self._cond"""
+        return len(self._queue) + (len(self._retry_batch) if self._retry_batch else 0)
+
+    def _drop_oldest_locked(self):
+        """丢弃最早的一条记录(等待重试的批次在队列之前),调用方需持有 self._cond"""
+        if self._retry_batch:
+            self._retry_batch.pop(0)
+            if not self._retry_batch:
+                self._retry_batch = None
+        else:
+            self._queue.popleft()
+
+    def _start_locked(self):
+        """启动后台写入线程,调用方需持有 self._cond"""
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info(f"后写缓冲区 {self.name} 已启动, 批量: {self.batch_size}, 间隔: {self.flush_interval}秒")
+
+    def _run(self):
+        """后台线程主循环"""
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    if self._retry_batch is not None:
+                        # 等待重试期间不写入后续记录
+                        delay = self._retry_at - time.monotonic()
+                        if delay > 0:
+                            self._cond.wait(delay)
+                    elif len(self._queue) < self.batch_size:
+                        self._cond.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self.flush()
+
+    def _take_batch(self, wait: bool):
+        """
+        取出下一批记录,等待重试的批次优先
+
+        参数:
+            wait: 重试时间未到时是否仍取出该批次
+
+        返回:
+            (记录列表, 已失败次数, 写入前需等待的秒数); 没有可写入的记录时记录列表为空
+        """
+        with self._cond:
+            if self._retry_batch is not None:
+                delay = self._retry_at - time.monotonic()
+                if delay > 0 and not wait:
+                    return [], 0, 0
+                batch, attempts = self._retry_batch, self._retry_attempts
+                self._retry_batch = None
+                return batch, attempts, max(delay, 0)
+            n = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(n)], 0, 0
+
+    def _retry_later(self, batch: list, attempts: int, error: Exception):
+        """
+        安排失败的批次重试,重试次数用尽时丢弃并计为失败
+
+        参数:
+            batch: 写入失败的记录
+            attempts: 包括本次在内的失败次数
+            error: 本次失败的异常
+        """
+        if attempts > self.max_retries:
+            with self._cond:
+                self.failed += len(batch)
+            logger.error(f"后写缓冲区 {self.name} 写入 {len(batch)} 条记录失败 {attempts} 次,放弃写入: {str(error)}",
+                         exc_info=error)
+            return
+        with self._cond:
+            # 重新放回后超出积压上限时,按溢出策略丢弃最新或最早的记录
+            excess = self._pending_locked() + len(batch) - self.max_pending
+            if excess > 0:
+                self.dropped += excess
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    from_queue = min(excess, len(self._queue))
+                    for _ in range(from_queue):
+                        self._queue.pop()
+                    batch = batch[:len(batch) - (excess - from_queue)]
+                else:
+                    batch = batch[excess:]
+            if not batch:
+                return
+            delay = self.retry_backoff * 2 ** (attempts - 1)
+            self._retry_batch = batch
+            self._retry_attempts = attempts
+            self._retry_at = time.monotonic() + delay
+            self.retries += 1
+        logger.warning(f"后写缓冲区 {self.name} 写入 {len(batch)} 条记录失败,{delay:.1f} 秒后第 {attempts} 次重试: "
+                       f"{str(error)}")
+
+    def flush(self, wait: bool = False) -> int:
+        """
+        写入当前积压的全部记录
+
+        参数:
+            wait: 有等待重试的批次时是否等到重试时间后继续写入(关闭时使用),否则留给后台线程
+
+        返回:
+            成功写入的记录数
+        """
+        total = 0
+        with self._flush_lock:
+            while True:
+                batch, attempts, delay = self._take_batch(wait)
+                if not batch:
+                    break
+                if delay:
+                    time.sleep(delay)
+                start_time = time.perf_counter()
+                try:
+                    self.flush_func(batch)
+                except Exception as e:
+                    self._retry_later(batch, attempts + 1, e)
+                    continue
+                with self._cond:
+                    self.written += len(batch)
+                    self.batches += 1
+                total += len(batch)
+                logger.debug(f"后写缓冲区 {self.name} 写入 {len(batch)} 条记录, "
+                             f"耗时: {time.perf_counter() - start_time:.3f} 秒")
+        return total
+
+    def stop(self, timeout: float = 10.0):
+        """
+        停止后台线程并写入剩余记录
+
+        参数:
+            timeout: 等待后台线程退出的最长时间(秒)
+        """
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        written = self.flush(wait=True)
+        logger.info(f"后写缓冲区 {self.name} 已停止, 关闭时写入 {written} 条记录")
+
+    def stats(self) -> dict:
+        """返回缓冲区运行统计"""
+        with self._cond:
+            # 等待重试的记录也计入积压数,与 max_pending 的判断一致
+            return {
+                "pending": self._pending_locked(),
+                "accepted": self.accepted,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "retries": self.retries,
+                "batches": self.batches
+            }
@@ -0,0 +1,89 @@
+"""
+进程内ASGI客户端 - 直接调用ASGI应用,不经过网络和HTTP客户端库,用于基准测试路由
+"""
+import asyncio
+from urllib.parse import urlencode
+
+
+class ASGIResponse:
+    """ASGI响应"""
+
+    def __init__(self, status: int, headers: list, body: bytes):
+        self.status = status
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in headers}
+        self.body = body
+
+
+class ASGIClient:
+    """
+    最小的ASGI HTTP客户端
+
+    用法:
+        client = ASGIClient(app)
+        response = await client.get("/occupation/search", {"keyword": "data"})
+    """
+
+    def __init__(self, app, client_ip: str = "127.0.0.1"):
+        self.app = app
+        self.client_ip = client_ip
+
+    async def request(self, method: str, path: str, params=None, headers: dict = None, body: bytes = b"") -> ASGIResponse:
+        """
+        发送一个请求并读取完整响应
+
+        参数:
+            method: HTTP方法
+            path: 请求路径
+            params: 查询参数,字典或 (键, 值) 列表
+            headers: 请求头
+            body: 请求体
+        """
+        raw_headers = [(b"host", b"benchmark")]
+        raw_headers += [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in (headers or {}).items()]
+        if body:
+            raw_headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(params or {}, doseq=True).encode(),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": (self.client_ip, 50000),
+            "server": ("benchmark", 80),
+        }
+
+        request_sent = False
+        response_complete = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # 流式响应会同时监听断开事件,响应结束前不能返回disconnect
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        status, response_headers, chunks = None, [], []
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_complete.set()
+
+        await self.app(scope, receive, send)
+        return ASGIResponse(status, response_headers, b"".join(chunks))
+
+    async def get(self, path: str, params=None, headers: dict = None) -> ASGIResponse:
+        """发送GET请求"""
+        return await self.request("GET", path, params, headers)
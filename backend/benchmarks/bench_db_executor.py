@@ -0,0 +1,128 @@
+"""
+数据库线程池基准测试 - 对比在事件循环中直接调用Pony函数与通过run_db提交到线程池的吞吐和事件循环延迟
+
+用法(在backend目录下):
+    python benchmarks/bench_db_executor.py --clients 32 --duration 5
+
+每种模式下启动 clients 个并发协程,按 读反馈列表 80% / 写反馈 20% 的比例循环调用模型函数,
+同时用一个心跳协程每 5ms 测一次事件循环调度延迟,延迟越高说明其他请求被阻塞得越久。
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 使用临时数据库,避免影响实际数据
+_tmp_dir = tempfile.mkdtemp(prefix="bench_db_executor_")
+os.environ['DB_TYPE'] = 'sqlite'
+os.environ['DATABASE_PATH'] = os.path.join(_tmp_dir, 'bench.sqlite')
+os.environ['LOG_DIR'] = _tmp_dir
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pony.orm import db_session, desc, select
+
+from app.core.config import DB_TYPE, DB_CONFIG
+from app.models import setup_database
+from app.models.EconIndex import FeedbackRecord, add_feedback
+from app.utils.db_executor import run_db
+
+
+@db_session
+def seed(records: int):
+    """写入用于读负载的反馈记录"""
+    now = datetime.now()
+    for i in range(records):
+        FeedbackRecord(
+            feedback_type=random.choice(['建议', '问题', '其他']),
+            feedback_content=f"feedback {i}",
+            feedback_time=now - timedelta(minutes=random.randint(0, 60 * 24 * 5)),
+            client_ip="127.0.0.1"
+        )
+
+
+@db_session
+def recent_feedbacks(days: int, limit: int) -> list:
+    """读负载: 按时间倒序读取最近的反馈记录"""
+    since = datetime.now() - timedelta(days=days)
+    query = select(f for f in FeedbackRecord if f.feedback_time >= since).order_by(desc(FeedbackRecord.feedback_time))
+    return [f.to_dict() for f in query[:limit]]
+
+
+def pick_operation():
+    """按读写比例选择一次调用"""
+    if random.random() < 0.8:
+        return recent_feedbacks, (5, 200), {}
+    return add_feedback, (), {"feedback_type": "建议", "feedback_content": "benchmark", "client_ip": "127.0.0.1"}
+
+
+async def client(mode: str, deadline: float, counter: list):
+    """单个并发客户端循环"""
+    while time.perf_counter() < deadline:
+        func, args, kwargs = pick_operation()
+        if mode == 'pool':
+            await run_db(func, *args, **kwargs)
+        else:
+            func(*args, **kwargs)
+            # 直接调用时让出一次事件循环,模拟请求之间的切换
+            await asyncio.sleep(0)
+        counter[0] += 1
+
+
+async def heartbeat(deadline: float, interval: float, lags: list):
+    """测量事件循环调度延迟"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run_mode(mode: str, clients: int, duration: float) -> dict:
+    """运行一种模式并返回结果"""
+    counter = [0]
+    lags = []
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(
+        heartbeat(deadline, 0.005, lags),
+        *(client(mode, deadline, counter) for _ in range(clients))
+    )
+    elapsed = time.perf_counter() - start
+    lags.sort()
+    return {
+        "mode": mode,
+        "ops": counter[0],
+        "ops_per_sec": counter[0] / elapsed,
+        "loop_lag_p50_ms": statistics.median(lags) * 1000 if lags else 0.0,
+        "loop_lag_p99_ms": lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000 if lags else 0.0,
+        "loop_lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库线程池基准测试")
+    parser.add_argument('--clients', type=int, default=32, help='并发客户端数量')
+    parser.add_argument('--duration', type=float, default=5.0, help='每种模式运行秒数')
+    parser.add_argument('--records', type=int, default=50000, help='预置的反馈记录数')
+    args = parser.parse_args()
+
+    random.seed(42)
+    setup_database(DB_TYPE, DB_CONFIG)
+    seed(args.records)
+
+    print(f"并发客户端: {args.clients}, 每种模式运行: {args.duration}秒, 反馈记录: {args.records}")
+    print(f"{'模式':<8}{'调用数':>10}{'吞吐(次/秒)':>14}{'循环延迟p50(ms)':>18}{'p99(ms)':>10}{'max(ms)':>10}")
+    for mode in ('inline', 'pool'):
+        result = asyncio.run(run_mode(mode, args.clients, args.duration))
+        print(f"{result['mode']:<8}{result['ops']:>10}{result['ops_per_sec']:>14.1f}"
+              f"{result['loop_lag_p50_ms']:>18.2f}{result['loop_lag_p99_ms']:>10.2f}{result['loop_lag_max_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
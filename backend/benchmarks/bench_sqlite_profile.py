@@ -0,0 +1,153 @@
+"""
+SQLite性能配置基准测试 - 对比默认配置、SQLITE_PRAGMAS 性能配置、性能配置+只读连接 三种模式下的混合读写吞吐
+
+用法(在backend目录下):
+    python benchmarks/bench_sqlite_profile.py --readers 8 --writers 2 --duration 5
+
+每种模式在独立子进程中使用新的临时数据库运行(journal_mode 是数据库文件级别的设置),
+readers 个线程循环按职业读取任务列表, writers 个线程循环写入反馈记录(每次一个事务),
+统计读写吞吐、读延迟和写入因数据库被锁失败的次数。
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 模式名称 -> (SQLITE_TUNING, SQLITE_READONLY_READER)
+MODES = {
+    'default': ('False', 'False'),
+    'tuned': ('True', 'False'),
+    'tuned+ro': ('True', 'True'),
+}
+
+
+def run_worker(args):
+    """子进程: 在指定模式下运行负载并以JSON输出结果"""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_sqlite_profile_")
+    tuning, readonly = MODES[args.mode]
+    os.environ['DB_TYPE'] = 'sqlite'
+    os.environ['DATABASE_PATH'] = os.path.join(tmp_dir, 'bench.sqlite')
+    os.environ['LOG_DIR'] = tmp_dir
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    os.environ['SQLITE_TUNING'] = tuning
+    os.environ['SQLITE_READONLY_READER'] = readonly
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+    from pony.orm import db_session, select
+
+    from app.core.config import DB_TYPE, DB_CONFIG, SQLITE_READONLY_READER
+    from app.models import setup_database
+    from app.models.database import get_readonly_connection
+    from app.models.EconIndex import Task, TaskWriter, add_feedback
+
+    setup_database(DB_TYPE, DB_CONFIG)
+
+    titles = [f"Occupation {i}" for i in range(args.titles)]
+    writer = TaskWriter()
+    writer.load_existing()
+    writer.write([
+        dict(
+            onet_soc_code=f"{i:02d}-0000.00", title=title, task_id=task_id, task=f"task {i}-{task_id}",
+            task_type="Core", incumbents_responding=1, date="07/2014", domain_source="Incumbent",
+            percentage=random.random(), title_cn=f"职业{i}", task_cn=f"任务{i}-{task_id}",
+            automated_score=random.randint(1, 5), automated_score_reason="benchmark"
+        )
+        for i, title in enumerate(titles) for task_id in range(args.tasks)
+    ])
+    writer.close()
+
+    readonly_sql = ('SELECT x."content", t."percentage" FROM "Task" t '
+                    'JOIN "Occupation" o ON o."id" = t."occupation" JOIN "TaskText" x ON x."task" = t."id" '
+                    'WHERE o."title" = ?')
+
+    @db_session
+    def read_pony(title):
+        return select((t.text.content, t.percentage) for t in Task if t.occupation.title == title)[:]
+
+    def read_readonly(title):
+        return get_readonly_connection().execute(readonly_sql, (title,)).fetchall()
+
+    read = read_readonly if SQLITE_READONLY_READER else read_pony
+    deadline = time.perf_counter() + args.duration
+    latencies = []
+    counts = {'reads': 0, 'writes': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def reader():
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            read(random.choice(titles))
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            counts['reads'] += len(local)
+
+    def writer():
+        writes = errors = 0
+        while time.perf_counter() < deadline:
+            if add_feedback("建议", "benchmark", "127.0.0.1") is None:
+                errors += 1
+            else:
+                writes += 1
+        with lock:
+            counts['writes'] += writes
+            counts['write_errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    print(json.dumps({
+        "mode": args.mode,
+        "reads_per_sec": counts['reads'] / elapsed,
+        "writes_per_sec": counts['writes'] / elapsed,
+        "write_errors": counts['write_errors'],
+        "read_p50_ms": pct(0.5),
+        "read_p99_ms": pct(0.99),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite性能配置基准测试")
+    parser.add_argument('--readers', type=int, default=8, help='读线程数')
+    parser.add_argument('--writers', type=int, default=2, help='写线程数')
+    parser.add_argument('--duration', type=float, default=5.0, help='每种模式运行秒数')
+    parser.add_argument('--titles', type=int, default=500, help='预置的职业数')
+    parser.add_argument('--tasks', type=int, default=20, help='每个职业的任务数')
+    parser.add_argument('--mode', choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_worker(args)
+        return
+
+    print(f"读线程: {args.readers}, 写线程: {args.writers}, 每种模式运行: {args.duration}秒, "
+          f"数据: {args.titles} 个职业 x {args.tasks} 个任务")
+    print(f"{'模式':<10}{'读(次/秒)':>12}{'写(次/秒)':>12}{'写失败':>8}{'读p50(ms)':>12}{'读p99(ms)':>12}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--mode', mode, '--readers', str(args.readers), '--writers', str(args.writers),
+             '--duration', str(args.duration), '--titles', str(args.titles), '--tasks', str(args.tasks)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{result['mode']:<10}{result['reads_per_sec']:>12.1f}{result['writes_per_sec']:>12.1f}"
+              f"{result['write_errors']:>8}{result['read_p50_ms']:>12.2f}{result['read_p99_ms']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
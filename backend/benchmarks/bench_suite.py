@@ -0,0 +1,235 @@
+"""
+基准测试套件 - 在合成O*NET数据上测量模型函数和API路由的延迟分布
+
+用法(在backend目录下):
+    python benchmarks/bench_suite.py --scales 1 10 --iterations 100
+    python benchmarks/bench_suite.py --scales 1 --compare benchmarks/results/<上次结果>.json
+
+每个规模在独立子进程中使用新的临时SQLite数据库运行:
+    1. 用 synthetic_data 按固定种子生成 scale 倍的EconIndex数据、搜索记录和反馈,并计算职业统计
+    2. 依次调用每个模型函数,记录每次调用耗时
+    3. 通过进程内ASGI客户端调用每个路由,记录每次请求耗时
+结果(p50/p95/p99/平均/最大,单位毫秒)打印为表格,并连同git提交号保存为JSON,便于跨提交对比。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def summarize(durations: list) -> dict:
+    """计算耗时分布(毫秒)"""
+    durations = sorted(d * 1000 for d in durations)
+    pct = lambda p: durations[min(len(durations) - 1, int(len(durations) * p))]
+    return {
+        "iterations": len(durations),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.fmean(durations),
+        "max_ms": durations[-1],
+    }
+
+
+def model_cases(m, load_snapshot, data: dict, iterations: int) -> list:
+    """
+    模型函数用例: (名称, 调用函数(i), 次数)
+    修改数据的用例放在最后,避免影响只读用例的快照
+    """
+    titles, titles_cn = data['titles'], data['titles_cn']
+    pick = lambda seq, i: seq[(i * 7919) % len(seq)]
+    light = iterations
+    return [
+        ("load_snapshot", lambda i: load_snapshot(), 3),
+        ("get_title_percentage[en]", lambda i: m.get_title_percentage(pick(titles, i), 'en'), light),
+        ("get_title_percentage[cn]", lambda i: m.get_title_percentage(pick(titles_cn, i), 'cn'), light),
+        ("get_titles_tasks[20]", lambda i: m.get_titles_tasks([pick(titles_cn, i + k) for k in range(20)], 'cn'), light),
+        ("search_titles_by_keyword[en]", lambda i: m.search_titles_by_keyword("analyst", 'en', 20), light),
+        ("search_titles_by_keyword[cn]", lambda i: m.search_titles_by_keyword("工程", 'cn', 20), light),
+        ("suggest_titles[en]", lambda i: m.suggest_titles("data", 'en', 10), light),
+        ("suggest_titles[cn]", lambda i: m.suggest_titles("软件", 'cn', 10), light),
+        ("occupation_stats", lambda i: m.occupation_stats("percentage_sum", 20), light),
+        ("get_top_tasks_by_percentage", lambda i: m.get_top_tasks_by_percentage(20), light),
+        ("get_popular_occupation_searches", lambda i: m.get_popular_occupation_searches(10, 30), light),
+        ("get_feedbacks", lambda i: m.get_feedbacks(30, 50), light),
+        ("iter_econ_index_rows[title]", lambda i: list(m.iter_econ_index_rows(title=pick(titles, i))), light),
+        ("add_feedback", lambda i: m.add_feedback("建议", "benchmark", "127.0.0.1"), light),
+        ("update_occupation_stats[50 titles]", lambda i: m.update_occupation_stats(titles[i * 50:(i + 1) * 50]), 3),
+    ]
+
+
+def route_cases(data: dict, iterations: int) -> list:
+    """路由用例: (名称, 方法, 路径, 参数生成函数(i), 请求体, 次数)"""
+    titles, titles_cn = data['titles'], data['titles_cn']
+    pick = lambda seq, i: seq[(i * 7919) % len(seq)]
+    light = iterations
+    return [
+        ("GET /health", "GET", "/health", lambda i: {}, b"", light),
+        ("GET /occupation/search", "GET", "/occupation/search", lambda i: {"keyword": "工程", "limit": 20}, b"", light),
+        ("GET /occupation/suggest", "GET", "/occupation/suggest", lambda i: {"prefix": "da", "language": "en"}, b"", light),
+        ("GET /occupation/tasks", "GET", "/occupation/tasks", lambda i: {"title": pick(titles_cn, i)}, b"", light),
+        ("GET /occupation/tasks/batch", "GET", "/occupation/tasks/batch",
+         lambda i: [("titles", pick(titles_cn, i + k)) for k in range(20)], b"", light),
+        ("GET /occupation/stats", "GET", "/occupation/stats", lambda i: {"limit": 20}, b"", light),
+        ("GET /tasks/top", "GET", "/tasks/top", lambda i: {"limit": 20}, b"", light),
+        ("GET /occupation/popular", "GET", "/occupation/popular", lambda i: {}, b"", light),
+        ("GET /feedback", "GET", "/feedback", lambda i: {}, b"", light),
+        ("GET /occupation/export[title]", "GET", "/occupation/export",
+         lambda i: {"title": pick(titles, i), "language": "en"}, b"", light),
+        ("GET /occupation/export[full]", "GET", "/occupation/export", lambda i: {"format": "csv"}, b"", 1),
+        ("POST /feedback", "POST", "/feedback", lambda i: {},
+         "feedback_type=%E5%BB%BA%E8%AE%AE&feedback_content=benchmark".encode(), light),
+    ]
+
+
+def run_worker(args):
+    """子进程: 生成数据并运行一个规模的全部用例,结果以JSON写入 args.part_file"""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    os.environ['DB_TYPE'] = 'sqlite'
+    os.environ['DATABASE_PATH'] = os.path.join(tmp_dir, 'bench.sqlite')
+    os.environ['LOG_DIR'] = tmp_dir
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from app import create_app
+    from app.models.snapshot import get_snapshot, load_snapshot
+    import app.models.EconIndex  # noqa: F401
+    m = sys.modules['app.models.EconIndex']
+    from asgi_client import ASGIClient
+    from synthetic_data import populate, populate_activity
+
+    application = create_app()
+
+    start = time.perf_counter()
+    data = populate(args.scale, args.seed)
+    populate_activity(data['titles'], searches=2000 * args.scale, feedbacks=200 * args.scale, seed=args.seed)
+    m.update_occupation_stats()
+    get_snapshot()
+    setup_seconds = time.perf_counter() - start
+    print(f"规模 {args.scale}x: {data['rows']} 个任务, {len(data['titles'])} 个职业, 准备数据 {setup_seconds:.1f} 秒",
+          file=sys.stderr)
+
+    results = []
+    for name, call, iterations in model_cases(m, load_snapshot, data, args.iterations):
+        call(0)  # 预热
+        durations = []
+        for i in range(iterations):
+            t = time.perf_counter()
+            call(i)
+            durations.append(time.perf_counter() - t)
+        results.append({"scale": args.scale, "kind": "model", "name": name, **summarize(durations)})
+
+    async def run_routes():
+        client = ASGIClient(application)
+        for name, method, path, params, body, iterations in route_cases(data, args.iterations):
+            headers = {"content-type": "application/x-www-form-urlencoded"} if body else None
+            response = await client.request(method, path, params(0), headers, body)
+            if response.status != 200:
+                print(f"{name} 返回 {response.status}: {response.body[:200]!r}", file=sys.stderr)
+            durations = []
+            for i in range(iterations):
+                t = time.perf_counter()
+                await client.request(method, path, params(i), headers, body)
+                durations.append(time.perf_counter() - t)
+            results.append({"scale": args.scale, "kind": "route", "name": name, **summarize(durations)})
+
+    asyncio.run(run_routes())
+    m.search_record_buffer.stop()
+
+    with open(args.part_file, 'w', encoding='utf-8') as f:
+        json.dump({"rows": data['rows'], "titles": len(data['titles']), "setup_seconds": setup_seconds,
+                   "results": results}, f)
+
+
+def git_commit() -> str:
+    """当前git提交号,不在git仓库中时返回unknown"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: list, baseline: dict = None):
+    """打印结果表格,提供基准结果时附加p50变化"""
+    header = f"{'规模':>4}  {'类型':<6}{'用例':<40}{'次数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+    print(header + ("  p50变化" if baseline else ""))
+    for r in results:
+        line = (f"{r['scale']:>4}  {r['kind']:<6}{r['name']:<40}{r['iterations']:>6}"
+                f"{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}")
+        if baseline:
+            old = baseline.get((r['scale'], r['kind'], r['name']))
+            if old and old['p50_ms'] > 0:
+                line += f"  {(r['p50_ms'] / old['p50_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型函数与API路由基准测试套件")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help='数据规模倍数,如 1 10 100')
+    parser.add_argument('--iterations', type=int, default=100, help='每个轻量用例的调用次数')
+    parser.add_argument('--seed', type=int, default=42, help='合成数据随机种子')
+    parser.add_argument('--output', default=None, help='结果JSON路径,默认 benchmarks/results/<时间>-<提交号>.json')
+    parser.add_argument('--compare', default=None, help='与之前保存的结果JSON对比')
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--part-file', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scale is not None:
+        run_worker(args)
+        return
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "scales": {},
+        "results": [],
+    }
+    for scale in args.scales:
+        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as part:
+            part_file = part.name
+        subprocess.run(
+            [sys.executable, __file__, '--scale', str(scale), '--iterations', str(args.iterations),
+             '--seed', str(args.seed), '--part-file', part_file],
+            check=True
+        )
+        with open(part_file, encoding='utf-8') as f:
+            part = json.load(f)
+        os.unlink(part_file)
+        report["scales"][str(scale)] = {k: part[k] for k in ("rows", "titles", "setup_seconds")}
+        report["results"].extend(part["results"])
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old = json.load(f)
+        baseline = {(r['scale'], r['kind'], r['name']): r for r in old['results']}
+        print(f"对比基准: {args.compare} (提交 {old.get('commit')})")
+    print_results(report["results"], baseline)
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+合成O*NET数据生成器 - 按固定随机种子生成规模可伸缩的职业任务数据,用于基准测试
+
+scale=1 时职业数和任务数与真实O*NET任务数据相当(约974个职业、19530个任务),
+scale=10/100 时按比例放大。标题为中英文对照,部分英文职业共用同一中文名;
+percentage 约六成为0,其余服从对数正态分布(长尾),全部任务合计为100。
+"""
+import random
+from datetime import datetime, timedelta
+
+from pony.orm import db_session
+
+from app.models.EconIndex import FeedbackRecord, TaskWriter, _write_occupation_search_records
+
+# scale=1 时的职业数与平均每个职业的任务数
+BASE_OCCUPATIONS = 974
+TASKS_PER_OCCUPATION = (5, 35)
+
+_FIELDS_OF_WORK = [
+    ("Software", "软件"), ("Data", "数据"), ("Network", "网络"), ("Clinical", "临床"), ("Industrial", "工业"),
+    ("Environmental", "环境"), ("Financial", "金融"), ("Agricultural", "农业"), ("Medical", "医疗"),
+    ("Marine", "海洋"), ("Retail", "零售"), ("Legal", "法律"), ("Educational", "教育"), ("Construction", "建筑"),
+    ("Marketing", "市场"), ("Logistics", "物流"), ("Aerospace", "航空航天"), ("Chemical", "化工"),
+    ("Security", "安全"), ("Nuclear", "核能"),
+]
+_ROLES = [
+    ("Analysts", "分析师"), ("Engineers", "工程师"), ("Technicians", "技术员"), ("Managers", "经理"),
+    ("Specialists", "专员"), ("Operators", "操作员"), ("Inspectors", "检查员"), ("Designers", "设计师"),
+    ("Teachers", "教师"), ("Scientists", "科学家"), ("Assistants", "助理"), ("Coordinators", "协调员"),
+]
+_LEVELS = [("", ""), ("Senior ", "高级"), ("Chief ", "首席"), ("Junior ", "初级"), ("Lead ", "主管")]
+_VERBS = [
+    ("Analyze", "分析"), ("Prepare", "编写"), ("Inspect", "检查"), ("Maintain", "维护"), ("Coordinate", "协调"),
+    ("Develop", "开发"), ("Review", "审核"), ("Monitor", "监控"), ("Train staff on", "培训员工使用"), ("Design", "设计"),
+]
+_OBJECTS = [
+    ("reports", "报告"), ("equipment", "设备"), ("budgets", "预算"), ("customer requests", "客户需求"),
+    ("safety procedures", "安全规程"), ("project schedules", "项目进度"), ("software systems", "软件系统"),
+    ("patient records", "病历"), ("test results", "测试结果"), ("contracts", "合同"),
+]
+_TASK_TYPES = ["Core", "Core", "Core", "Supplemental", "n/a"]
+
+
+def occupation_title(i: int):
+    """
+    第i个职业的中英文名称
+
+    返回:
+        (英文名, 中文名),英文名唯一;每37个职业中有一个与前一个职业共用中文名
+    """
+    field, field_cn = _FIELDS_OF_WORK[i % len(_FIELDS_OF_WORK)]
+    role, role_cn = _ROLES[(i // len(_FIELDS_OF_WORK)) % len(_ROLES)]
+    n = i // (len(_FIELDS_OF_WORK) * len(_ROLES))
+    level, level_cn = _LEVELS[n % len(_LEVELS)]
+    grade = n // len(_LEVELS)
+    title = f"{level}{field} {role}" + (f" {grade + 1}" if grade else "")
+    title_cn = f"{level_cn}{field_cn}{role_cn}" + (f"{grade + 1}级" if grade else "")
+    if i % 37 == 36:
+        title_cn = occupation_title(i - 1)[1]
+    return title, title_cn
+
+
+def _generate(scale: int, seed: int, factor: float = None):
+    """按种子生成任务行,factor为None时只生成原始百分比"""
+    rng = random.Random(seed)
+    for i in range(BASE_OCCUPATIONS * scale):
+        title, title_cn = occupation_title(i)
+        soc = f"{11 + i % 43:02d}-{1000 + i // 43:04d}.00"
+        for task_id in range(rng.randint(*TASKS_PER_OCCUPATION)):
+            verb, verb_cn = rng.choice(_VERBS)
+            obj, obj_cn = rng.choice(_OBJECTS)
+            raw = 0.0 if rng.random() < 0.6 else rng.lognormvariate(0, 1.5)
+            score = rng.choices([1, 2, 3, 4, 5], weights=[10, 25, 30, 25, 10])[0]
+            if factor is None:
+                yield raw
+                continue
+            yield {
+                'onet_soc_code': soc,
+                'title': title,
+                'task_id': task_id,
+                'task': f"{verb} {obj} for {title.lower()} (task {task_id}).",
+                'task_type': rng.choice(_TASK_TYPES),
+                'incumbents_responding': rng.randint(0, 200),
+                'date': "07/2014",
+                'domain_source': rng.choice(["Incumbent", "Analyst"]),
+                'percentage': raw * factor,
+                'title_cn': title_cn,
+                'task_cn': f"为{title_cn}{verb_cn}{obj_cn}(任务{task_id})。",
+                'automated_score': score,
+                'automated_score_reason': f"该任务自动化评分为{score}: " + "任务需要" * rng.randint(5, 40),
+            }
+
+
+def generate_rows(scale: int = 1, seed: int = 42):
+    """
+    生成任务记录
+
+    参数:
+        scale: 数据规模倍数
+        seed: 随机种子,相同的种子生成相同的数据
+
+    返回:
+        逐行产生字段字典的生成器,字段见 TASK_RECORD_FIELDS
+    """
+    total = sum(_generate(scale, seed))
+    return _generate(scale, seed, 100.0 / total if total else 0.0)
+
+
+def populate(scale: int = 1, seed: int = 42, batch_size: int = 5000) -> dict:
+    """
+    写入合成数据到当前数据库
+
+    返回:
+        {"rows": 行数, "titles": 英文职业名列表, "titles_cn": 中文职业名列表}
+    """
+    writer = TaskWriter()
+    writer.load_existing()
+    titles, titles_cn = {}, {}
+    batch = []
+    rows = 0
+    try:
+        for row in generate_rows(scale, seed):
+            titles[row['title']] = None
+            titles_cn[row['title_cn']] = None
+            batch.append(row)
+            rows += 1
+            if len(batch) >= batch_size:
+                writer.write(batch)
+                batch = []
+        if batch:
+            writer.write(batch)
+    finally:
+        writer.close()
+    return {"rows": rows, "titles": list(titles), "titles_cn": list(titles_cn)}
+
+
+def populate_activity(titles: list, searches: int = 20000, feedbacks: int = 2000, days: int = 30, seed: int = 42):
+    """
+    写入合成的搜索记录和反馈,搜索次数按职业服从Zipf分布
+
+    参数:
+        titles: 职业名列表
+        searches: 搜索记录数
+        feedbacks: 反馈记录数
+        days: 记录分布的天数
+    """
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(titles))]
+    now = datetime.now()
+    records = [
+        (title, 'en', f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+         now - timedelta(seconds=rng.randint(0, days * 86400)))
+        for title in rng.choices(titles, weights=weights, k=searches)
+    ]
+    for i in range(0, len(records), 5000):
+        _write_occupation_search_records(records[i:i + 5000])
+
+    with db_session:
+        for i in range(feedbacks):
+            FeedbackRecord(
+                feedback_type=rng.choice(['建议', '问题', '其他']),
+                feedback_content=f"synthetic feedback {i}",
+                feedback_time=now - timedelta(seconds=rng.randint(0, days * 86400)),
+                client_ip="127.0.0.1"
+            )
@@ -1,27 +1,45 @@
 """
 应用入口文件 - 启动FastAPI应用
 """
-import uvicorn
-from app import create_app
-from app.core.config import HOST, PORT, DEBUG, WORKERS, RELOAD
+from app.core.config import HOST, PORT, DEBUG, WORKERS, RELOAD, METRICS_MULTIPROCESS, DB_TYPE, DB_CONFIG
+
+
+def __getattr__(name):
+    """
+    按需创建应用实例: uvicorn 以 "run:app" 导入时(或 from run import app)才执行 create_app
+
+    以脚本方式运行时主进程只负责启动worker,不需要创建应用和加载FastAPI路由
+    """
+    if name == 'app':
+        from app import create_app
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 创建应用实例
-# 注意：在生产环境中，这个实例将被uvicorn直接使用
-# 在开发环境中，如果启用了热重载，uvicorn会重新加载这个模块
-app = create_app()
 
 if __name__ == "__main__":
+    import uvicorn
+    from app.utils.metrics import reset_metrics_dir
+
     # 启动应用
     print(f"启动应用: http://{HOST}:{PORT}")
     print(f"调试模式: {'开启' if DEBUG else '关闭'}")
     print(f"热重载: {'开启' if RELOAD else '关闭'}")
-    
+
+    # 多worker时清空上次运行留下的进程指标文件
+    if METRICS_MULTIPROCESS:
+        reset_metrics_dir()
+
+    # 多worker时由主进程先完成建表和迁移,各worker启动时表结构版本一致,直接跳过
+    if WORKERS > 1:
+        from app.models import setup_database
+        setup_database(DB_TYPE, DB_CONFIG)
+
     # Uvicorn配置
     # 注意: 不支持--no-reload选项，只能设置reload=False
     uvicorn.run(
-        "run:app", 
-        host=HOST, 
-        port=PORT, 
+        "run:app",
+        host=HOST,
+        port=PORT,
         reload=RELOAD,
         workers=WORKERS
-    ) 
\ No newline at end of file
+    )
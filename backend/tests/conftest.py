@@ -0,0 +1,30 @@
+"""
+测试配置 - 在导入应用代码之前把数据库指向临时目录下的全新SQLite文件
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# app.core.config 在导入时读取环境变量,必须先于任何 app 模块导入设置
+_tmp_dir = tempfile.mkdtemp(prefix="econ-index-test-")
+os.environ["DB_TYPE"] = "sqlite"
+os.environ["DATABASE_PATH"] = os.path.join(_tmp_dir, "test.sqlite")
+os.environ["LOG_DIR"] = os.path.join(_tmp_dir, "logs")
+os.environ["SNAPSHOT_FILE_ENABLED"] = "False"
+# 测试不需要后台预热和补全热度的定时刷新
+os.environ["WARMUP_ENABLED"] = "False"
+os.environ["SUGGEST_REFRESH_INTERVAL"] = "0"
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client():
+    """在测试数据库上创建应用(建表并执行迁移)的测试客户端"""
+    from fastapi.testclient import TestClient
+    from app import create_app
+    with TestClient(create_app()) as test_client:
+        yield test_client
@@ -0,0 +1,150 @@
+"""
+键集分页测试 - 反馈列表、职业统计排名和任务排行逐页翻完所有数据,不跳过也不重复
+
+测试数据包含排序值相同的行: 同一时间的多条反馈、统计值相同的职业、
+职业/任务/占比相同但其他字段不同的任务,分页边界落在它们之间时最容易漏行
+"""
+from datetime import datetime
+
+import pytest
+from pony.orm import db_session
+
+from app.models.EconIndex import FeedbackRecord, TaskWriter, update_occupation_stats
+from app.utils.pagination import encode_cursor
+
+FEEDBACK_DAYS = {"start_date": "2020-01-01", "end_date": "2020-01-02"}
+
+
+def _task(code, title, task_id, percentage, task="task", task_cn="任务", score=3):
+    return dict(
+        onet_soc_code=code, title=title, task_id=task_id, task=task, task_type="Core", incumbents_responding=1,
+        date="07/2014", domain_source="Incumbent", percentage=percentage, title_cn=f"{title}中文", task_cn=task_cn,
+        automated_score=score, automated_score_reason="test"
+    )
+
+
+@pytest.fixture(scope="module", autouse=True)
+def data(client):
+    """写入测试反馈和任务数据,并重算职业统计(同时使快照失效)"""
+    times = [datetime(2020, 1, 1, 9), datetime(2020, 1, 1, 12), datetime(2020, 1, 1, 12), datetime(2020, 1, 1, 12),
+             datetime(2020, 1, 2, 8), datetime(2020, 1, 2, 23, 59), datetime(2020, 1, 3, 1)]
+    with db_session:
+        for i, feedback_time in enumerate(times):
+            FeedbackRecord(feedback_type="建议" if i % 2 else "问题", feedback_content=f"反馈{i}",
+                           feedback_time=feedback_time)
+
+    writer = TaskWriter()
+    writer.load_existing()
+    try:
+        writer.write([
+            # 同一职业下职业名、任务、占比都相同,只有中文任务和评分不同
+            _task("11-0000.00", "Alpha", 1, 0.5, task_cn="任务一"),
+            _task("11-0000.00", "Alpha", 2, 0.5, task_cn="任务二"),
+            _task("11-0000.00", "Alpha", 3, 0.5, task_cn="任务二", score=4),
+            _task("11-0000.00", "Alpha", 4, 0.1, task="other"),
+            # Beta 与 Gamma 的任务完全相同,各项统计值相等
+            _task("12-0000.00", "Beta", 1, 0.2),
+            _task("12-0000.00", "Beta", 2, 0.0, task="zero"),
+            _task("13-0000.00", "Gamma", 1, 0.2),
+            _task("13-0000.00", "Gamma", 2, 0.0, task="zero"),
+            _task("14-0000.00", "Delta", 1, 0.3, task="delta"),
+        ])
+    finally:
+        writer.close()
+    assert update_occupation_stats()
+
+
+def _page_all(client, path, items_key, limit, **params):
+    """按 next_cursor 翻完所有页,返回按顺序拼接的结果"""
+    items, cursor = [], None
+    for _ in range(100):
+        query = dict(params, limit=limit)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(path, params=query)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert len(body[items_key]) <= limit
+        items.extend(body[items_key])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+    pytest.fail("分页未结束")
+
+
+def _feedback_ids(client, limit, **params):
+    return [f["id"] for f in _page_all(client, "/feedback", "feedbacks", limit, **FEEDBACK_DAYS, **params)]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_feedback_pages_cover_every_row(client, limit):
+    full = _feedback_ids(client, 100)
+    # 2020-01-03 的反馈在结束日期之后
+    assert len(full) == 6
+    with db_session:
+        expected = sorted(
+            ((f.feedback_time, f.id) for f in FeedbackRecord.select(lambda f: f.feedback_time < datetime(2020, 1, 3))),
+            reverse=True
+        )
+    assert full == [feedback_id for _, feedback_id in expected]
+    assert _feedback_ids(client, limit) == full
+
+
+@pytest.mark.parametrize("limit", [1, 2])
+def test_feedback_pages_with_type_filter(client, limit):
+    ids = _feedback_ids(client, limit, feedback_type="建议")
+    with db_session:
+        expected = {f.id for f in FeedbackRecord.select(
+            lambda f: f.feedback_type == "建议" and f.feedback_time < datetime(2020, 1, 3)
+        )}
+    assert len(ids) == len(set(ids))
+    assert set(ids) == expected
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    encode_cursor(("2020-01-01T12:00:00",)),
+    encode_cursor((12, 1)),
+    encode_cursor(("not a time", 1)),
+])
+def test_feedback_bad_cursor_returns_400(client, cursor):
+    response = client.get("/feedback", params={"cursor": cursor, **FEEDBACK_DAYS})
+    assert response.status_code == 400
+
+
+def _stat_titles(client, limit, order, metric):
+    return [s["title"] for s in _page_all(client, "/occupation/stats", "stats", limit, type=metric, order=order)]
+
+
+@pytest.mark.parametrize("metric", ["percentage_sum", "percentage_non_zero", "automated_score_avg"])
+@pytest.mark.parametrize("limit", [1, 2])
+def test_stats_pages_cover_every_row_in_both_directions(client, metric, limit):
+    full = _stat_titles(client, 100, "desc", metric)
+    assert sorted(full) == ["Alpha", "Beta", "Delta", "Gamma"]
+    assert _stat_titles(client, limit, "desc", metric) == full
+    assert _stat_titles(client, limit, "asc", metric) == full[::-1]
+
+
+def _task_rows(client, limit, order):
+    tasks = _page_all(client, "/tasks/top", "tasks", limit, order=order)
+    return [(t["occupation"], t["task"], t["task_cn"], t["percentage"], t["automated_score"]) for t in tasks]
+
+
+@pytest.mark.parametrize("limit", [1, 2])
+def test_top_tasks_pages_cover_every_row_in_both_directions(client, limit):
+    full = _task_rows(client, 100, "desc")
+    # 9条任务的字段组合各不相同,都要保留;其中三条 Alpha 0.5 的任务排序键前三项相同
+    assert len(full) == len(set(full)) == 9
+    assert sum(1 for row in full if row[:2] == ("Alpha", "task") and row[3] == 0.5) == 3
+    assert _task_rows(client, limit, "desc") == full
+    assert _task_rows(client, limit, "asc") == full[::-1]
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/occupation/stats", {"cursor": "not-a-cursor"}),
+    ("/occupation/stats", {"cursor": encode_cursor((0.5, "Alpha", "extra"))}),
+    ("/tasks/top", {"cursor": encode_cursor((0.5, "Alpha", "task"))}),
+    ("/tasks/top", {"order": "sideways"}),
+])
+def test_ranking_bad_params_return_400(client, path, params):
+    assert client.get(path, params=params).status_code == 400
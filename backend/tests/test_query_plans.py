@@ -0,0 +1,41 @@
+"""
+热点查询执行计划测试 - 在全新的SQLite数据库上执行所有迁移,
+对 HOT_QUERIES 中的每条查询运行 EXPLAIN QUERY PLAN,任何一条退化为全表扫描或整个索引的遍历时失败
+"""
+import pytest
+
+from app.core.config import DB_TYPE, DB_CONFIG
+from app.models import setup_database
+from app.models.migrations import (
+    HOT_QUERIES, ORDERED_INDEX_SCANS, explain_query, _is_full_scan, get_applied_versions, latest_migration_version
+)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    """建表并执行全部迁移"""
+    setup_database(DB_TYPE, DB_CONFIG)
+
+
+def test_all_migrations_applied():
+    assert get_applied_versions() == set(range(1, latest_migration_version() + 1))
+
+
+@pytest.mark.parametrize("name, entity_name, template, params", HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_hot_query_uses_index(name, entity_name, template, params):
+    plan = explain_query(entity_name, template, params)
+    details = [row['detail'] for row in plan]
+    assert not _is_full_scan(plan, ORDERED_INDEX_SCANS.get(name)), f"{name} 退化为全表扫描: {details}"
+
+
+@pytest.mark.parametrize("detail, ordered_index, full_scan", [
+    ("SCAN Task", None, True),
+    ("SCAN OccupationSearchDaily USING INDEX sqlite_autoindex_OccupationSearchDaily_1", None, True),
+    ("SCAN Occupation USING COVERING INDEX idx_occupation_title", None, True),
+    ("SCAN Task USING INDEX idx_task_percentage", "idx_task_percentage", False),
+    ("SCAN Task USING INDEX idx_econindex_percentage", "idx_task_percentage", True),
+    ("SEARCH Occupation USING COVERING INDEX idx_occupation_title (title=?)", None, False),
+    ("SEARCH FeedbackRecord USING INDEX idx_feedback_time_id (feedback_time>?)", None, False),
+])
+def test_is_full_scan(detail, ordered_index, full_scan):
+    assert _is_full_scan([{'detail': detail}], ordered_index) is full_scan
@@ -0,0 +1,98 @@
+"""
+令牌桶限流测试 - 以可控的时钟验证令牌补充、等待时间(Retry-After)、max_keys 淘汰和空闲桶清理
+"""
+import pytest
+
+from app.api import routes
+from app.utils import rate_limit
+from app.utils.rate_limit import TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", fake)
+    return fake
+
+
+def make_limiter(rate_per_minute=60, burst=2, max_keys=100):
+    return TokenBucketLimiter("test", rate_per_minute, burst, max_keys=max_keys, enabled=True)
+
+
+def test_burst_then_limited_with_wait(clock):
+    limiter = make_limiter(rate_per_minute=60, burst=2)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    # 每秒补充一个令牌,桶已空时需要等待一整秒
+    assert limiter.acquire("a") == pytest.approx(1.0)
+    clock.now += 0.25
+    assert limiter.acquire("a") == pytest.approx(0.75)
+    assert limiter.stats()["limited"] == 2
+
+
+def test_refill_is_capped_at_burst(clock):
+    limiter = make_limiter(rate_per_minute=60, burst=2)
+    limiter.acquire("a")
+    limiter.acquire("a")
+    clock.now += 1.0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    # 长时间未访问也最多补满 burst 个令牌
+    clock.now += 3600
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+
+
+def test_keys_are_limited_independently(clock):
+    limiter = make_limiter(burst=1)
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+
+def test_least_recently_used_key_is_evicted(clock):
+    limiter = make_limiter(burst=1, max_keys=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")  # a 变为最近访问
+    limiter.acquire("c")  # 超出上限,淘汰最久未访问的 b
+    assert limiter.stats()["evictions"] == 1
+    assert limiter.stats()["keys"] == 2
+    # a 仍被跟踪而受限,b 被淘汰后重新获得完整的桶
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0
+
+
+def test_idle_full_bucket_is_cleaned_up(clock):
+    limiter = make_limiter(rate_per_minute=60, burst=2)
+    limiter.acquire("a")
+    # 超过补满所需时间(2秒)后,下一次新键检查顺带清理已补满的 a,不计为淘汰
+    clock.now += 2.0
+    limiter.acquire("b")
+    assert limiter.stats()["keys"] == 1
+    assert limiter.stats()["evictions"] == 0
+
+
+def test_disabled_limiter_allows_everything(clock):
+    limiter = TokenBucketLimiter("test", 60, 1, enabled=False)
+    assert all(limiter.acquire("a") == 0 for _ in range(10))
+
+
+def test_feedback_returns_retry_after(client, clock, monkeypatch):
+    # 每分钟一个令牌: 用完后需等待60秒
+    monkeypatch.setattr(routes, "feedback_limiter", make_limiter(rate_per_minute=1, burst=1))
+    data = {"feedback_type": "建议", "feedback_content": "test"}
+    assert client.post("/feedback", data=data).status_code == 200
+    clock.now += 0.5
+    response = client.post("/feedback", data=data)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
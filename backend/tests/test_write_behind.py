@@ -0,0 +1,133 @@
+"""
+后写缓冲区测试 - 写入失败的重试、指数退避、重试用尽后的丢弃以及积压上限下的溢出策略
+
+后台线程的写入间隔和批量都设得很大,测试中由 flush() 显式写入;time.sleep 被替换为记录等待时间
+"""
+import pytest
+
+from app.utils import write_behind
+from app.utils.write_behind import WriteBehindBuffer, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST
+
+
+class FlakyWriter:
+    """前 failures 次调用抛出异常,之后记录写入的批次"""
+
+    def __init__(self, failures=0, on_call=None):
+        self.failures = failures
+        self.on_call = on_call
+        self.calls = 0
+        self.written = []
+
+    def __call__(self, batch):
+        self.calls += 1
+        if self.on_call is not None:
+            self.on_call(self.calls)
+        if self.calls <= self.failures:
+            raise RuntimeError("database is locked")
+        self.written.extend(batch)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录 flush(wait=True) 的退避等待时间而不真正等待"""
+    waited = []
+    monkeypatch.setattr(write_behind.time, "sleep", waited.append)
+    return waited
+
+
+@pytest.fixture
+def make_buffer(sleeps):
+    buffers = []
+
+    def make(writer, **kwargs):
+        options = dict(batch_size=100, flush_interval=60, max_retries=3, retry_backoff=1.0)
+        options.update(kwargs)
+        buffer = WriteBehindBuffer("test", writer, **options)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.stop(timeout=1)
+
+
+def test_transient_failure_is_retried_with_backoff(make_buffer, sleeps):
+    writer = FlakyWriter(failures=2)
+    buffer = make_buffer(writer)
+    for i in range(5):
+        buffer.put(i)
+
+    assert buffer.flush(wait=True) == 5
+    assert writer.written == [0, 1, 2, 3, 4]
+    assert sleeps == [pytest.approx(1.0, abs=0.1), pytest.approx(2.0, abs=0.1)]
+    stats = buffer.stats()
+    assert (stats["written"], stats["failed"], stats["retries"], stats["pending"]) == (5, 0, 2, 0)
+
+
+def test_batch_is_dropped_after_max_retries(make_buffer):
+    writer = FlakyWriter(failures=100)
+    buffer = make_buffer(writer, max_retries=2)
+    for i in range(3):
+        buffer.put(i)
+
+    assert buffer.flush(wait=True) == 0
+    assert writer.calls == 3
+    stats = buffer.stats()
+    assert (stats["written"], stats["failed"], stats["retries"], stats["pending"]) == (0, 3, 2, 0)
+
+
+def test_retry_waits_for_backoff_and_keeps_order(make_buffer):
+    writer = FlakyWriter(failures=1)
+    buffer = make_buffer(writer, retry_backoff=60)
+    buffer.put("a")
+    buffer.put("b")
+
+    # 退避时间未到时不写入,也不写入排在后面的新记录;等待重试的记录计入积压数
+    assert buffer.flush() == 0
+    buffer.put("c")
+    assert buffer.flush() == 0
+    assert buffer.stats()["pending"] == 3
+
+    assert buffer.flush(wait=True) == 3
+    assert writer.written == ["a", "b", "c"]
+
+
+@pytest.mark.parametrize("overflow, accepted, written", [
+    (OVERFLOW_DROP_NEWEST, [True, False, False], [0, 1, 2, 3]),
+    (OVERFLOW_DROP_OLDEST, [True, True, True], [2, 3, 4, 5]),
+])
+def test_overflow_policy_applies_to_retry_batch(make_buffer, overflow, accepted, written):
+    writer = FlakyWriter(failures=1)
+    buffer = make_buffer(writer, max_pending=4, overflow=overflow, retry_backoff=60)
+    for i in range(3):
+        buffer.put(i)
+    buffer.flush()
+
+    assert [buffer.put(i) for i in range(3, 6)] == accepted
+    assert buffer.stats()["pending"] == 4
+    assert buffer.stats()["dropped"] == 2
+
+    buffer.flush(wait=True)
+    assert writer.written == written
+
+
+@pytest.mark.parametrize("overflow, written", [
+    (OVERFLOW_DROP_NEWEST, [0, 1, "a", "b"]),
+    (OVERFLOW_DROP_OLDEST, [1, "a", "b", "c"]),
+])
+def test_requeue_respects_max_pending(make_buffer, overflow, written):
+    # 写入失败期间新记录填满了队列,放回失败批次时超出上限的部分按溢出策略丢弃
+    def put_during_first_call(call):
+        if call == 1:
+            for item in ("a", "b", "c"):
+                buffer.put(item)
+
+    writer = FlakyWriter(failures=1, on_call=put_during_first_call)
+    buffer = make_buffer(writer, max_pending=4, overflow=overflow)
+    buffer.put(0)
+    buffer.put(1)
+
+    buffer.flush(wait=True)
+    assert writer.written == written
+    stats = buffer.stats()
+    assert (stats["dropped"], stats["pending"]) == (1, 0)
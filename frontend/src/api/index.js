@@ -16,6 +16,17 @@ export const occupationApi = {
     })
   },
   
+  // 职业名称自动补全
+  suggest(prefix, language = 'cn', limit = 10) {
+    return api.get('/occupation/suggest', {
+      params: {
+        prefix,
+        language,
+        limit
+      }
+    })
+  },
+  
   // 获取职业任务
   getOccupationTasks(onetSocCode) {
     return api.get(`/occupation/${onetSocCode}/tasks`)
@@ -68,6 +79,14 @@ export const occupationApi = {
     })
   },
 
+  // 批量获取多个职业的任务分布
+  getTasksBatch(titles, language = 'cn') {
+    const params = new URLSearchParams()
+    titles.forEach(title => params.append('titles', title))
+    params.append('language', language)
+    return api.get('/occupation/tasks/batch', { params })
+  },
+
   // 获取职业统计数据
   getStats(type = "percentage_sum", limit = 20) {
     return api.get('/occupation/stats', {
@@ -0,0 +1,40 @@
+"""
+热点查询执行计划检查 - 执行尚未执行的迁移后,对 HOT_QUERIES 中的每条查询运行
+EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (MySQL),出现全表扫描时以非零状态码退出
+
+CI 中由 backend/tests/test_query_plans.py 在全新的SQLite数据库上执行同样的检查,
+本脚本用于检查已有数据的实际数据库(含MySQL)
+
+用法:
+    python scripts/check_query_plans.py [--verbose]
+"""
+import argparse
+import sys
+
+from app.models import setup_database, check_query_plans
+from app.core.config import DB_TYPE, DB_CONFIG
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查热点查询是否使用索引")
+    parser.add_argument('--verbose', action='store_true', help='输出完整执行计划')
+    args = parser.parse_args()
+
+    setup_database(DB_TYPE, DB_CONFIG)
+
+    failed = 0
+    for name, plan, full_scan in check_query_plans():
+        print(f"[{'全表扫描' if full_scan else 'OK'}] {name}")
+        if args.verbose or full_scan:
+            for row in plan:
+                print(f"    {row}")
+        failed += full_scan
+
+    if failed:
+        print(f"{failed} 条热点查询退化为全表扫描")
+        sys.exit(1)
+    print("所有热点查询均使用索引")
+
+
+if __name__ == "__main__":
+    main()
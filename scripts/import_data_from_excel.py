@@ -1,53 +1,318 @@
-import pandas as pd
-from pony.orm import db_session
-from datetime import datetime
+"""
+O*NET任务数据导入脚本 - 分块读取CSV,按 (O*NET-SOC Code, Task ID) 批量插入或更新职业和任务数据
 
-from app.models import setup_database, is_db_initialized
-from app.models.EconIndex import EconIndex, update_occupation_stats
-from app.core.config import DB_TYPE, DB_CONFIG
+用法:
+    python scripts/import_data_from_excel.py [csv_file] [--chunk-size 5000] [--batch-size 1000]
+                                             [--reject-file rejects.csv] [--skip-stats]
+    python scripts/import_data_from_excel.py --snapshot-only
+
+导入完成后把快照写入快照文件(SNAPSHOT_FILE_PATH),各worker直接mmap映射,无需再从数据库加载
+"""
+import argparse
+import csv
+import math
+import time
 
-# 读取Excel文件
-csv_file = 'assets/onet_tasks_with_mapping_pct_CN.csv'
-df = pd.read_csv(csv_file, encoding='gbk')
+import pandas as pd
+from app.models import setup_database, bump_dataset_version, write_snapshot_file
+from app.models.EconIndex import TaskWriter, update_occupation_stats
+from app.core.config import DB_TYPE, DB_CONFIG, SNAPSHOT_FILE_ENABLED, SNAPSHOT_FILE_PATH
 
-# 初始化数据库
-db = setup_database(DB_TYPE, DB_CONFIG)
+# 默认数据文件
+CSV_FILE = 'assets/onet_tasks_with_mapping_pct_CN.csv'
+CSV_ENCODING = 'gbk'
 
 """
 O*NET-SOC Code,Title,Task ID,Task,Task Type,Incumbents Responding,Date,Domain Source,pct,Task_CN,Title_CN,Automated_Score,Automated_Score_Reason
 """
 
-@db_session
-def import_data_from_excel():
-    for index, row in df.iterrows():
-        try:
-            print(row)
-            print(type(row['Task Type']))
-                
-            # 创建新记录
-            EconIndex(
-                onet_soc_code=row['O*NET-SOC Code'],
-                title=row['Title'],
-                task_id=int(row['Task ID']),
-                task=row['Task'],
-                task_type=row['Task Type'] if not pd.isna(row['Task Type']) else "未知",
-                incumbents_responding=int(row['Incumbents Responding']) if not pd.isna(row['Incumbents Responding']) else 0,
-                date=row['Date'],
-                domain_source=row['Domain Source'],
-                percentage=float(row['pct']),
-                title_cn=row['Title_CN'],
-                task_cn=row['Task_CN'],
-                automated_score=int(row['Automated_Score']),
-                automated_score_reason=row['Automated_Score_Reason']
-            )
-        except Exception as e:
-            print(f"导入第{index}行数据时出错: {str(e)}")
-            break
+# 文本字段的最大长度,与Occupation/TaskText实体定义保持一致
+MAX_LENGTHS = {'task': 1024, 'task_cn': 1024, 'automated_score_reason': 4096}
 
-if __name__ == "__main__":
-    # import_data_from_excel()
-    # 更新职业统计数据
-    if update_occupation_stats():
-        print("职业统计数据更新成功")
+# 整数字段的取值范围,与Pony int属性默认的32位INTEGER列一致(MySQL的INT比SQLite的INTEGER更窄)
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _required(row, column):
+    """读取必填列,为空时抛出ValueError"""
+    value = row.get(column)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        raise ValueError(f"缺少字段 {column}")
+    return value.strip() if isinstance(value, str) else value
+
+
+def _optional(row, column, default):
+    """读取可选列,为空时返回默认值"""
+    value = row.get(column)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    return value.strip() if isinstance(value, str) else value
+
+
+def _float(value, column) -> float:
+    """转换为有限浮点数,inf/nan 写入数据库会失败,作为不合法数据抛出ValueError"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"字段 {column} 不是有限数值: {value}")
+    return number
+
+
+def _int(value, column) -> int:
+    """转换为整数,超出数据库INTEGER范围时抛出ValueError"""
+    number = int(_float(value, column))
+    if not INT_MIN <= number <= INT_MAX:
+        raise ValueError(f"字段 {column} 超出整数范围: {value}")
+    return number
+
+
+def parse_row(row: dict) -> dict:
+    """
+    将CSV行转换为任务记录,字段见 TASK_RECORD_FIELDS
+
+    参数:
+        row: 列名到原始字符串值的映射
+
+    返回:
+        字段字典,数据不合法时抛出ValueError
+    """
+    record = {
+        'onet_soc_code': _required(row, 'O*NET-SOC Code'),
+        'title': _required(row, 'Title'),
+        'task_id': _int(_required(row, 'Task ID'), 'Task ID'),
+        'task': _required(row, 'Task'),
+        'task_type': _optional(row, 'Task Type', "未知"),
+        'incumbents_responding': _int(_optional(row, 'Incumbents Responding', 0), 'Incumbents Responding'),
+        'date': _required(row, 'Date'),
+        'domain_source': _required(row, 'Domain Source'),
+        'percentage': _float(_required(row, 'pct'), 'pct'),
+        'title_cn': _required(row, 'Title_CN'),
+        'task_cn': _required(row, 'Task_CN'),
+        'automated_score': _int(_required(row, 'Automated_Score'), 'Automated_Score'),
+        'automated_score_reason': _required(row, 'Automated_Score_Reason'),
+    }
+    for field, max_len in MAX_LENGTHS.items():
+        if len(record[field]) > max_len:
+            raise ValueError(f"字段 {field} 长度 {len(record[field])} 超过上限 {max_len}")
+    return record
+
+
+class EconIndexImporter:
+    """
+    任务数据批量导入器
+
+    - 导入前由 TaskWriter 一次性读取已有职业、查找表和任务的键
+    - 已存在的任务按主键 executemany UPDATE, 新任务 executemany INSERT, 重复导入结果不变
+    - 每 batch_size 行提交一个事务
+    - 不合法或在文件中重复出现的行写入拒绝文件,不中断导入
+    """
+
+    def __init__(self, batch_size: int = 1000, reject_file: str = None):
+        """
+        参数:
+            batch_size: 每个事务写入的行数
+            reject_file: 拒绝行输出文件路径,None表示不输出
+        """
+        self.batch_size = batch_size
+        self.reject_file = reject_file
+        self._reject_writer = None
+        self._reject_fp = None
+
+        self.writer = TaskWriter()
+        self.seen = set()
+
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+
+    @property
+    def touched_titles(self) -> set:
+        """新增或更新的任务涉及的职业(英文名),包括改名前的职业名"""
+        return self.writer.touched_titles
+
+    @property
+    def was_empty(self) -> bool:
+        """导入前是否没有任何任务"""
+        return self.writer.was_empty
+
+    def load_existing(self):
+        """读取已有记录的键,用于判断插入或更新"""
+        self.writer.load_existing()
+        print(f"已有记录: {len(self.writer.tasks)} 条, 职业: {len(self.writer.occupations)} 个")
+
+    def reject(self, row: dict, error: str):
+        """写入拒绝文件"""
+        self.rejected += 1
+        if not self.reject_file:
+            return
+        if self._reject_writer is None:
+            self._reject_fp = open(self.reject_file, 'w', newline='', encoding='utf-8-sig')
+            self._reject_writer = csv.DictWriter(self._reject_fp, fieldnames=list(row.keys()) + ['error'])
+            self._reject_writer.writeheader()
+        self._reject_writer.writerow({**row, 'error': error})
+
+    def import_chunk(self, rows: list):
+        """
+        导入一个数据块
+
+        参数:
+            rows: 列名到原始值的映射列表
+        """
+        records = []
+        for row in rows:
+            self.processed += 1
+            try:
+                record = parse_row(row)
+            except (ValueError, TypeError, OverflowError) as e:
+                self.reject(row, str(e))
+                continue
+
+            key = (record['onet_soc_code'], record['task_id'])
+            if key in self.seen:
+                self.reject(row, "重复的 (O*NET-SOC Code, Task ID)")
+                continue
+            self.seen.add(key)
+            records.append(record)
+
+        for i in range(0, len(records), self.batch_size):
+            inserted, updated = self.writer.write(records[i:i + self.batch_size])
+            self.inserted += inserted
+            self.updated += updated
+
+    def close(self):
+        """释放写入锁,关闭拒绝文件"""
+        self.writer.close()
+        if self._reject_fp is not None:
+            self._reject_fp.close()
+
+
+def read_chunks(csv_file: str, chunk_size: int, encoding: str = CSV_ENCODING):
+    """
+    分块读取CSV,所有列按字符串读取,由 parse_row 负责校验和转换
+
+    返回:
+        逐块产生 列名到值的映射列表
+    """
+    reader = pd.read_csv(csv_file, encoding=encoding, dtype=str, keep_default_na=False, chunksize=chunk_size)
+    for chunk in reader:
+        yield chunk.to_dict('records')
+
+
+def import_data_from_excel(csv_file: str = CSV_FILE, chunk_size: int = 5000, batch_size: int = 1000,
+                           reject_file: str = None, update_stats: bool = True) -> bool:
+    """
+    导入O*NET任务数据
+
+    参数:
+        csv_file: CSV文件路径
+        chunk_size: 每次读取的行数
+        batch_size: 每个事务写入的行数
+        reject_file: 拒绝行输出文件路径
+        update_stats: 导入后是否更新职业统计
+
+    返回:
+        成功返回True
+    """
+    importer = EconIndexImporter(batch_size=batch_size, reject_file=reject_file)
+    importer.load_existing()
+
+    start_time = time.perf_counter()
+    try:
+        for rows in read_chunks(csv_file, chunk_size):
+            importer.import_chunk(rows)
+            elapsed = time.perf_counter() - start_time
+            print(f"已处理 {importer.processed} 行, 新增 {importer.inserted}, 更新 {importer.updated}, "
+                  f"拒绝 {importer.rejected}, 速度 {importer.processed / elapsed:.0f} 行/秒")
+    except Exception:
+        # 每批单独提交,中断前已提交的批次留在数据库中;仍需重算其统计并递增数据集版本,
+        # 否则各worker看不到版本变化,快照、ETag和响应缓存会一直返回旧数据
+        if importer.inserted or importer.updated:
+            print(f"导入中断, 已提交 新增 {importer.inserted}, 更新 {importer.updated}, 更新统计和数据集版本后退出")
+            try:
+                publish_import(importer, update_stats)
+            except Exception as e:
+                print(f"更新统计和数据集版本失败: {str(e)}")
+        raise
+    finally:
+        importer.close()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"导入完成, 用时 {elapsed:.2f} 秒: 新增 {importer.inserted}, 更新 {importer.updated}, 拒绝 {importer.rejected}")
+    if importer.rejected and reject_file:
+        print(f"拒绝的行已写入: {reject_file}")
+    return publish_import(importer, update_stats)
+
+
+def publish_import(importer: EconIndexImporter, update_stats: bool = True) -> bool:
+    """
+    导入写入数据库后更新职业统计、递增数据集版本并写入快照文件
+
+    参数:
+        importer: 已写入数据的导入器
+        update_stats: 是否更新职业统计
+
+    返回:
+        成功返回True
+    """
+    if not update_stats:
+        # 不更新统计时也要递增数据集版本,使缓存失效;更新统计时由 update_occupation_stats 递增
+        if importer.inserted or importer.updated:
+            bump_dataset_version()
+        success = True
+    else:
+        # 空表导入时全量统计,否则只重算受影响的职业
+        titles = None if importer.was_empty else sorted(importer.touched_titles)
+        success = update_occupation_stats(titles)
+        if not success and (importer.inserted or importer.updated):
+            # 统计更新失败时任务数据已经变化,仍递增数据集版本使缓存失效
+            bump_dataset_version()
+
+    # 快照文件在版本递增之后写入,记录的是导入后的数据集版本
+    if success and SNAPSHOT_FILE_ENABLED:
+        build_snapshot_file()
+    return success
+
+
+def build_snapshot_file() -> bool:
+    """
+    写入快照文件,失败时worker会退回从数据库加载快照,不影响导入结果
+
+    返回:
+        成功返回True
+    """
+    try:
+        start_time = time.perf_counter()
+        version = write_snapshot_file()
+        print(f"快照文件已写入: {SNAPSHOT_FILE_PATH} (数据集版本 {version}), 用时 {time.perf_counter() - start_time:.2f} 秒")
+        return True
+    except Exception as e:
+        print(f"快照文件写入失败: {str(e)}")
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入O*NET任务数据")
+    parser.add_argument('csv_file', nargs='?', default=CSV_FILE, help='CSV文件路径')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='每次读取的行数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='每个事务写入的行数')
+    parser.add_argument('--reject-file', default=None, help='拒绝行输出文件,默认为 <csv_file>.rejects.csv')
+    parser.add_argument('--skip-stats', action='store_true', help='导入后不更新职业统计数据')
+    parser.add_argument('--snapshot-only', action='store_true', help='不导入数据,只根据数据库重建快照文件')
+    args = parser.parse_args()
+
+    # 初始化数据库
+    setup_database(DB_TYPE, DB_CONFIG)
+
+    if args.snapshot_only:
+        build_snapshot_file()
+        return
+
+    reject_file = args.reject_file or f"{args.csv_file}.rejects.csv"
+    if import_data_from_excel(args.csv_file, args.chunk_size, args.batch_size, reject_file, not args.skip_stats):
+        print("数据导入成功")
     else:
-        print("职业统计数据更新失败")
\ No newline at end of file
+        print("职业统计数据更新失败")
+
+
+if __name__ == "__main__":
+    main()
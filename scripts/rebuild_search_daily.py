@@ -0,0 +1,13 @@
+"""
+重建职业搜索按天汇总表 - 根据 OccupationSearchRecord 原始记录重新计算 OccupationSearchDaily
+
+首次部署按天汇总功能时运行一次,之后汇总表随搜索记录写入自动维护
+"""
+from app.models import setup_database
+from app.models.EconIndex import rebuild_occupation_search_daily
+from app.core.config import DB_TYPE, DB_CONFIG
+
+if __name__ == "__main__":
+    setup_database(DB_TYPE, DB_CONFIG)
+    rows = rebuild_occupation_search_daily()
+    print(f"按天汇总重建完成: {rows} 行")